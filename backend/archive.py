@@ -0,0 +1,225 @@
+"""
+Submission Archive
+Brand Challenge Mini App - Hot/cold storage for submissions of long-expired challenges
+
+Submissions of challenges that expired more than ARCHIVE_AFTER_DAYS ago are
+moved from ``submissions`` into ``submissions_archive``, a table
+range-partitioned by year (migrations/008_submission_archive.sql). The hot
+table, its indexes and every per-user query then only cover recent
+challenges.
+
+Each batch is ONE statement (``DELETE ... RETURNING`` feeding the archive
+insert and the ``submission_archive_counts`` upsert), so a submission is
+always in exactly one of the two tables and the per-user counters always
+match the archive. The same statement moves the submissions'
+``verification_logs`` rows to ``verification_logs_archive``. Runs are resumable: an interrupted run leaves whole
+batches moved and the next run continues with the rest.
+
+A challenge is archived only once it is settled: nothing is pending
+verification and, for rewarded challenges, every approved submission has a
+payout item (payouts.py reads the hot table only).
+
+Reads that need the full history: GET /leaderboard and GET /stats add the
+archived counters, GET /submissions/user/{telegram_id} falls through to the
+archive when the client pages past the hot rows, and exports read both.
+
+    python archive.py --dry-run
+    python archive.py --older-than-days 90
+"""
+
+import argparse
+import json
+import os
+from typing import List
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '30'))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', '5000'))
+
+# Serialises concurrent archive runs (pg_advisory_xact_lock key)
+_ARCHIVE_LOCK_ID = 0x61726368
+
+# ============================================================
+# QUERIES
+# ============================================================
+
+_ARCHIVABLE_CHALLENGES = """
+    SELECT c.challenge_id
+    FROM challenges c
+    WHERE c.status = 'expired'
+      AND c.deadline < now() - make_interval(days => %(older_than_days)s)
+      AND NOT EXISTS (
+          SELECT 1 FROM submissions p
+          WHERE p.challenge_id = c.challenge_id AND p.verification_status = 'pending'
+      )
+      AND NOT (
+          (c.reward_amount IS NOT NULL OR c.reward_pool IS NOT NULL)
+          AND EXISTS (
+              SELECT 1 FROM submissions w
+              WHERE w.challenge_id = c.challenge_id
+                AND w.verification_status = 'approved'
+                AND NOT EXISTS (SELECT 1 FROM payout_items i WHERE i.submission_id = w.submission_id)
+          )
+      )
+"""
+
+_MOVE_BATCH = f"""
+    WITH archivable AS ({_ARCHIVABLE_CHALLENGES}),
+    moved AS (
+        DELETE FROM submissions s
+        WHERE s.submission_id IN (
+            SELECT submission_id
+            FROM submissions
+            WHERE challenge_id IN (SELECT challenge_id FROM archivable)
+            ORDER BY submission_id
+            LIMIT %(batch_size)s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING s.submission_id, s.user_id, s.challenge_id, s.image_url,
+                  s.verification_status, s.created_at
+    ),
+    archived AS (
+        INSERT INTO submissions_archive (submission_id, user_id, challenge_id, image_url,
+                                         verification_status, created_at)
+        SELECT * FROM moved
+        RETURNING user_id
+    ),
+    moved_logs AS (
+        DELETE FROM verification_logs l
+        USING moved m
+        WHERE l.submission_id = m.submission_id
+        RETURNING l.log_id, l.submission_id, l.verification_result, l.ai_model_used, l.ai_prompt,
+                  l.ai_raw_response, l.error_message, l.api_call_duration_ms, l.created_at
+    ),
+    archived_logs AS (
+        INSERT INTO verification_logs_archive (log_id, submission_id, verification_result, ai_model_used,
+                                               ai_prompt, ai_raw_response, error_message,
+                                               api_call_duration_ms, created_at)
+        SELECT * FROM moved_logs
+    ),
+    counted AS (
+        INSERT INTO submission_archive_counts AS a (user_id, archived_submissions)
+        SELECT user_id, COUNT(*) FROM archived GROUP BY user_id
+        ON CONFLICT (user_id)
+        DO UPDATE SET archived_submissions = a.archived_submissions + EXCLUDED.archived_submissions
+    )
+    SELECT COUNT(*) AS moved FROM archived;
+"""
+
+# ============================================================
+# ARCHIVAL
+# ============================================================
+
+def archivable_challenges(conn, older_than_days: int = ARCHIVE_AFTER_DAYS) -> List[dict]:
+    """Challenges that would be archived now, with their hot submission counts"""
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute(f"""
+            WITH archivable AS ({_ARCHIVABLE_CHALLENGES})
+            SELECT a.challenge_id, COUNT(s.submission_id) AS submissions
+            FROM archivable a
+            JOIN submissions s ON s.challenge_id = a.challenge_id
+            GROUP BY a.challenge_id
+            ORDER BY a.challenge_id;
+        """, {"older_than_days": older_than_days})
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def ensure_partitions(cursor, older_than_days: int):
+    """Create the yearly archive partitions the archivable submissions fall into"""
+    cursor.execute(f"""
+        WITH archivable AS ({_ARCHIVABLE_CHALLENGES})
+        SELECT DISTINCT extract(year FROM s.created_at AT TIME ZONE 'UTC')::INT AS year
+        FROM submissions s
+        WHERE s.challenge_id IN (SELECT challenge_id FROM archivable)
+        ORDER BY year;
+    """, {"older_than_days": older_than_days})
+    for (year,) in cursor.fetchall():
+        name = f"submissions_archive_{year}"
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL;", (name,))
+        if cursor.fetchone()[0]:
+            continue
+        cursor.execute(
+            sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {} PARTITION OF submissions_archive
+                FOR VALUES FROM (%s) TO (%s);
+            """).format(sql.Identifier(name)),
+            (f"{year}-01-01T00:00:00Z", f"{year + 1}-01-01T00:00:00Z")
+        )
+
+
+def archive_submissions(
+    conn,
+    older_than_days: int = ARCHIVE_AFTER_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+) -> dict:
+    """
+    Move submissions of settled challenges expired more than
+    ``older_than_days`` ago into the archive, ``batch_size`` rows per
+    transaction. Returns ``{"archived": n, "batches": k}``.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    params = {"older_than_days": older_than_days, "batch_size": batch_size}
+    archived = batches = 0
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s);", (_ARCHIVE_LOCK_ID,))
+        ensure_partitions(cursor, older_than_days)
+        conn.commit()
+
+        while True:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s);", (_ARCHIVE_LOCK_ID,))
+            cursor.execute(_MOVE_BATCH, params)
+            moved = cursor.fetchone()[0]
+            conn.commit()
+            if moved == 0:
+                break
+            archived += moved
+            batches += 1
+            if moved < batch_size:
+                break
+        return {"archived": archived, "batches": batches}
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# ============================================================
+# CLI
+# ============================================================
+
+def main(argv=None):
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Archive submissions of long-expired challenges")
+    parser.add_argument('--older-than-days', type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help="List what would be archived")
+    args = parser.parse_args(argv)
+
+    load_dotenv('.env')
+    conn = psycopg2.connect(os.environ['TIMESCALE_SERVICE_URL'])
+    try:
+        if args.dry_run:
+            result = archivable_challenges(conn, args.older_than_days)
+        else:
+            result = archive_submissions(conn, args.older_than_days, args.batch_size)
+        print(json.dumps(result, indent=2))
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,424 @@
+"""
+Query Microbenchmarks
+Brand Challenge Mini App - pytest-benchmark suite for main.py's SQL and handlers
+
+Calls the loaders and endpoint functions of main.py in-process (no HTTP,
+no serialization through uvicorn) against a database filled by seed.py, so
+each number is the handler plus its statements. Every benchmark also runs
+once under a forced trace and stores the per-statement timings and row
+counts (tracing.py ``db.execute`` spans) in ``extra_info``, next to the
+table sizes it ran at.
+
+Compare scales by seeding each one and saving a run per scale:
+
+    python seed.py --scale 10k --reset
+    pytest bench_queries.py --benchmark-save=10k
+    python seed.py --scale 1m --reset
+    pytest bench_queries.py --benchmark-save=1m
+    pytest-benchmark compare --group-by=name --columns=min,median,max
+
+Needs pytest and pytest-benchmark (not in requirements.txt) and
+TIMESCALE_SERVICE_URL pointing at the seeded database. The write benchmarks
+rewrite a seeded user with its own values and restore it afterwards, and
+insert challenges, and submissions to challenges it has not entered, that are
+deleted again together with their verification logs. The expiry sweep is the
+real UPDATE: it expires every active challenge past its deadline, seeded or
+not, and the requeue claims every pending submission, so only run this
+against a benchmark database.
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault('INVALIDATION_BUS', 'local')
+os.environ.setdefault('SNAPSHOT_FILE', '')
+
+import archive  # noqa: E402
+import main  # noqa: E402
+import tracing  # noqa: E402
+from fastapi import Response  # noqa: E402
+from seed import CITIES, SEED_TELEGRAM_BASE, SEED_TITLE_PREFIX  # noqa: E402
+from verification import (  # noqa: E402
+    APPROVED, VERIFICATION_QUEUE_SIZE, VerificationJob, VerificationOutcome,
+)
+
+if not main.DATABASE_URL:
+    pytest.skip("TIMESCALE_SERVICE_URL is not set", allow_module_level=True)
+
+# Sampled flag set: every trace_request() below records spans
+_FORCE_SAMPLED = "00-" + "0" * 31 + "1-" + "0" * 15 + "1-01"
+
+
+class _LastTrace:
+    """Exporter that keeps the most recent finished trace in memory"""
+
+    root = None
+
+    def submit(self, root):
+        self.root = root
+
+    def flush(self, timeout: float = 5.0):
+        pass
+
+
+_last_trace = _LastTrace()
+tracing.configure(_last_trace)
+
+# ============================================================
+# FIXTURES
+# ============================================================
+
+@pytest.fixture(scope='session')
+def dataset():
+    """Table sizes and representative keys of the seeded data"""
+    conn = main.get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM users) AS users,
+                (SELECT COUNT(*) FROM challenges) AS challenges,
+                (SELECT COUNT(*) FROM submissions) AS submissions,
+                (SELECT COUNT(*) FROM submissions_archive) AS archived_submissions;
+        """)
+        sizes = dict(cursor.fetchone())
+        # Heaviest and median seeded participant (participation is power-law)
+        cursor.execute("""
+            WITH counts AS (
+                SELECT u.telegram_id, COUNT(*) AS n
+                FROM submissions s
+                JOIN users u ON s.user_id = u.user_id
+                WHERE u.telegram_id >= %s
+                GROUP BY u.telegram_id
+            )
+            SELECT
+                (SELECT telegram_id FROM counts ORDER BY n DESC, telegram_id LIMIT 1) AS heavy_user,
+                (SELECT telegram_id FROM counts ORDER BY n, telegram_id
+                 LIMIT 1 OFFSET (SELECT COUNT(*) / 2 FROM counts)) AS median_user,
+                (SELECT MAX(n) FROM counts) AS heavy_user_submissions;
+        """, (SEED_TELEGRAM_BASE,))
+        users = cursor.fetchone()
+        cursor.execute(
+            "SELECT MIN(challenge_id) AS challenge_id FROM challenges WHERE title LIKE %s;",
+            (f"{SEED_TITLE_PREFIX} %",)
+        )
+        challenge_id = cursor.fetchone()['challenge_id']
+    finally:
+        cursor.close()
+        conn.close()
+    if users['heavy_user'] is None:
+        pytest.skip("no seeded data; run seed.py first")
+    return {**sizes, **users, "challenge_id": challenge_id}
+
+
+@pytest.fixture
+def bench(benchmark, dataset):
+    """
+    ``bench(fn, *args)``: trace one call of fn for its statements, then
+    benchmark it. ``setup`` runs before every round (e.g. to drop caches).
+    """
+
+    def run(fn, *args, setup=None):
+        if setup is not None:
+            setup()
+        with tracing.trace_request(fn.__name__, _FORCE_SAMPLED, trusted=True):
+            fn(*args)
+        benchmark.extra_info.update({key: dataset[key] for key in (
+            'users', 'challenges', 'submissions', 'archived_submissions'
+        )})
+        benchmark.extra_info['statements'] = [
+            {
+                "statement": s.attributes.get('statement'),
+                "ms": round(s.duration_ms, 3),
+                "rows": s.attributes.get('rows'),
+            }
+            for s in _last_trace.root.walk() if s.name == 'db.execute'
+        ]
+        if setup is None:
+            return benchmark(fn, *args)
+        return benchmark.pedantic(fn, args, setup=setup, rounds=20, warmup_rounds=1)
+
+    return run
+
+
+@pytest.fixture
+def seeded_user(dataset):
+    """The heavy seeded user's row, restored after the test"""
+    conn = main.get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT user_id, telegram_id, username, first_name, last_name, photo_url, wallet_address
+            FROM users WHERE telegram_id = %s;
+        """, (dataset['heavy_user'],))
+        user = dict(cursor.fetchone())
+        conn.rollback()
+        yield user
+        cursor.execute("""
+            UPDATE users
+            SET username = %(username)s, first_name = %(first_name)s, last_name = %(last_name)s,
+                photo_url = %(photo_url)s, wallet_address = %(wallet_address)s
+            WHERE user_id = %(user_id)s;
+        """, user)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@pytest.fixture
+def fresh_challenges(seeded_user):
+    """Two active challenges the seeded user has not entered; their submissions are deleted afterwards"""
+    conn = main.get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT c.challenge_id, c.description
+            FROM challenges c
+            WHERE c.status = 'active' AND NOT EXISTS (
+                SELECT 1 FROM submissions s
+                WHERE s.user_id = %s AND s.challenge_id = c.challenge_id
+            )
+            ORDER BY c.challenge_id
+            LIMIT 2;
+        """, (seeded_user['user_id'],))
+        challenges = [dict(row) for row in cursor.fetchall()]
+        conn.rollback()
+        if len(challenges) < 2:
+            pytest.skip("the seeded user has entered every active challenge")
+        yield challenges
+        _delete_submissions(seeded_user['user_id'], [c['challenge_id'] for c in challenges])
+    finally:
+        cursor.close()
+        conn.close()
+
+
+_BENCH_CHALLENGE_TITLE = "bench_queries challenge"
+
+
+@pytest.fixture
+def bench_challenge():
+    """A challenge to insert; every inserted copy is deleted afterwards"""
+    yield main.ChallengeCreate(
+        title=_BENCH_CHALLENGE_TITLE, description="Benchmark challenge", image_url="https://example.com/bench.jpg",
+        reward_info="0 TON", deadline=datetime.now(timezone.utc) + timedelta(days=1),
+    )
+    conn = main.get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM challenges WHERE title = %s;", (_BENCH_CHALLENGE_TITLE,))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _delete_submissions(user_id, challenge_ids):
+    """Delete the user's submissions to challenge_ids and their verification logs"""
+    conn = main.get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            DELETE FROM verification_logs
+            WHERE submission_id IN (
+                SELECT submission_id FROM submissions WHERE user_id = %s AND challenge_id = ANY(%s)
+            );
+        """, (user_id, challenge_ids))
+        cursor.execute(
+            "DELETE FROM submissions WHERE user_id = %s AND challenge_id = ANY(%s);",
+            (user_id, challenge_ids)
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _drop_challenge_caches():
+    main.cache_registry.invalidate('challenges')
+
+# ============================================================
+# ANALYTICS
+# ============================================================
+
+@pytest.mark.benchmark(group='analytics')
+def test_health(bench):
+    bench(main.health_check)
+
+
+@pytest.mark.benchmark(group='analytics')
+def test_leaderboard(bench):
+    bench(main.get_leaderboard, 10, None)
+
+
+@pytest.mark.benchmark(group='analytics')
+def test_stats(bench):
+    bench(main.get_stats)
+
+# ============================================================
+# USER HISTORY
+# ============================================================
+
+@pytest.mark.benchmark(group='user-history')
+def test_user_submissions_heavy_first_page(bench, dataset):
+    bench(main.get_user_submissions, dataset['heavy_user'], 20, 0, None)
+
+
+@pytest.mark.benchmark(group='user-history')
+def test_user_submissions_heavy_deep_page(bench, dataset):
+    offset = max(dataset['heavy_user_submissions'] - 20, 0)
+    bench(main.get_user_submissions, dataset['heavy_user'], 20, offset, None)
+
+
+@pytest.mark.benchmark(group='user-history')
+def test_user_submissions_heavy_unpaged(bench, dataset):
+    bench(main.get_user_submissions, dataset['heavy_user'], None, 0, None)
+
+
+@pytest.mark.benchmark(group='user-history')
+def test_user_submissions_heavy_unpaged_sparse(bench, dataset):
+    bench(main.get_user_submissions, dataset['heavy_user'], None, 0, "id,verification_status")
+
+
+@pytest.mark.benchmark(group='user-history')
+def test_user_submissions_median(bench, dataset):
+    bench(main.get_user_submissions, dataset['median_user'], None, 0, None)
+
+
+@pytest.mark.benchmark(group='user-history')
+def test_bootstrap_user_heavy(bench, dataset):
+    bench(main.load_user_with_submissions, dataset['heavy_user'], 20)
+
+# ============================================================
+# CHALLENGES
+# ============================================================
+
+@pytest.mark.benchmark(group='challenges')
+def test_active_challenges_query(bench):
+    bench(main.load_active_challenges)
+
+
+@pytest.mark.benchmark(group='challenges')
+def test_challenges_cached(bench):
+    bench(main.get_challenges, Response(), None)
+
+
+@pytest.mark.benchmark(group='challenges')
+def test_challenges_cold_cache(bench):
+    bench(main.get_challenges, Response(), None, setup=_drop_challenge_caches)
+
+
+@pytest.mark.benchmark(group='challenges')
+def test_challenge_detail_query(bench, dataset):
+    bench(main.load_challenge, dataset['challenge_id'])
+
+
+@pytest.mark.benchmark(group='challenges')
+def test_search_database(bench):
+    bench(main.search_challenges_in_database, "display campaign", 20, 0, True)
+
+
+@pytest.mark.benchmark(group='challenges')
+def test_search_index_cold_cache(bench):
+    bench(main.search_challenges, "display campaign", 20, 0, False, setup=_drop_challenge_caches)
+
+
+@pytest.mark.benchmark(group='challenges')
+def test_nearby_cold_cache(bench):
+    _, lat, lng = CITIES[0]
+    bench(main.get_nearby_challenges, lat, lng, 25.0, None, None, setup=_drop_challenge_caches)
+
+# ============================================================
+# WRITES
+# ============================================================
+
+class _NoVerification:
+    """Verification pool stand-in with an empty queue that discards jobs"""
+
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=VERIFICATION_QUEUE_SIZE)
+
+    def submit_threadsafe(self, job):
+        pass
+
+
+_REQUEST = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(verification_pool=_NoVerification())))
+
+
+@pytest.mark.benchmark(group='writes')
+def test_login_upsert(bench, seeded_user):
+    login = main.UserLogin(**{key: seeded_user[key] for key in (
+        'telegram_id', 'username', 'first_name', 'last_name', 'photo_url'
+    )})
+    bench(main.upsert_user, login)
+
+
+@pytest.mark.benchmark(group='writes')
+def test_wallet_update(bench, seeded_user):
+    wallet = main.WalletLink(
+        telegram_id=seeded_user['telegram_id'],
+        wallet_address=seeded_user['wallet_address'] or "EQ" + "0" * 40
+    )
+    bench(main.link_wallet, wallet)
+
+
+@pytest.mark.benchmark(group='writes')
+def test_challenge_insert(bench, bench_challenge):
+    bench(main.insert_challenge, bench_challenge)
+
+
+@pytest.mark.benchmark(group='writes')
+def test_submission_insert(bench, seeded_user, fresh_challenges):
+    challenge_id = fresh_challenges[0]['challenge_id']
+    submission = main.SubmissionCreate(
+        telegram_id=seeded_user['telegram_id'], challenge_id=challenge_id, image_url="data:image/jpeg;base64,"
+    )
+    bench(
+        main.create_submission, submission, _REQUEST,
+        setup=lambda: _delete_submissions(seeded_user['user_id'], [challenge_id])
+    )
+
+
+@pytest.mark.benchmark(group='writes')
+def test_verification_result(bench, seeded_user, fresh_challenges):
+    challenge = fresh_challenges[1]
+    submission = main.create_submission(main.SubmissionCreate(
+        telegram_id=seeded_user['telegram_id'], challenge_id=challenge['challenge_id'],
+        image_url="data:image/jpeg;base64,"
+    ), _REQUEST)
+    job = VerificationJob(
+        submission_id=submission['id'], challenge_id=challenge['challenge_id'],
+        challenge_description=challenge['description'], image_url=submission['image_url']
+    )
+    outcome = VerificationOutcome(result=APPROVED, raw_response=APPROVED, model='bench', prompt='bench', duration_ms=1)
+    bench(main.record_verification_result, job, outcome)
+
+# ============================================================
+# BACKGROUND JOBS
+# ============================================================
+
+@pytest.mark.benchmark(group='jobs')
+def test_expiry_sweep(bench):
+    bench(main.expire_challenges)
+
+
+@pytest.mark.benchmark(group='jobs')
+def test_requeue_pending_verifications(bench):
+    bench(main.requeue_pending_verifications, _NoVerification())
+
+
+@pytest.mark.benchmark(group='jobs')
+def test_archivable_challenges(bench):
+    def archivable():
+        conn = main.get_db_connection()
+        try:
+            return archive.archivable_challenges(conn)
+        finally:
+            conn.rollback()
+            conn.close()
+
+    bench(archivable)
@@ -0,0 +1,137 @@
+"""
+Row Mapping Microbenchmark
+Brand Challenge Mini App - RealDictCursor + dict copy + FastAPI encoding vs RowMapper
+
+Runs both response paths over the same synthetic rows (no database needed)
+for GET /submissions/user/{telegram_id} and GET /leaderboard, and reports
+CPU time per request and peak traced memory:
+
+    python bench_rows.py --rows 10000
+"""
+
+import argparse
+import asyncio
+import os
+import timeit
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from psycopg2.extras import RealDictRow
+
+os.environ.setdefault('INVALIDATION_BUS', 'local')
+
+from main import LEADERBOARD_ROW, USER_SUBMISSION_ROW, UserSubmissionResponse  # noqa: E402
+
+SUBMISSION_COLUMNS = ['submission_id', 'challenge_id', 'challenge_title', 'image_url', 'verification_status', 'created_at']
+LEADERBOARD_COLUMNS = ['username', 'first_name', 'photo_url', 'submission_count']
+
+
+def make_rows(n: int):
+    start = datetime(2025, 11, 1, tzinfo=timezone.utc)
+    submissions = [
+        (i, i % 50, f"Challenge {i % 50}", f"https://cdn.example.com/{i}.jpg", 'approved', start + timedelta(seconds=i))
+        for i in range(n)
+    ]
+    leaderboard = [
+        (f"user{i}", f"First{i}", f"https://cdn.example.com/u{i}.jpg", n - i)
+        for i in range(n)
+    ]
+    return submissions, leaderboard
+
+
+def as_real_dict_rows(rows, columns):
+    """What RealDictCursor.fetchall() would have returned"""
+    return [RealDictRow(zip(columns, row)) for row in rows]
+
+# ============================================================
+# BASELINE (previous handlers)
+# ============================================================
+
+SUBMISSIONS_FIELD = create_model_field(name='response', type_=List[UserSubmissionResponse], mode='serialization')
+
+
+def baseline_submissions(tuples):
+    submissions = as_real_dict_rows(tuples, SUBMISSION_COLUMNS)
+    content = [
+        {
+            "id": s['submission_id'],
+            "challenge_id": s['challenge_id'],
+            "challenge_title": s['challenge_title'],
+            "image_url": s['image_url'],
+            "verification_status": s['verification_status'],
+            "created_at": s['created_at'].isoformat()
+        }
+        for s in submissions
+    ]
+    encoded = asyncio.run(serialize_response(field=SUBMISSIONS_FIELD, response_content=content))
+    return JSONResponse(encoded).body
+
+
+def baseline_leaderboard(tuples):
+    leaderboard = as_real_dict_rows(tuples, LEADERBOARD_COLUMNS)
+    content = [
+        {
+            "username": l['username'],
+            "first_name": l['first_name'],
+            "photo_url": l['photo_url'],
+            "submission_count": l['submission_count']
+        }
+        for l in leaderboard
+    ]
+    encoded = asyncio.run(serialize_response(response_content=content))
+    return JSONResponse(encoded).body
+
+# ============================================================
+# ROW MAPPER
+# ============================================================
+
+def mapped_submissions(tuples):
+    return USER_SUBMISSION_ROW.response(tuples).body
+
+
+def mapped_leaderboard(tuples):
+    return LEADERBOARD_ROW.response(tuples).body
+
+# ============================================================
+# MEASUREMENT
+# ============================================================
+
+def measure(fn, rows, repeat: int):
+    seconds = min(timeit.repeat(lambda: fn(rows), number=1, repeat=repeat))
+    tracemalloc.start()
+    fn(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark row mapping for list endpoints")
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    submissions, leaderboard = make_rows(args.rows)
+    cases = [
+        ("/submissions/user", submissions, baseline_submissions, mapped_submissions),
+        ("/leaderboard", leaderboard, baseline_leaderboard, mapped_leaderboard),
+    ]
+
+    print(f"{args.rows} rows, best of {args.repeat}\n")
+    print(f"{'endpoint':<20}{'path':<10}{'time ms':>10}{'peak MiB':>10}")
+    for name, rows, baseline, mapped in cases:
+        # Both paths must produce byte-identical responses
+        assert baseline(rows) == mapped(rows), f"{name}: responses differ"
+        base_s, base_peak = measure(baseline, rows, args.repeat)
+        map_s, map_peak = measure(mapped, rows, args.repeat)
+        print(f"{name:<20}{'baseline':<10}{base_s * 1000:>10.1f}{base_peak / 2**20:>10.2f}")
+        print(f"{'':<20}{'mapper':<10}{map_s * 1000:>10.1f}{map_peak / 2**20:>10.2f}")
+        print(f"{'':<20}{'ratio':<10}{base_s / map_s:>9.1f}x{base_peak / map_peak:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""
+Query Budgets
+Brand Challenge Mini App - Per-route statement timeouts, disconnect cancellation and concurrency caps
+
+Every route runs under a budget (QUERY_BUDGET_MS unless main.py lists the
+route in ROUTE_BUDGETS):
+
+- ``timeout_ms`` becomes the ``statement_timeout`` of each connection the
+  request acquires (``get_db_connection`` calls ``attach``). A statement
+  that runs past it is cancelled by Postgres and the request fails with
+  504. ``None`` runs without a timeout (exports, payout computation).
+- When the HTTP client disconnects, the request's in-flight statements are
+  cancelled instead of running to completion for nobody. Only GET/HEAD
+  routes are watched: reading the disconnect from the ASGI receive channel
+  would otherwise race a request body (including raw bodies read through
+  ``Request.stream()``).
+- ``max_concurrent`` caps how many requests of an expensive route run at
+  once in this worker, so they cannot take every pooled connection from
+  the hot paths; requests over the cap get 503 immediately. A request
+  holds its slot until the response body has been sent, so streamed
+  exports count for as long as they stream.
+
+Violations are counted in metrics.py (GET /metrics).
+"""
+
+import asyncio
+import logging
+import os
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+import psycopg2.errors
+from fastapi import HTTPException
+
+from metrics import registry
+from tracing import TracedRoute
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+
+QUERY_BUDGET_MS = int(os.environ.get('QUERY_BUDGET_MS', '5000'))
+
+BUDGET_EXCEEDED = registry.counter(
+    'proofquest_query_budget_exceeded_total',
+    'Requests failed because a statement ran past the route statement_timeout',
+    ['route'],
+)
+CANCELLED_ON_DISCONNECT = registry.counter(
+    'proofquest_query_cancelled_on_disconnect_total',
+    'Requests whose statements were cancelled because the client disconnected',
+    ['route'],
+)
+CONCURRENCY_REJECTED = registry.counter(
+    'proofquest_route_concurrency_rejected_total',
+    'Requests rejected because the route was at max_concurrent',
+    ['route'],
+)
+
+
+class RouteBudget:
+    __slots__ = ('timeout_ms', 'max_concurrent')
+
+    def __init__(self, timeout_ms: Optional[int] = QUERY_BUDGET_MS, max_concurrent: Optional[int] = None):
+        self.timeout_ms = timeout_ms
+        self.max_concurrent = max_concurrent
+
+
+class RequestBudget:
+    """One request's budget and the connections it has acquired"""
+
+    __slots__ = ('route', 'timeout_ms', 'connections', 'disconnected')
+
+    def __init__(self, route: str, timeout_ms: Optional[int]):
+        self.route = route
+        self.timeout_ms = timeout_ms
+        self.connections: List = []
+        self.disconnected = False
+
+    def cancel(self):
+        """Cancel whatever the request's connections are running (called off the event loop)"""
+        for conn in self.connections:
+            if conn._owner is self and not conn.closed:
+                try:
+                    conn.cancel()
+                except Exception as e:
+                    logger.debug("Cancel on %s failed: %s", self.route, e)
+
+
+_current: ContextVar[Optional[RequestBudget]] = ContextVar('query_budget', default=None)
+
+
+def attach(conn):
+    """
+    Apply the current request's statement_timeout to a freshly acquired
+    pooled connection. Outside a budgeted request (background jobs) the
+    server default is restored.
+    """
+    budget = _current.get()
+    conn.set_statement_timeout(budget.timeout_ms if budget is not None else None)
+    if budget is not None:
+        conn._owner = budget
+        budget.connections.append(conn)
+
+
+def _query_canceled(error: BaseException) -> bool:
+    """True when a QueryCanceled is anywhere in the exception chain (handlers wrap it in HTTPException)"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, psycopg2.errors.QueryCanceled):
+            return True
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class _ReleaseAfterSend:
+    """ASGI response wrapper that releases a concurrency slot once the response has been sent"""
+
+    def __init__(self, response, release):
+        self.response = response
+        self.release = release
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.response(scope, receive, send)
+        finally:
+            self.release()
+
+
+async def _cancel_on_disconnect(request, budget: RequestBudget):
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            break
+    budget.disconnected = True
+    if budget.connections:
+        CANCELLED_ON_DISCONNECT.inc(budget.route)
+        await asyncio.to_thread(budget.cancel)
+
+# ============================================================
+# ROUTE CLASS
+# ============================================================
+
+def budgeted_route_class(budgets: Dict[str, Optional[RouteBudget]], default: RouteBudget = RouteBudget()):
+    """
+    APIRoute class (app.router.route_class) enforcing ``budgets`` by route
+    path; routes mapped to None run without any budget.
+    """
+
+    class BudgetedRoute(TracedRoute):
+        def get_route_handler(self):
+            handler = super().get_route_handler()
+            config = budgets.get(self.path, default)
+            if config is None:
+                return handler
+
+            route = self.path
+            limit = asyncio.Semaphore(config.max_concurrent) if config.max_concurrent else None
+            watch_disconnect = self.methods <= {"GET", "HEAD"}
+
+            async def run(request):
+                budget = RequestBudget(route, config.timeout_ms)
+                token = _current.set(budget)
+                watcher = asyncio.create_task(_cancel_on_disconnect(request, budget)) if watch_disconnect else None
+                try:
+                    return await handler(request)
+                except Exception as e:
+                    if config.timeout_ms is None or budget.disconnected or not _query_canceled(e):
+                        raise
+                    BUDGET_EXCEEDED.inc(route)
+                    raise HTTPException(
+                        status_code=504,
+                        detail=f"Query budget of {config.timeout_ms} ms exceeded"
+                    ) from e
+                finally:
+                    if watcher is not None:
+                        watcher.cancel()
+                    _current.reset(token)
+
+            if limit is None:
+                return run
+
+            async def limited(request):
+                if limit.locked():
+                    CONCURRENCY_REJECTED.inc(route)
+                    raise HTTPException(
+                        status_code=503,
+                        detail=f"Too many concurrent requests for {route}",
+                        headers={"Retry-After": "1"}
+                    )
+                await limit.acquire()
+                try:
+                    response = await run(request)
+                except BaseException:
+                    limit.release()
+                    raise
+                # Streaming responses run their queries while the body is sent
+                return _ReleaseAfterSend(response, limit.release)
+
+            return limited
+
+    return BudgetedRoute
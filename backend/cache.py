@@ -0,0 +1,157 @@
+"""
+Read Caches & Cross-process Invalidation
+Brand Challenge Mini App - Coherent in-process caches for multi-worker deployments
+
+Every worker process keeps its own caches. Writes publish an invalidation
+message on an InvalidationBus and every process (including the writer) drops
+the affected entries:
+
+- PgInvalidationBus: Postgres NOTIFY on ``proofquest_invalidate``, received
+  through the shared PgListener connection. Triggers in
+  migrations/003_cache_invalidation.sql publish for any write to the
+  challenges table, including manual SQL.
+- LocalInvalidationBus: in-process stand-in for tests and single-process runs.
+
+While the listener connection is down, notifications can be missed, so caches
+are bypassed until it reconnects and everything is flushed.
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = 'proofquest_invalidate'
+
+_MISSING = object()
+
+# ============================================================
+# CACHE
+# ============================================================
+
+class InvalidatingCache:
+    """
+    Thread-safe TTL cache invalidated by topic.
+
+    A generation counter guards against the load/invalidate race: a value
+    loaded while an invalidation arrived is returned to its caller but not
+    stored, so a stale read can never outlive the invalidation.
+    """
+
+    def __init__(self, topic: str, ttl_s: float, max_entries: int = 10000):
+        self.topic = topic
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.enabled: Callable[[], bool] = lambda: True
+        self._entries: Dict[Hashable, tuple] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        if not self.enabled():
+            return loader()
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+            generation = self._generation
+
+        value = loader()
+
+        with self._lock:
+            if generation == self._generation:
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+                self._entries[key] = (value, time.monotonic() + self.ttl_s)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one key, or every key when key is None"""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+class CacheRegistry:
+    """Maps invalidation topics to the caches that depend on them"""
+
+    def __init__(self):
+        self._caches: Dict[str, List[InvalidatingCache]] = {}
+        self.coherent: Callable[[], bool] = lambda: True
+
+    def register(self, cache: InvalidatingCache) -> InvalidatingCache:
+        cache.enabled = lambda: self.coherent()
+        self._caches.setdefault(cache.topic, []).append(cache)
+        return cache
+
+    def invalidate(self, topic: str, key: Optional[Hashable] = None):
+        for cache in self._caches.get(topic, ()):
+            cache.invalidate(key)
+
+    def invalidate_all(self):
+        for caches in self._caches.values():
+            for cache in caches:
+                cache.invalidate()
+
+    def on_message(self, payload: str):
+        """Bus callback - payload is {"topic": ..., "key": ...} JSON"""
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed invalidation payload: %r", payload)
+            return
+        self.invalidate(message.get('topic'), message.get('key'))
+
+
+# ============================================================
+# INVALIDATION BUSES
+# ============================================================
+
+def invalidation_payload(topic: str, key: Optional[Hashable] = None) -> str:
+    return json.dumps({'topic': topic, 'key': key})
+
+
+class LocalInvalidationBus:
+    """In-process stand-in for PgInvalidationBus"""
+
+    def __init__(self, registry: CacheRegistry):
+        self.registry = registry
+
+    def publish(self, topic: str, key: Optional[Hashable] = None, cursor=None):
+        self.registry.on_message(invalidation_payload(topic, key))
+
+    def attach(self, listener):
+        pass
+
+
+class PgInvalidationBus:
+    """
+    Postgres NOTIFY bus.
+
+    ``publish`` with a cursor sends the NOTIFY inside the caller's transaction,
+    so other processes only see it after commit. The publishing process also
+    invalidates locally right away so its own next read is fresh.
+    """
+
+    def __init__(self, registry: CacheRegistry):
+        self.registry = registry
+
+    def publish(self, topic: str, key: Optional[Hashable] = None, cursor=None):
+        payload = invalidation_payload(topic, key)
+        if cursor is not None:
+            cursor.execute("SELECT pg_notify(%s, %s);", (INVALIDATION_CHANNEL, payload))
+        self.registry.on_message(payload)
+
+    def attach(self, listener):
+        """Subscribe to the shared PgListener and bypass caches while it is down"""
+        listener.subscribe(INVALIDATION_CHANNEL, self.registry.on_message)
+        listener.on_connect(self.registry.invalidate_all)
+        self.registry.coherent = lambda: listener.connected
@@ -0,0 +1,298 @@
+"""
+Challenge Import
+Brand Challenge Mini App - Streaming CSV / NDJSON validation and COPY load for POST /challenges/bulk
+
+The request body is fed to a ChallengeImport chunk by chunk as it arrives.
+Every complete record is validated against the ChallengeCreate model and
+written to a spooled file in COPY text format, so memory stays bounded and
+a bad row is reported with its line number without loading anything.
+
+Once the whole body is valid, ``load_challenges`` copies the spool into a
+temporary table and inserts it into ``challenges`` with one
+``INSERT ... SELECT``, all in one transaction: either every challenge of
+the campaign exists or none does. The statement-level invalidation trigger
+(migrations/003_cache_invalidation.sql) fires once, on commit, so every
+worker drops its challenge caches for the whole batch at once.
+
+CSV needs a header row naming the columns; NDJSON is one JSON object per
+line. Unknown columns are rejected and empty CSV fields are NULL. Lines and
+CSV records longer than CHALLENGE_IMPORT_MAX_RECORD_BYTES are rejected
+without being buffered.
+"""
+
+import csv
+import json
+import os
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Type
+
+import psycopg2.extensions
+from pydantic import BaseModel, ValidationError
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+
+CHALLENGE_IMPORT_MAX_ROWS = int(os.environ.get('CHALLENGE_IMPORT_MAX_ROWS', '10000'))
+CHALLENGE_IMPORT_MAX_RECORD_BYTES = int(os.environ.get('CHALLENGE_IMPORT_MAX_RECORD_BYTES', '65536'))
+
+# Invalid rows listed in the error response (all are counted)
+CHALLENGE_IMPORT_MAX_ERRORS = 50
+
+# Spool stays in memory up to this size, then moves to a temp file
+_SPOOL_MEMORY_BYTES = 8 * 2**20
+
+IMPORT_FORMATS = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+}
+
+IMPORT_COLUMNS = [
+    'title',
+    'description',
+    'image_url',
+    'reward_info',
+    'deadline',
+    'reward_amount',
+    'reward_pool',
+    'latitude',
+    'longitude',
+    'location',
+    'category',
+]
+
+
+class ChallengeImportError(Exception):
+    """The body has invalid rows (nothing is loaded)"""
+
+    def __init__(self, message: str, errors: Optional[List[dict]] = None, invalid_rows: int = 0):
+        super().__init__(message)
+        self.errors = errors or []
+        self.invalid_rows = invalid_rows
+
+    def detail(self) -> dict:
+        return {"message": str(self), "invalid_rows": self.invalid_rows, "errors": self.errors}
+
+
+class ChallengeImportTooLarge(ChallengeImportError):
+    """More than CHALLENGE_IMPORT_MAX_ROWS rows"""
+
+# ============================================================
+# COPY TEXT FORMAT
+# ============================================================
+
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return format(value, 'f')
+    return str(value).translate(_COPY_ESCAPES)
+
+# ============================================================
+# STREAMING PARSER / VALIDATOR
+# ============================================================
+
+class ChallengeImport:
+    """
+    Incremental parser: ``feed(chunk)`` as body chunks arrive, then
+    ``close()``. Raises ChallengeImportError (after the whole body has been
+    read) when any row is invalid. The caller closes ``spool``.
+    """
+
+    def __init__(
+        self,
+        fmt: str,
+        model: Type[BaseModel],
+        max_rows: int = CHALLENGE_IMPORT_MAX_ROWS,
+        max_record_bytes: int = CHALLENGE_IMPORT_MAX_RECORD_BYTES,
+    ):
+        if fmt not in IMPORT_FORMATS.values():
+            raise ValueError(f"Unsupported import format: {fmt}")
+        self.fmt = fmt
+        self.model = model
+        self.max_rows = max_rows
+        self.max_record_bytes = max_record_bytes
+        self.rows = 0
+        self.invalid_rows = 0
+        self.errors: List[dict] = []
+        self.spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MEMORY_BYTES, mode='w+', encoding='utf-8')
+        self._pending = b''
+        self._record = ''
+        self._header: Optional[List[str]] = None
+        self._line_no = 0
+        # Discarding the rest of an overlong line
+        self._skipping = False
+
+    def feed(self, chunk: bytes):
+        lines = (self._pending + chunk).split(b'\n')
+        self._pending = lines.pop()
+        for line in lines:
+            if self._skipping:
+                self._skipping = False
+                continue
+            self._line(line + b'\n')
+        if len(self._pending) > self.max_record_bytes:
+            if not self._skipping:
+                self._line_no += 1
+                self._too_long()
+                self._skipping = True
+            self._pending = b''
+
+    def close(self):
+        if self._pending and not self._skipping:
+            self._line(self._pending)
+        self._pending = b''
+        if self._record:
+            self._reject(self._line_no, "Unterminated quoted field")
+            self._record = ''
+        if self.rows == 0 and self.invalid_rows == 0:
+            raise ChallengeImportError("No challenges in request body")
+        if self.invalid_rows:
+            raise ChallengeImportError(
+                f"{self.invalid_rows} invalid row(s); nothing was imported",
+                self.errors, self.invalid_rows
+            )
+        self.spool.seek(0)
+
+    # ---------------- records ----------------
+
+    def _line(self, raw: bytes):
+        self._line_no += 1
+        if len(raw) > self.max_record_bytes:
+            self._too_long()
+            return
+        try:
+            line = raw.decode('utf-8')
+        except UnicodeDecodeError:
+            self._reject(self._line_no, "Not valid UTF-8")
+            return
+        if self.fmt == 'ndjson':
+            if line.strip():
+                self._ndjson_record(line)
+            return
+        # A CSV record is complete once its quotes balance (quoted fields may span lines)
+        self._record += line
+        if len(self._record) > self.max_record_bytes:
+            self._too_long()
+            return
+        if self._record.count('"') % 2:
+            return
+        record, self._record = self._record, ''
+        if record.strip():
+            self._csv_record(record)
+
+    def _ndjson_record(self, line: str):
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            self._reject(self._line_no, f"Invalid JSON: {e}")
+            return
+        if not isinstance(data, dict):
+            self._reject(self._line_no, "Expected a JSON object")
+            return
+        self._row(data)
+
+    def _csv_record(self, record: str):
+        values = next(csv.reader([record]))
+        if self._header is None:
+            header = [name.strip().lstrip('\ufeff') for name in values]
+            unknown = sorted(set(header) - set(IMPORT_COLUMNS))
+            if unknown:
+                raise ChallengeImportError(f"Unknown column(s): {', '.join(unknown)}")
+            missing = [
+                name for name, field in self.model.model_fields.items()
+                if field.is_required() and name not in header
+            ]
+            if missing:
+                raise ChallengeImportError(f"Missing column(s): {', '.join(missing)}")
+            self._header = header
+            return
+        if len(values) != len(self._header):
+            self._reject(self._line_no, f"Expected {len(self._header)} fields, got {len(values)}")
+            return
+        self._row({name: value if value != '' else None for name, value in zip(self._header, values)})
+
+    def _row(self, data: Dict):
+        row_no = self.rows + self.invalid_rows + 1
+        if row_no > self.max_rows:
+            raise ChallengeImportTooLarge(f"More than {self.max_rows} challenges in one request")
+        unknown = sorted(set(data) - set(IMPORT_COLUMNS))
+        if unknown:
+            self._reject(self._line_no, f"Unknown field(s): {', '.join(unknown)}")
+            return
+        try:
+            challenge = self.model.model_validate(data)
+        except ValidationError as e:
+            self._reject(self._line_no, "; ".join(
+                f"{'.'.join(str(loc) for loc in err['loc']) or 'row'}: {err['msg']}" for err in e.errors()
+            ))
+            return
+        self.rows += 1
+        self.spool.write('\t'.join(
+            [str(self.rows)] + [_copy_value(getattr(challenge, column)) for column in IMPORT_COLUMNS]
+        ) + '\n')
+
+    def _too_long(self):
+        """Reject the current line (and any CSV record it belongs to)"""
+        self._record = ''
+        self._reject(self._line_no, f"Longer than {self.max_record_bytes} bytes")
+
+    def _reject(self, line_no: int, message: str):
+        self.invalid_rows += 1
+        if len(self.errors) < CHALLENGE_IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line_no, "error": message})
+
+# ============================================================
+# LOAD
+# ============================================================
+
+def load_challenges(conn, challenge_import: ChallengeImport) -> List[int]:
+    """
+    COPY a closed import into ``challenges`` in one transaction and return
+    the new challenge IDs in input order. The caller owns (and closes) conn
+    and the import's spool.
+    """
+    cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+    try:
+        cursor.execute("""
+            CREATE TEMP TABLE challenge_import (
+                row_no INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                description TEXT NOT NULL,
+                image_url TEXT NOT NULL,
+                reward_info TEXT NOT NULL,
+                deadline TIMESTAMPTZ NOT NULL,
+                reward_amount NUMERIC(20, 9),
+                reward_pool NUMERIC(20, 9),
+                latitude DOUBLE PRECISION,
+                longitude DOUBLE PRECISION,
+                location TEXT,
+                category TEXT
+            ) ON COMMIT DROP;
+        """)
+        cursor.copy_expert(
+            f"COPY challenge_import (row_no, {', '.join(IMPORT_COLUMNS)}) FROM STDIN;",
+            challenge_import.spool
+        )
+        cursor.execute(f"""
+            INSERT INTO challenges ({', '.join(IMPORT_COLUMNS)})
+            SELECT {', '.join(IMPORT_COLUMNS)}
+            FROM challenge_import
+            ORDER BY row_no
+            RETURNING challenge_id;
+        """)
+        challenge_ids = sorted(row[0] for row in cursor.fetchall())
+        conn.commit()
+        return challenge_ids
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,159 @@
+"""
+Response Compression
+Brand Challenge Mini App - Negotiated brotli/gzip for JSON and other buffered responses
+
+An ASGI middleware that compresses a response when the client accepts it
+(``Accept-Encoding``, q-values honoured, brotli preferred over gzip) and the
+body is at least COMPRESSION_MIN_BYTES. Only responses sent as a single body
+message are compressed, which covers every JSON endpoint; streaming
+responses (SSE on /events, CSV/Parquet exports) pass through untouched so
+events are never held back in a compressor buffer. Bodies that already carry
+a ``Content-Encoding`` are left alone as well.
+
+Brotli needs the optional ``brotli`` package; without it only gzip is
+offered. Large bodies are compressed in a worker thread so the event loop
+keeps serving other requests.
+"""
+
+import asyncio
+import gzip
+import os
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+BROTLI_AVAILABLE = brotli is not None
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+
+# Bodies above this are compressed off the event loop
+_THREAD_MIN_BYTES = 256 * 1024
+
+_SKIP_CONTENT_TYPES = (b'text/event-stream',)
+
+# ============================================================
+# NEGOTIATION
+# ============================================================
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """'br', 'gzip' or None for an Accept-Encoding header value"""
+    quality = {}
+    for part in accept_encoding.split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        quality[token] = q
+
+    wildcard = quality.get('*', 0.0)
+    offered = ['br', 'gzip'] if BROTLI_AVAILABLE else ['gzip']
+    best, best_q = None, 0.0
+    for encoding in offered:
+        q = quality.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+# ============================================================
+# MIDDLEWARE
+# ============================================================
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope.get("headers", ()):
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = start.get("headers", [])
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or any(
+                    name == b"content-encoding"
+                    or (name == b"content-type" and value.startswith(_SKIP_CONTENT_TYPES))
+                    for name, value in headers
+                )
+            ):
+                # Streaming, small or already encoded: send as is
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) >= _THREAD_MIN_BYTES:
+                compressed = await asyncio.to_thread(compress, body, encoding)
+            else:
+                compressed = compress(body, encoding)
+            headers = [
+                (name, value) for name, value in headers
+                if name not in (b"content-length", b"vary")
+            ] + [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", _vary(start.get("headers", []))),
+            ]
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _vary(headers) -> bytes:
+    existing = [value for name, value in headers if name == b"vary"]
+    if not existing:
+        return b"Accept-Encoding"
+    vary = b", ".join(existing)
+    if b"accept-encoding" in vary.lower():
+        return vary
+    return vary + b", Accept-Encoding"
@@ -3,7 +3,7 @@ FastAPI Database Models & Connection Setup
 Brand Challenge Mini App - Example Implementation
 """
 
-from sqlalchemy import create_engine, Column, BigInteger, Text, TIMESTAMP, CheckConstraint, ForeignKey, UniqueConstraint
+from sqlalchemy import create_engine, Column, BigInteger, Float, Numeric, Text, TIMESTAMP, CheckConstraint, ForeignKey, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.sql import func
@@ -48,13 +48,20 @@ class Challenge(Base):
     description = Column(Text, nullable=False)
     image_url = Column(Text, nullable=False)
     reward_info = Column(Text, nullable=False)
+    reward_amount = Column(Numeric(20, 9))
+    reward_pool = Column(Numeric(20, 9))
     deadline = Column(TIMESTAMP(timezone=True), nullable=False)
     status = Column(Text, nullable=False, default='active', index=True)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    location = Column(Text)
+    category = Column(Text)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     
     __table_args__ = (
         CheckConstraint("status IN ('active', 'expired')", name='challenges_status_check'),
+        CheckConstraint("(latitude IS NULL) = (longitude IS NULL)", name='challenges_coordinates_check'),
     )
     
     # Relationships
@@ -68,9 +75,11 @@ class Submission(Base):
     user_id = Column(BigInteger, ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False, index=True)
     challenge_id = Column(BigInteger, ForeignKey('challenges.challenge_id', ondelete='CASCADE'), nullable=False, index=True)
     image_url = Column(Text, nullable=False)
+    verification_status = Column(Text, nullable=False, server_default='pending')
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
     
     __table_args__ = (
+        CheckConstraint("verification_status IN ('pending', 'approved', 'rejected', 'error')", name='submissions_verification_status_check'),
         UniqueConstraint('user_id', 'challenge_id', name='submissions_user_id_challenge_id_key'),
     )
     
@@ -79,6 +88,28 @@ class Submission(Base):
     challenge = relationship("Challenge", back_populates="submissions")
 
 
+class SubmissionArchive(Base):
+    """Submissions of long-expired challenges (archive.py); range-partitioned by created_at year"""
+    __tablename__ = "submissions_archive"
+    
+    submission_id = Column(BigInteger, primary_key=True)
+    user_id = Column(BigInteger, ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False)
+    challenge_id = Column(BigInteger, ForeignKey('challenges.challenge_id', ondelete='CASCADE'), nullable=False)
+    image_url = Column(Text, nullable=False)
+    verification_status = Column(Text, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), primary_key=True)
+    archived_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    
+    __table_args__ = {'postgresql_partition_by': 'RANGE (created_at)'}
+
+
+class SubmissionArchiveCount(Base):
+    __tablename__ = "submission_archive_counts"
+    
+    user_id = Column(BigInteger, ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    archived_submissions = Column(BigInteger, nullable=False, server_default='0')
+
+
 # ============================================================
 # Database Dependency for FastAPI
 # ============================================================
@@ -0,0 +1,232 @@
+"""
+Database Connection Pool
+Brand Challenge Mini App - Bounded per-process psycopg2 pool
+
+Connections are reused across requests instead of being opened per call.
+Handlers keep the existing ``conn = get_db_connection() ... conn.close()``
+pattern: ``close()`` on a pooled connection rolls back any open transaction
+and returns it to the pool. At most DB_POOL_MAX connections exist per
+process; callers wait up to DB_ACQUIRE_TIMEOUT_S for a free one.
+
+When the server cannot be reached (refused, timed out, unresolvable or
+unreachable host) the pool trips: idle connections are still handed out, but
+an acquire that would open a new connection fails immediately with
+DatabaseUnavailable (reads can fall back to snapshots, writes fail fast)
+while a background probe reconnects every DB_RETRY_S. Other connect errors,
+such as "too many clients" or bad credentials, fail that acquire only.
+
+Sizing (see README "Multi-worker Deployment"):
+
+    WEB_CONCURRENCY * (DB_POOL_MAX + 1 listener) <= max_connections - reserved
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import List, Optional
+
+import psycopg2
+import psycopg2.extensions
+
+from tracing import span, traced_cursor_class
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', '10'))
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', '0'))
+DB_ACQUIRE_TIMEOUT_S = float(os.environ.get('DB_ACQUIRE_TIMEOUT_S', '5'))
+DB_CONNECT_TIMEOUT_S = int(os.environ.get('DB_CONNECT_TIMEOUT_S', '3'))
+DB_RETRY_S = float(os.environ.get('DB_RETRY_S', '2'))
+
+# libpq connect errors that mean the server is unreachable (they carry no SQLSTATE)
+_UNREACHABLE_ERRORS = (
+    'connection refused',
+    'timeout expired',
+    'could not translate host name',
+    'no route to host',
+    'network is unreachable',
+    'host is unreachable',
+    'no such file or directory',  # Unix socket of a stopped server
+    'server closed the connection unexpectedly',
+    'the database system is starting up',
+    'the database system is shutting down',
+)
+
+
+class PoolExhausted(Exception):
+    """No connection became available within the acquire timeout"""
+
+
+class DatabaseUnavailable(Exception):
+    """The database could not be reached; raised immediately until a probe reconnects"""
+
+
+def _is_unreachable(error: psycopg2.OperationalError) -> bool:
+    """True when a connect error means the server cannot be reached at all"""
+    message = str(error).lower()
+    return any(marker in message for marker in _UNREACHABLE_ERRORS)
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """
+    psycopg2 connection whose close() returns it to its pool.
+    Cursors and commits are traced (see tracing.py).
+    """
+
+    _pool: Optional["ConnectionPool"] = None
+    _in_use = False
+    # Whoever holds the connection (see budgets.py); cleared on release
+    _owner = None
+    # Session statement_timeout last set; None = server default
+    _statement_timeout_ms: Optional[int] = None
+
+    def cursor(self, *args, cursor_factory=None, **kwargs):
+        factory = cursor_factory or self.cursor_factory or psycopg2.extensions.cursor
+        return super().cursor(*args, cursor_factory=traced_cursor_class(factory), **kwargs)
+
+    def commit(self):
+        with span('db.commit'):
+            super().commit()
+
+    def set_statement_timeout(self, timeout_ms: Optional[int]):
+        """
+        Set the session statement_timeout (None restores the server default).
+        Must be called between transactions; a no-op when unchanged.
+        """
+        if timeout_ms == self._statement_timeout_ms:
+            return
+        self.autocommit = True
+        try:
+            with self.cursor() as cursor:
+                if timeout_ms is None:
+                    cursor.execute("RESET statement_timeout;")
+                else:
+                    cursor.execute("SET statement_timeout = %s;", (int(timeout_ms),))
+        finally:
+            self.autocommit = False
+        self._statement_timeout_ms = timeout_ms
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.release(self)
+        else:
+            super().close()
+
+    def discard(self):
+        """Really close the underlying connection"""
+        self._pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """Thread-safe LIFO pool with a hard cap and blocking acquire"""
+
+    def __init__(
+        self,
+        dsn: Optional[str],
+        max_size: int = DB_POOL_MAX,
+        min_size: int = DB_POOL_MIN,
+        acquire_timeout_s: float = DB_ACQUIRE_TIMEOUT_S,
+        retry_s: float = DB_RETRY_S,
+        **connect_kwargs,
+    ):
+        self.dsn = dsn
+        self.max_size = max_size
+        self.acquire_timeout_s = acquire_timeout_s
+        self.retry_s = retry_s
+        self.connect_kwargs = {'connect_timeout': DB_CONNECT_TIMEOUT_S, **connect_kwargs}
+        self._idle: List[PooledConnection] = []
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._down = False
+        self._closed = False
+        self._probe: Optional[threading.Thread] = None
+        for _ in range(min_size):
+            self._idle.append(self._connect())
+
+    def _connect(self) -> PooledConnection:
+        conn = psycopg2.connect(self.dsn, connection_factory=PooledConnection, **self.connect_kwargs)
+        conn._pool = self
+        return conn
+
+    def _trip(self, error: Exception):
+        with self._lock:
+            if self._down or self._closed:
+                return
+            self._down = True
+            self._probe = threading.Thread(target=self._reconnect, name="db-pool-probe", daemon=True)
+            self._probe.start()
+        logger.warning("Database unavailable, failing fast until it reconnects: %s", error)
+
+    def _reconnect(self):
+        while not self._closed:
+            time.sleep(self.retry_s)
+            try:
+                conn = self._connect()
+            except Exception:
+                continue
+            with self._lock:
+                self._idle.append(conn)
+                self._down = False
+            logger.info("Database reachable again")
+            return
+
+    def acquire(self) -> PooledConnection:
+        if self._down and not self._idle:
+            raise DatabaseUnavailable("Database unreachable, retrying in the background")
+        with span('db.acquire'):
+            if not self._slots.acquire(timeout=self.acquire_timeout_s):
+                raise PoolExhausted(f"No database connection available within {self.acquire_timeout_s}s")
+            try:
+                while True:
+                    with self._lock:
+                        conn = self._idle.pop() if self._idle else None
+                    if conn is None:
+                        if self._down:
+                            raise DatabaseUnavailable("Database unreachable, retrying in the background")
+                        with span('db.connect'):
+                            try:
+                                conn = self._connect()
+                            except psycopg2.OperationalError as e:
+                                if not _is_unreachable(e):
+                                    raise
+                                self._trip(e)
+                                raise DatabaseUnavailable(str(e).strip()) from e
+                    if not conn.closed:
+                        conn._in_use = True
+                        return conn
+            except Exception:
+                self._slots.release()
+                raise
+
+    def release(self, conn: PooledConnection):
+        if conn._pool is not self or not conn._in_use:
+            return
+        conn._in_use = False
+        conn._owner = None
+        try:
+            if conn.closed:
+                pass
+            elif conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                conn.discard()
+            else:
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                with self._lock:
+                    self._idle.append(conn)
+        except Exception:
+            conn.discard()
+        finally:
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.discard()
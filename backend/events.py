@@ -0,0 +1,287 @@
+"""
+Server-Sent Events
+Brand Challenge Mini App - Postgres LISTEN/NOTIFY fan-out to SSE subscribers
+
+Each worker process keeps ONE shared LISTEN connection (PgListener). Database
+triggers (migrations/002_event_notify.sql) publish challenge changes, expiries
+and submission status updates on the ``proofquest_events`` channel; the
+EventBroker fans each notification out to the in-memory queues of the
+subscribers that care about it. An idle subscriber is just a queue in a set:
+no DB connection, no per-subscriber timer (one broker-wide heartbeat task).
+"""
+
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+
+import psycopg2
+import psycopg2.extensions
+
+from db_pool import DB_CONNECT_TIMEOUT_S
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+
+EVENTS_CHANNEL = 'proofquest_events'
+SSE_HEARTBEAT_S = float(os.environ.get('SSE_HEARTBEAT_S', '15'))
+SSE_QUEUE_SIZE = int(os.environ.get('SSE_QUEUE_SIZE', '100'))
+LISTENER_RECONNECT_S = float(os.environ.get('LISTENER_RECONNECT_S', '5'))
+
+# ============================================================
+# SHARED LISTEN CONNECTION
+# ============================================================
+
+class PgListener:
+    """
+    One LISTEN connection per process, driven by the event loop.
+
+    The connection socket is registered with ``loop.add_reader`` so
+    notifications are dispatched without a polling thread. Callbacks run on
+    the event loop and receive the raw payload string. Connecting happens
+    in a thread (with DB_CONNECT_TIMEOUT_S), so an unreachable database
+    never blocks the event loop.
+    """
+
+    def __init__(self, dsn: Optional[str]):
+        self.dsn = dsn
+        self._callbacks: Dict[str, List[Callable[[str], None]]] = defaultdict(list)
+        self._on_connect: List[Callable[[], None]] = []
+        self._conn = None
+        self._fd: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]):
+        """Register a callback for a channel (call before start)"""
+        self._callbacks[channel].append(callback)
+
+    def on_connect(self, callback: Callable[[], None]):
+        """Register a callback run after every (re)connect, e.g. to flush caches"""
+        self._on_connect.append(callback)
+
+    @property
+    def connected(self) -> bool:
+        return self._conn is not None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._closed = False
+        if not await self._connect():
+            self._schedule_reconnect()
+
+    async def stop(self):
+        self._closed = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        self._disconnect()
+
+    def _open(self):
+        conn = psycopg2.connect(self.dsn, connect_timeout=DB_CONNECT_TIMEOUT_S)
+        try:
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            cursor = conn.cursor()
+            for channel in self._callbacks:
+                cursor.execute(f"LISTEN {channel};")
+            cursor.close()
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    async def _connect(self) -> bool:
+        try:
+            conn = await asyncio.to_thread(self._open)
+        except Exception as e:
+            logger.warning("LISTEN connection failed: %s", e)
+            return False
+        if self._closed:
+            conn.close()
+            return False
+        self._conn = conn
+        self._fd = conn.fileno()
+        self._loop.add_reader(self._fd, self._on_readable)
+        logger.info("Listening on %s", ", ".join(self._callbacks))
+        for callback in self._on_connect:
+            callback()
+        return True
+
+    def _disconnect(self):
+        if self._conn is None:
+            return
+        # fileno() raises once the connection is broken, so unregister the fd
+        # saved at connect time - a stale registration would capture whatever
+        # socket reuses that fd number next
+        self._loop.remove_reader(self._fd)
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+        self._fd = None
+
+    def _schedule_reconnect(self):
+        if self._closed or (self._reconnect_task is not None and not self._reconnect_task.done()):
+            return
+        self._reconnect_task = self._loop.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        while not self._closed:
+            await asyncio.sleep(LISTENER_RECONNECT_S)
+            if await self._connect():
+                break
+
+    def _on_readable(self):
+        try:
+            self._conn.poll()
+        except Exception as e:
+            logger.warning("LISTEN connection lost: %s", e)
+            self._disconnect()
+            self._schedule_reconnect()
+            return
+
+        while self._conn.notifies:
+            notify = self._conn.notifies.pop(0)
+            for callback in self._callbacks.get(notify.channel, ()):
+                try:
+                    callback(notify.payload)
+                except Exception:
+                    logger.exception("Notification callback failed on %s", notify.channel)
+
+
+# ============================================================
+# SSE FAN-OUT
+# ============================================================
+
+class Subscription:
+    __slots__ = ('telegram_id', 'queue', 'closed')
+
+    def __init__(self, telegram_id: Optional[int]):
+        self.telegram_id = telegram_id
+        self.queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+        self.closed = False
+
+
+class EventBroker:
+    """
+    Routes events to subscribers.
+
+    Challenge events (``challenge_changed``, ``challenge_expired``) go to every
+    subscriber; ``submission_status`` events only go to subscribers of the
+    submission's telegram_id. Subscribers that fall SSE_QUEUE_SIZE events
+    behind are disconnected so they refetch on reconnect.
+
+    Challenge events that arrive in the same event loop pass (one listener
+    read, e.g. a transaction of many single-row writes) are coalesced into
+    one ``challenges_changed`` event, so a write burst cannot overflow the
+    subscriber queues.
+    """
+
+    def __init__(self, heartbeat_s: float = SSE_HEARTBEAT_S):
+        self.heartbeat_s = heartbeat_s
+        self._subscribers: Set[Subscription] = set()
+        self._by_user: Dict[int, Set[Subscription]] = defaultdict(set)
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._pending_challenge_events: List[dict] = []
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    async def start(self):
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def stop(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+        for sub in list(self._subscribers):
+            self._close(sub)
+
+    def subscribe(self, telegram_id: Optional[int] = None) -> Subscription:
+        sub = Subscription(telegram_id)
+        self._subscribers.add(sub)
+        if telegram_id is not None:
+            self._by_user[telegram_id].add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._subscribers.discard(sub)
+        if sub.telegram_id is not None:
+            user_subs = self._by_user.get(sub.telegram_id)
+            if user_subs is not None:
+                user_subs.discard(sub)
+                if not user_subs:
+                    del self._by_user[sub.telegram_id]
+
+    def on_notify(self, payload: str):
+        """PgListener callback for EVENTS_CHANNEL"""
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed event payload: %r", payload)
+            return
+        if event.get('type') == 'submission_status':
+            self.publish(event)
+            return
+        self._pending_challenge_events.append(event)
+        if len(self._pending_challenge_events) == 1:
+            asyncio.get_running_loop().call_soon(self._flush_challenge_events)
+
+    def _flush_challenge_events(self):
+        events, self._pending_challenge_events = self._pending_challenge_events, []
+        if len(events) == 1:
+            self.publish(events[0])
+            return
+        expired = all(e.get('type') in ('challenge_expired', 'challenges_expired') for e in events)
+        self.publish({
+            "type": 'challenges_expired' if expired else 'challenges_changed',
+            "count": sum(e.get('count', 1) for e in events),
+        })
+
+    def publish(self, event: dict):
+        if event.get('type') == 'submission_status':
+            targets = self._by_user.get(event.get('telegram_id'), ())
+        else:
+            targets = self._subscribers
+        message = f"event: {event.get('type', 'message')}\ndata: {json.dumps(event)}\n\n"
+        for sub in list(targets):
+            self._send(sub, message)
+
+    async def stream(self, sub: Subscription) -> AsyncIterator[str]:
+        """Yield SSE frames for a subscription until it is closed or cancelled"""
+        try:
+            yield f"retry: {int(LISTENER_RECONNECT_S * 1000)}\n\n"
+            while True:
+                message = await sub.queue.get()
+                if message is None:
+                    break
+                yield message
+        finally:
+            self.unsubscribe(sub)
+
+    def _send(self, sub: Subscription, message: str):
+        if sub.closed:
+            return
+        try:
+            sub.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.info("Dropping slow SSE subscriber (telegram_id=%s)", sub.telegram_id)
+            self._close(sub)
+
+    def _close(self, sub: Subscription):
+        sub.closed = True
+        self.unsubscribe(sub)
+        while not sub.queue.empty():
+            sub.queue.get_nowait()
+        sub.queue.put_nowait(None)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_s)
+            for sub in list(self._subscribers):
+                self._send(sub, ": keep-alive\n\n")
@@ -0,0 +1,265 @@
+"""
+Submission Export
+Brand Challenge Mini App - Constant-memory CSV / NDJSON / Parquet export
+
+Rows are read from a server-side (named) cursor in fixed-size chunks and
+encoded chunk by chunk, so memory use depends on EXPORT_CHUNK_SIZE and not on
+the number of submissions. Used by GET /exports/submissions and as a CLI:
+
+    python export.py --challenge-id 3 --format csv --output payouts.csv
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import uuid
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+PARQUET_AVAILABLE = pa is not None
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', '5000'))
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+EXPORT_COLUMNS = [
+    'submission_id',
+    'challenge_id',
+    'challenge_title',
+    'user_id',
+    'telegram_id',
+    'username',
+    'wallet_address',
+    'image_url',
+    'verification_status',
+    'created_at',
+]
+
+# ============================================================
+# QUERY
+# ============================================================
+
+def build_export_query(
+    challenge_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Tuple[str, list]:
+    """Return (sql, params) for the filtered submission export (hot and archived rows)"""
+    conditions = []
+    params = []
+    if challenge_id is not None:
+        conditions.append("s.challenge_id = %s")
+        params.append(challenge_id)
+    if since is not None:
+        conditions.append("s.created_at >= %s")
+        params.append(since)
+    if until is not None:
+        conditions.append("s.created_at < %s")
+        params.append(until)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f"""
+        SELECT
+            s.submission_id,
+            s.challenge_id,
+            c.title,
+            u.user_id,
+            u.telegram_id,
+            u.username,
+            u.wallet_address,
+            s.image_url,
+            s.verification_status,
+            s.created_at
+        FROM (
+            SELECT submission_id, challenge_id, user_id, image_url, verification_status, created_at
+            FROM submissions
+            UNION ALL
+            SELECT submission_id, challenge_id, user_id, image_url, verification_status, created_at
+            FROM submissions_archive
+        ) s
+        JOIN challenges c ON s.challenge_id = c.challenge_id
+        JOIN users u ON s.user_id = u.user_id
+        {where}
+        ORDER BY s.submission_id;
+    """
+    return sql, params
+
+
+def iter_chunks(conn, sql: str, params: list, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[List[tuple]]:
+    """Yield lists of at most chunk_size tuples from a server-side cursor"""
+    cursor = conn.cursor(
+        name=f"export_{uuid.uuid4().hex}",
+        cursor_factory=psycopg2.extensions.cursor
+    )
+    cursor.itersize = chunk_size
+    try:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+
+# ============================================================
+# ENCODERS
+# ============================================================
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_csv(chunks: Iterator[List[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in chunks:
+        writer.writerows([[_isoformat(v) for v in row] for row in rows])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def encode_ndjson(chunks: Iterator[List[tuple]]) -> Iterator[bytes]:
+    for rows in chunks:
+        yield ''.join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=_isoformat) + '\n'
+            for row in rows
+        ).encode()
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to the generator"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def encode_parquet(chunks: Iterator[List[tuple]]) -> Iterator[bytes]:
+    """One Parquet row group per chunk, streamed as soon as it is written"""
+    if pa is None:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([
+        ('submission_id', pa.int64()),
+        ('challenge_id', pa.int64()),
+        ('challenge_title', pa.string()),
+        ('user_id', pa.int64()),
+        ('telegram_id', pa.int64()),
+        ('username', pa.string()),
+        ('wallet_address', pa.string()),
+        ('image_url', pa.string()),
+        ('verification_status', pa.string()),
+        ('created_at', pa.timestamp('us', tz='UTC')),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for rows in chunks:
+        columns = list(zip(*rows))
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+            schema=schema
+        ))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+ENCODERS = {
+    'csv': encode_csv,
+    'ndjson': encode_ndjson,
+    'parquet': encode_parquet,
+}
+
+
+def export_submissions(
+    conn,
+    fmt: str = 'csv',
+    challenge_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """Stream encoded submissions; the caller owns (and closes) conn"""
+    sql, params = build_export_query(challenge_id, since, until)
+    return ENCODERS[fmt](iter_chunks(conn, sql, params, chunk_size))
+
+
+# ============================================================
+# CLI
+# ============================================================
+
+def main(argv=None):
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Export challenge submissions")
+    parser.add_argument('--format', choices=sorted(ENCODERS), default='csv')
+    parser.add_argument('--challenge-id', type=int)
+    parser.add_argument('--since', type=datetime.fromisoformat, help="ISO timestamp (inclusive)")
+    parser.add_argument('--until', type=datetime.fromisoformat, help="ISO timestamp (exclusive)")
+    parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+    parser.add_argument('--output', '-o', help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    load_dotenv('.env')
+    conn = psycopg2.connect(os.environ['TIMESCALE_SERVICE_URL'])
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for data in export_submissions(
+            conn, args.format, args.challenge_id, args.since, args.until, args.chunk_size
+        ):
+            out.write(data)
+    finally:
+        if args.output:
+            out.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
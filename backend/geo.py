@@ -0,0 +1,127 @@
+"""
+Nearby Challenges
+Brand Challenge Mini App - In-process spatial index over the active challenge set
+
+Challenges with coordinates are bucketed into lat/lng grids (geohash-style
+cells of GEO_CELL_DEG degrees, ~11 km at the default 0.1). Radius queries only
+visit the cells overlapping the query's bounding box and k-nearest queries
+widen the radius until k challenges are found, so lookups touch a handful of
+cells no matter how large the catalogue grows. One grid is kept per category
+plus one for all challenges. The index is rebuilt from the cached active set
+whenever that cache is invalidated.
+"""
+
+import math
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+GEO_CELL_DEG = float(os.environ.get('GEO_CELL_DEG', '0.1'))
+GEO_MAX_RADIUS_KM = float(os.environ.get('GEO_MAX_RADIUS_KM', '500'))
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class _Grid:
+    def __init__(self, cell_deg: float):
+        self.cell_deg = cell_deg
+        self.rows = int(math.ceil(180 / cell_deg))
+        self.cols = int(math.ceil(360 / cell_deg))
+        self.cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+
+    def row(self, lat: float) -> int:
+        return min(self.rows - 1, max(0, int((lat + 90) // self.cell_deg)))
+
+    def col(self, lng: float) -> int:
+        return int((lng + 180) // self.cell_deg) % self.cols
+
+    def add(self, lat: float, lng: float, position: int):
+        self.cells[(self.row(lat), self.col(lng))].append(position)
+
+    def box(self, lat: float, lng: float, radius_km: float):
+        """Positions in every cell overlapping the radius' bounding box"""
+        dlat = radius_km / KM_PER_DEG
+        lat_min, lat_max = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+        widest = math.cos(math.radians(max(abs(lat_min), abs(lat_max))))
+        dlng = 180.0 if widest < 1e-6 else radius_km / (KM_PER_DEG * widest)
+
+        if dlng >= 180:
+            cols = range(self.cols)
+        else:
+            first, last = self.col(lng - dlng), self.col(lng + dlng)
+            cols = range(first, last + 1) if first <= last else [*range(first, self.cols), *range(0, last + 1)]
+
+        for r in range(self.row(lat_min), self.row(lat_max) + 1):
+            for c in cols:
+                yield from self.cells.get((r, c), ())
+
+
+class GeoIndex:
+    """
+    Built from (deadline, challenge) pairs as produced by the challenge list
+    cache; challenges without coordinates are skipped.
+
+    Like geohash prefixes, grids exist at several resolutions (GEO_CELL_DEG,
+    x10, x100); each query uses the finest level whose cells are at least half
+    the search radius, so it visits O(25) cells whatever the radius.
+    """
+
+    LEVELS = (1, 10, 100)
+
+    def __init__(self, challenges: List[Tuple[object, dict]], cell_deg: float = GEO_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.docs = [
+            (deadline, c) for deadline, c in challenges
+            if c.get('latitude') is not None and c.get('longitude') is not None
+        ]
+        self.grids: Dict[Tuple[Optional[str], int], _Grid] = {}
+        for position, (_, c) in enumerate(self.docs):
+            for category in {None, c.get('category') or None}:
+                for level in self.LEVELS:
+                    grid = self.grids.get((category, level))
+                    if grid is None:
+                        grid = self.grids[(category, level)] = _Grid(cell_deg * level)
+                    grid.add(c['latitude'], c['longitude'], position)
+
+    def _grid(self, category: Optional[str], radius_km: float) -> Optional[_Grid]:
+        for level in self.LEVELS:
+            if self.cell_deg * level * KM_PER_DEG * 2 >= radius_km:
+                break
+        return self.grids.get((category, level))
+
+    def within(self, lat: float, lng: float, radius_km: float, category: Optional[str] = None,
+               is_live=lambda deadline: True) -> List[Tuple[float, dict]]:
+        """All challenges within radius_km, nearest first"""
+        grid = self._grid(category, radius_km)
+        if grid is None:
+            return []
+        hits = []
+        for position in grid.box(lat, lng, radius_km):
+            deadline, c = self.docs[position]
+            if not is_live(deadline):
+                continue
+            distance = haversine_km(lat, lng, c['latitude'], c['longitude'])
+            if distance <= radius_km:
+                hits.append((distance, position))
+        hits.sort()
+        return [(distance, self.docs[p][1]) for distance, p in hits]
+
+    def nearest(self, lat: float, lng: float, k: int, max_km: float = GEO_MAX_RADIUS_KM,
+                category: Optional[str] = None, is_live=lambda deadline: True) -> List[Tuple[float, dict]]:
+        """The k nearest challenges within max_km, nearest first"""
+        # Double the radius until it holds k hits; a full circle holding k hits
+        # contains the k nearest overall.
+        radius_km = min(max_km, self.cell_deg * KM_PER_DEG)
+        while True:
+            hits = self.within(lat, lng, radius_km, category, is_live)
+            if len(hits) >= k or radius_km >= max_km:
+                return hits[:k]
+            radius_km = min(max_km, radius_km * 2)
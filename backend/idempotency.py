@@ -0,0 +1,283 @@
+"""
+Idempotency Keys
+Brand Challenge Mini App - Safe retries for POST /submissions and POST /users/login
+
+Clients send an ``Idempotency-Key`` header. The first request with a key runs
+the handler and its successful response is stored; retries with the same key
+get the stored response back without running the handler again. Errors are
+not stored, so a retry after e.g. "User not found" runs again. A duplicate
+that arrives while the first request is still running waits for it instead of
+racing it.
+
+Storage is two-tier:
+
+- Memory: bounded LRU with TTL, per process (always on)
+- Table: ``idempotency_keys`` (migrations/004_idempotency_keys.sql), optional.
+  Shares stored responses across workers/restarts and uses a claim row so
+  concurrent duplicates on different workers also wait for the first one.
+"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+
+IDEMPOTENCY_TTL_S = float(os.environ.get('IDEMPOTENCY_TTL_S', str(24 * 3600)))
+IDEMPOTENCY_MAX_KEYS = int(os.environ.get('IDEMPOTENCY_MAX_KEYS', '10000'))
+IDEMPOTENCY_WAIT_S = float(os.environ.get('IDEMPOTENCY_WAIT_S', '10'))
+IDEMPOTENCY_CLAIM_TIMEOUT_S = float(os.environ.get('IDEMPOTENCY_CLAIM_TIMEOUT_S', '60'))
+IDEMPOTENCY_TABLE = os.environ.get('IDEMPOTENCY_TABLE', 'false').lower() in ('1', 'true', 'yes')
+MAX_KEY_LENGTH = 255
+
+_POLL_S = 0.05
+
+
+def fingerprint(payload: Any) -> str:
+    """Stable hash of the request body, used to reject key reuse with a different payload"""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class _Entry:
+    __slots__ = ('fingerprint', 'done', 'status_code', 'body', 'expires_at', 'event')
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.done = False
+        self.status_code = None
+        self.body = None
+        self.expires_at = None
+        self.event = threading.Event()
+
+
+class IdempotencyStore:
+    """
+    ``run(scope, key, fingerprint, handler)`` executes ``handler`` at most once
+    per (scope, key) within the TTL and returns ``(status_code, body, replayed)``.
+
+    ``handler`` returns the response body or raises HTTPException. Only
+    successful responses are stored; 4xx responses are returned once, and
+    they, 5xx and unexpected errors release the key so the client's retry
+    runs again. Table claims left by a crashed worker are
+    taken over after IDEMPOTENCY_CLAIM_TIMEOUT_S.
+    """
+
+    def __init__(
+        self,
+        connect: Optional[Callable] = None,
+        ttl_s: float = IDEMPOTENCY_TTL_S,
+        max_keys: int = IDEMPOTENCY_MAX_KEYS,
+        wait_s: float = IDEMPOTENCY_WAIT_S,
+        use_table: bool = IDEMPOTENCY_TABLE,
+    ):
+        self.connect = connect
+        self.ttl_s = ttl_s
+        self.max_keys = max_keys
+        self.wait_s = wait_s
+        self.use_table = use_table and connect is not None
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def run(self, scope: str, key: str, request_fingerprint: str, handler: Callable[[], Any]):
+        if len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key longer than {MAX_KEY_LENGTH} characters")
+
+        deadline = time.monotonic() + self.wait_s
+        while True:
+            entry, owner = self._claim_memory(scope, key, request_fingerprint)
+            if owner:
+                break
+            if entry.done:
+                return self._replay(entry, request_fingerprint)
+            # Another thread is running this key - wait for it, then re-check
+            if not entry.event.wait(max(0.0, deadline - time.monotonic())):
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+
+        table_claimed = False
+        try:
+            if self.use_table:
+                stored = self._claim_table(scope, key, request_fingerprint, deadline)
+                if stored is not None:
+                    self._finish(scope, key, entry, *stored)
+                    return self._replay(entry, request_fingerprint)
+                table_claimed = True
+            status_code, body = self._execute(handler)
+            if status_code >= 400:
+                self._release(scope, key, entry)
+                if table_claimed:
+                    with contextlib.suppress(Exception):
+                        self._release_table(scope, key)
+                return status_code, body, False
+        except BaseException:
+            self._release(scope, key, entry)
+            if table_claimed:
+                with contextlib.suppress(Exception):
+                    self._release_table(scope, key)
+            raise
+
+        self._finish(scope, key, entry, request_fingerprint, status_code, body)
+        if table_claimed:
+            try:
+                self._store_table(scope, key, status_code, body)
+            except Exception:
+                logger.exception("Failed to store idempotent response for %s %s", scope, key)
+        return status_code, body, False
+
+    # ---------------- memory tier ----------------
+
+    def _claim_memory(self, scope, key, request_fingerprint) -> Tuple[_Entry, bool]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((scope, key))
+            if entry is not None and entry.done and entry.expires_at <= now:
+                del self._entries[(scope, key)]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end((scope, key))
+                return entry, False
+            entry = _Entry(request_fingerprint)
+            self._entries[(scope, key)] = entry
+            self._evict()
+            return entry, True
+
+    def _evict(self):
+        # Oldest first; in-flight entries are never evicted
+        for stale_key in list(self._entries):
+            if len(self._entries) <= self.max_keys:
+                break
+            if self._entries[stale_key].done:
+                del self._entries[stale_key]
+
+    def _finish(self, scope, key, entry, request_fingerprint, status_code, body):
+        with self._lock:
+            entry.fingerprint = request_fingerprint
+            entry.status_code = status_code
+            entry.body = body
+            entry.expires_at = time.monotonic() + self.ttl_s
+            entry.done = True
+        entry.event.set()
+
+    def _release(self, scope, key, entry):
+        with self._lock:
+            if self._entries.get((scope, key)) is entry:
+                del self._entries[(scope, key)]
+        entry.event.set()
+
+    @staticmethod
+    def _execute(handler) -> Tuple[int, Any]:
+        try:
+            return 200, handler()
+        except HTTPException as e:
+            if e.status_code >= 500:
+                raise
+            return e.status_code, {"detail": e.detail}
+
+    @staticmethod
+    def _replay(entry: _Entry, request_fingerprint: str):
+        if entry.fingerprint != request_fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used with a different request body"
+            )
+        return entry.status_code, entry.body, True
+
+    # ---------------- table tier ----------------
+
+    def _claim_table(self, scope, key, request_fingerprint, deadline) -> Optional[tuple]:
+        """
+        Insert a claim row, or wait for the row another worker claimed.
+        Returns (fingerprint, status_code, body) when a response already exists.
+        """
+        while True:
+            conn = self.connect()
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    DELETE FROM idempotency_keys
+                    WHERE scope = %s AND idempotency_key = %s
+                      AND (created_at < now() - make_interval(secs => %s)
+                           OR (status_code IS NULL AND created_at < now() - make_interval(secs => %s)));
+                """, (scope, key, self.ttl_s, IDEMPOTENCY_CLAIM_TIMEOUT_S))
+                cursor.execute("""
+                    INSERT INTO idempotency_keys (scope, idempotency_key, fingerprint)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (scope, idempotency_key) DO NOTHING
+                    RETURNING idempotency_key;
+                """, (scope, key, request_fingerprint))
+                claimed = cursor.fetchone() is not None
+                if not claimed:
+                    cursor.execute("""
+                        SELECT fingerprint, status_code, response
+                        FROM idempotency_keys
+                        WHERE scope = %s AND idempotency_key = %s;
+                    """, (scope, key))
+                    row = cursor.fetchone()
+                conn.commit()
+            finally:
+                cursor.close()
+                conn.close()
+
+            if claimed:
+                return None
+            if row is not None:
+                row = tuple(row.values()) if isinstance(row, dict) else tuple(row)
+                if row[1] is not None:
+                    return row
+            if time.monotonic() >= deadline:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+            time.sleep(_POLL_S)
+
+    def _store_table(self, scope, key, status_code, body):
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE idempotency_keys
+                SET status_code = %s, response = %s
+                WHERE scope = %s AND idempotency_key = %s;
+            """, (status_code, json.dumps(body, default=str), scope, key))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _release_table(self, scope, key):
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                DELETE FROM idempotency_keys
+                WHERE scope = %s AND idempotency_key = %s AND status_code IS NULL;
+            """, (scope, key))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def purge_expired(self):
+        """Delete table rows older than the TTL (memory entries expire lazily)"""
+        if not self.use_table:
+            return
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                DELETE FROM idempotency_keys
+                WHERE created_at < now() - make_interval(secs => %s);
+            """, (self.ttl_s,))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
@@ -1,28 +1,168 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request, Response
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Response, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, Field
-from typing import Optional, List
-from datetime import datetime
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, List, Tuple
+from datetime import datetime, timezone
+from decimal import Decimal
+from contextlib import asynccontextmanager
+import asyncio
+import logging
 import os
+import secrets
 from dotenv import load_dotenv
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+import budgets
+from budgets import RouteBudget, budgeted_route_class
+from challenge_import import (
+    IMPORT_FORMATS,
+    ChallengeImport,
+    ChallengeImportError,
+    ChallengeImportTooLarge,
+    load_challenges,
+)
+from cache import CacheRegistry, InvalidatingCache, LocalInvalidationBus, PgInvalidationBus
+from compression import CompressionMiddleware
+from db_pool import ConnectionPool, DatabaseUnavailable, PoolExhausted
+from events import EventBroker, PgListener, EVENTS_CHANNEL
+from export import EXPORT_FORMATS, PARQUET_AVAILABLE, export_submissions
+from geo import GEO_MAX_RADIUS_KM, GeoIndex
+from idempotency import IdempotencyStore, fingerprint
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry as metrics_registry
+from payouts import (
+    CHUNK_STATUSES,
+    PAYOUT_CHUNK_SIZE,
+    compute_payout_batch,
+    get_payout_batch,
+    get_payout_chunk,
+    mark_payout_chunk,
+)
+from rows import RowFields, parse_fields, render_json, tuple_cursor
+from search import InvertedIndex
+from snapshots import SnapshotStore
+import tracing
+from tracing import trace_request, trusted_peer
+from verification import (
+    VerificationJob,
+    VerificationOutcome,
+    VerificationPool,
+    create_model_client,
+    APPROVED,
+    REJECTED,
+    IMAGE_ERROR,
+    API_ERROR,
+)
+
 # Load environment variables (for local development)
 load_dotenv('.env')
 
 # Get database connection string
 DATABASE_URL = os.environ.get('TIMESCALE_SERVICE_URL')
 
+# Bearer token for admin endpoints (exports); admin endpoints are disabled when unset
+ADMIN_API_TOKEN = os.environ.get('ADMIN_API_TOKEN')
+
+# Cross-process cache invalidation: 'postgres' (LISTEN/NOTIFY) or 'local' (single process / tests)
+INVALIDATION_BUS = os.environ.get('INVALIDATION_BUS', 'postgres' if DATABASE_URL else 'local')
+CHALLENGE_CACHE_TTL_S = float(os.environ.get('CHALLENGE_CACHE_TTL_S', '60'))
+
+# How often each worker marks challenges past their deadline as expired
+# (one worker at a time, see _EXPIRY_LOCK_ID)
+EXPIRY_SWEEP_S = float(os.environ.get('EXPIRY_SWEEP_S', '30'))
+_EXPIRY_LOCK_ID = 0x65787079
+
+# How often each worker claims pending submissions for its verification
+# queue, and how long a claim lasts before another worker may take it over
+VERIFICATION_REQUEUE_S = float(os.environ.get('VERIFICATION_REQUEUE_S', '60'))
+VERIFICATION_CLAIM_TIMEOUT_S = float(os.environ.get('VERIFICATION_CLAIM_TIMEOUT_S', '600'))
+
+# Concurrent requests per worker for each expensive analytics/export route
+EXPENSIVE_ROUTE_MAX_CONCURRENT = int(os.environ.get('EXPENSIVE_ROUTE_MAX_CONCURRENT', '2'))
+
+# Per-route query budgets (budgets.py); other routes get QUERY_BUDGET_MS.
+# None: no statement timeout and no disconnect watch.
+ROUTE_BUDGETS = {
+    "/leaderboard": RouteBudget(2000, max_concurrent=EXPENSIVE_ROUTE_MAX_CONCURRENT),
+    "/stats": RouteBudget(2000, max_concurrent=EXPENSIVE_ROUTE_MAX_CONCURRENT),
+    "/challenges/search": RouteBudget(1000),
+    "/submissions/user/{telegram_id}": RouteBudget(2000),
+    "/exports/submissions": RouteBudget(None, max_concurrent=EXPENSIVE_ROUTE_MAX_CONCURRENT),
+    "/payouts/batches": RouteBudget(None),
+    "/challenges/bulk": RouteBudget(30000, max_concurrent=1),
+    "/events": None,
+    "/metrics": None,
+}
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# CONNECTION POOL & CACHES
+# ============================================================
+
+db_pool = ConnectionPool(DATABASE_URL, cursor_factory=RealDictCursor)
+
+cache_registry = CacheRegistry()
+challenge_list_cache = cache_registry.register(InvalidatingCache('challenges', CHALLENGE_CACHE_TTL_S))
+challenge_cache = cache_registry.register(InvalidatingCache('challenges', CHALLENGE_CACHE_TTL_S))
+search_index_cache = cache_registry.register(InvalidatingCache('challenges', CHALLENGE_CACHE_TTL_S))
+geo_index_cache = cache_registry.register(InvalidatingCache('challenges', CHALLENGE_CACHE_TTL_S))
+
+# Last-known-good challenge reads, served when the database is unreachable
+snapshot_store = SnapshotStore()
+
+if INVALIDATION_BUS == 'postgres':
+    invalidation_bus = PgInvalidationBus(cache_registry)
+else:
+    invalidation_bus = LocalInvalidationBus(cache_registry)
+
+# ============================================================
+# APPLICATION LIFESPAN
+# ============================================================
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background subsystems (tracing, verification pool, event listener, cache bus)"""
+    tracing.configure()
+    app.state.verification_pool = VerificationPool(create_model_client(), on_result=on_verification_result)
+    await app.state.verification_pool.start()
+    
+    app.state.event_broker = EventBroker()
+    app.state.listener = PgListener(DATABASE_URL)
+    app.state.listener.subscribe(EVENTS_CHANNEL, app.state.event_broker.on_notify)
+    invalidation_bus.attach(app.state.listener)
+    await app.state.event_broker.start()
+    await app.state.listener.start()
+    expiry_task = asyncio.create_task(run_expiry_sweeper())
+    requeue_task = asyncio.create_task(run_verification_requeuer(app.state.verification_pool))
+    try:
+        yield
+    finally:
+        expiry_task.cancel()
+        requeue_task.cancel()
+        await app.state.listener.stop()
+        await app.state.event_broker.stop()
+        await app.state.verification_pool.stop()
+        db_pool.close()
+        await asyncio.to_thread(snapshot_store.flush)
+        if tracing.exporter is not None:
+            await asyncio.to_thread(tracing.exporter.flush)
+
 app = FastAPI(
     title="Brand Challenge API",
     description="Backend API for Brand Challenge Mini App - Telegram Integration",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
+# Handler / serialize spans for sampled requests plus per-route query budgets
+# (must be set before routes are declared)
+app.router.route_class = budgeted_route_class(ROUTE_BUDGETS)
+
 # CORS middleware for Telegram Mini App
 app.add_middleware(
     CORSMiddleware,
@@ -32,6 +172,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Negotiated brotli/gzip for buffered responses above COMPRESSION_MIN_BYTES (compression.py)
+app.add_middleware(CompressionMiddleware)
+
 # ============================================================
 # CACHE CONTROL MIDDLEWARE
 # ============================================================
@@ -48,20 +191,113 @@ async def add_cache_control_headers(request: Request, call_next):
     response.headers["Expires"] = "0"
     return response
 
+# ============================================================
+# REQUEST TRACING MIDDLEWARE
+# ============================================================
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Root span for sampled requests (TRACE_SAMPLE_RATE, or a sampled
+    `traceparent` header from one of TRACE_TRUSTED_PROXIES); see tracing.py.
+    """
+    with trace_request(
+        f"{request.method} {request.url.path}",
+        request.headers.get("traceparent"),
+        trusted=trusted_peer(request.client.host if request.client else None)
+    ) as root:
+        response = await call_next(request)
+        if root is not None:
+            route = request.scope.get("route")
+            if route is not None:
+                root.name = f"{request.method} {route.path}"
+            root.attributes["http.status_code"] = response.status_code
+            response.headers["traceresponse"] = f"00-{root.trace_id}-{root.span_id}-01"
+        return response
+
 # ============================================================
 # DATABASE CONNECTION
 # ============================================================
 
 def get_db_connection():
-    """Get database connection"""
+    """Get a pooled database connection (conn.close() returns it to the pool)"""
+    try:
+        conn = db_pool.acquire()
+    except PoolExhausted as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Database busy: {str(e)}"
+        )
+    except DatabaseUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Database unavailable: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Database connection failed: {str(e)}"
+        )
     try:
-        conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
-        return conn
+        # statement_timeout of the current route's query budget
+        budgets.attach(conn)
     except Exception as e:
+        conn.close()
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Database connection failed: {str(e)}"
         )
+    return conn
+
+# ============================================================
+# SPARSE FIELDSETS
+# ============================================================
+
+FIELDS_DESCRIPTION = "Comma-separated response fields to return, e.g. `id,title,deadline` (default: all)"
+
+def requested_fields(fields: Optional[str], available) -> Tuple[str, ...]:
+    """Parse a `fields` query parameter, 400 on unknown names"""
+    try:
+        return parse_fields(fields, available)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def require_admin_token(authorization: Optional[str] = Header(None)):
+    """Dependency - require `Authorization: Bearer <ADMIN_API_TOKEN>`"""
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Admin API is not configured"
+        )
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token, ADMIN_API_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or missing admin token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+# ============================================================
+# IDEMPOTENCY
+# ============================================================
+
+idempotency_store = IdempotencyStore(connect=get_db_connection)
+
+def idempotent(scope: str, idempotency_key: Optional[str], payload: BaseModel, handler):
+    """
+    Run a write handler at most once per Idempotency-Key (see idempotency.py).
+    Requests without the header run normally.
+    """
+    if idempotency_key is None:
+        return handler()
+    
+    status_code, body, replayed = idempotency_store.run(
+        scope, idempotency_key, fingerprint(payload.model_dump()), handler
+    )
+    if status_code == 200 and not replayed:
+        return body
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return JSONResponse(status_code=status_code, content=body, headers=headers)
 
 # ============================================================
 # PYDANTIC MODELS (Request/Response Schemas)
@@ -126,12 +362,47 @@ class ChallengeResponse(BaseModel):
     reward_info: str
     deadline: str
     status: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    location: Optional[str] = None
+    category: Optional[str] = None
+
+class ChallengeCreate(BaseModel):
+    title: str = Field(..., min_length=1, max_length=200)
+    description: str = Field(..., min_length=1, description="Shown to participants and used in the AI verification prompt")
+    image_url: str = Field(..., min_length=1)
+    reward_info: str = Field(..., min_length=1, description="Display text, e.g. '10 TON'")
+    deadline: datetime = Field(..., description="Must be in the future; naive times are UTC")
+    reward_amount: Optional[Decimal] = Field(None, ge=0, max_digits=20, decimal_places=9, description="TON per approved submission")
+    reward_pool: Optional[Decimal] = Field(None, ge=0, max_digits=20, decimal_places=9, description="TON split across approved submissions")
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    location: Optional[str] = None
+    category: Optional[str] = None
+
+    @model_validator(mode='after')
+    def check_challenge(self):
+        if (self.latitude is None) != (self.longitude is None):
+            raise ValueError("latitude and longitude must be set together")
+        if self.deadline.tzinfo is None:
+            self.deadline = self.deadline.replace(tzinfo=timezone.utc)
+        if self.deadline <= datetime.now(timezone.utc):
+            raise ValueError("deadline must be in the future")
+        return self
+
+class ChallengeBulkResult(BaseModel):
+    created: int
+    challenge_ids: List[int]
+
+class NearbyChallengeResponse(ChallengeResponse):
+    distance_km: float
 
 class SubmissionResponse(BaseModel):
     id: int
     user_id: int
     challenge_id: int
     image_url: str
+    verification_status: Optional[str] = None
     created_at: str
 
 class UserSubmissionResponse(BaseModel):
@@ -139,8 +410,28 @@ class UserSubmissionResponse(BaseModel):
     challenge_id: int
     challenge_title: str
     image_url: str
+    verification_status: Optional[str] = None
     created_at: str
 
+class ChallengeSearchResponse(BaseModel):
+    total: int
+    limit: int
+    offset: int
+    results: List[ChallengeResponse]
+
+class BootstrapResponse(BaseModel):
+    user: UserResponse
+    challenges: List[ChallengeResponse]
+    submissions: List[UserSubmissionResponse]
+
+class PayoutBatchCreate(BaseModel):
+    challenge_ids: Optional[List[int]] = Field(None, description="Expired challenges to settle (default: all eligible)")
+    chunk_size: int = Field(PAYOUT_CHUNK_SIZE, ge=1, le=10000, description="Items per transfer chunk")
+
+class PayoutChunkResult(BaseModel):
+    status: str = Field("sent", pattern="^(" + "|".join(CHUNK_STATUSES) + ")$")
+    tx_ref: Optional[str] = Field(None, description="Transfer reference, e.g. the TON transaction hash")
+
 # ============================================================
 # HEALTH CHECK
 # ============================================================
@@ -171,6 +462,9 @@ def health_check():
             "status": "healthy",
             "database": "connected",
             "environment": os.getenv("ENVIRONMENT", "development"),
+            "worker_pid": os.getpid(),
+            "cache_coherent": cache_registry.coherent(),
+            "snapshots_served_stale": snapshot_store.served_stale,
             "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
@@ -179,12 +473,20 @@ def health_check():
             detail=f"Service unhealthy: {str(e)}"
         )
 
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+def metrics():
+    """Per-worker counters in Prometheus text format (see metrics.py)"""
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
 # ============================================================
 # USER ENDPOINTS
 # ============================================================
 
 @app.post("/users/login", response_model=UserResponse, tags=["Users"])
-def login_user(user_data: UserLogin):
+def login_user(
+    user_data: UserLogin,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
     Login or register user via Telegram authentication.
     
@@ -193,7 +495,12 @@ def login_user(user_data: UserLogin):
     - If user doesn't exist: creates a new user
     
     Returns user data including user_id for subsequent API calls.
+    Retries with the same `Idempotency-Key` header replay the first response.
     """
+    return idempotent("POST /users/login", idempotency_key, user_data, lambda: upsert_user(user_data))
+
+def upsert_user(user_data: UserLogin) -> dict:
+    """Upsert a Telegram user and return the UserResponse payload"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
@@ -279,17 +586,23 @@ def link_wallet(wallet_data: WalletLink):
 # CHALLENGE ENDPOINTS
 # ============================================================
 
-@app.get("/challenges", response_model=List[ChallengeResponse], tags=["Challenges"])
-def get_challenges():
-    """
-    Get all active challenges.
-    
-    Returns challenges that are:
-    - Status = 'active'
-    - Deadline has not passed
-    
-    Sorted by deadline (earliest first).
-    """
+def format_challenge(c) -> dict:
+    return {
+        "id": c['challenge_id'],
+        "title": c['title'],
+        "description": c['description'],
+        "image_url": c['image_url'],
+        "reward_info": c['reward_info'],
+        "deadline": c['deadline'].isoformat(),
+        "status": c['status'],
+        "latitude": c['latitude'],
+        "longitude": c['longitude'],
+        "location": c['location'],
+        "category": c['category']
+    }
+
+def load_active_challenges() -> list:
+    """Query active challenges as (deadline, response) pairs for the list cache"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
@@ -302,39 +615,23 @@ def get_challenges():
                 image_url, 
                 reward_info, 
                 deadline, 
-                status
+                status,
+                latitude,
+                longitude,
+                location,
+                category
             FROM challenges
             WHERE status = 'active' AND deadline > now()
             ORDER BY deadline ASC;
         """)
         
-        challenges = cursor.fetchall()
-        
-        return [
-            {
-                "id": c['challenge_id'],
-                "title": c['title'],
-                "description": c['description'],
-                "image_url": c['image_url'],
-                "reward_info": c['reward_info'],
-                "deadline": c['deadline'].isoformat(),
-                "status": c['status']
-            }
-            for c in challenges
-        ]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching challenges: {str(e)}")
+        return [(c['deadline'], format_challenge(c)) for c in cursor.fetchall()]
     finally:
         cursor.close()
         conn.close()
 
-@app.get("/challenges/{challenge_id}", response_model=ChallengeResponse, tags=["Challenges"])
-def get_challenge(challenge_id: int):
-    """
-    Get details for a specific challenge.
-    
-    Returns full challenge information including deadline and reward details.
-    """
+def load_challenge(challenge_id: int) -> Optional[dict]:
+    """Query one challenge for the detail cache (None when missing)"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
@@ -347,39 +644,412 @@ def get_challenge(challenge_id: int):
                 image_url, 
                 reward_info, 
                 deadline, 
-                status
+                status,
+                latitude,
+                longitude,
+                location,
+                category
             FROM challenges
             WHERE challenge_id = %s;
         """, (challenge_id,))
         
         challenge = cursor.fetchone()
+        return format_challenge(challenge) if challenge else None
+    finally:
+        cursor.close()
+        conn.close()
+
+def read_with_snapshot(cache: InvalidatingCache, key, snapshot_key: str, loader) -> tuple:
+    """
+    Cached read that falls back to the last-known-good snapshot when the
+    database is unreachable. Returns (value, snapshot age in seconds or None).
+    """
+    load = snapshot_store.recorder(snapshot_key, loader)
+    return snapshot_store.read(snapshot_key, lambda: cache.get_or_load(key, load), loader)
+
+def mark_stale(response: Response, stale_age: Optional[int]):
+    """Flag a response served from a snapshot during a database outage"""
+    if stale_age is not None:
+        response.headers["X-Stale"] = "true"
+        response.headers["Age"] = str(stale_age)
+
+def cached_active_challenges() -> Tuple[list, Optional[int]]:
+    """Active challenges from the per-process cache (re-filtered by deadline) and their snapshot age if stale"""
+    challenges, stale_age = read_with_snapshot(
+        challenge_list_cache, 'active', 'challenges:active', load_active_challenges
+    )
+    now = datetime.now(timezone.utc)
+    return [c for deadline, c in challenges if deadline > now], stale_age
+
+CHALLENGE_FIELDS = tuple(ChallengeResponse.model_fields)
+
+@app.get("/challenges", response_model=List[ChallengeResponse], tags=["Challenges"])
+def get_challenges(response: Response, fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)):
+    """
+    Get all active challenges.
+    
+    Returns challenges that are:
+    - Status = 'active'
+    - Deadline has not passed
+    
+    Sorted by deadline (earliest first). Served from the per-process
+    challenge cache, which is invalidated across workers on every write.
+    While the database is unreachable the last-known-good list is returned
+    with `X-Stale: true` and `Age` headers.
+    
+    `fields` limits each challenge to the listed fields (the list is
+    cached whole, so only serialization is saved).
+    """
+    keys = requested_fields(fields, CHALLENGE_FIELDS) if fields is not None else None
+    try:
+        challenges, stale_age = cached_active_challenges()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching challenges: {str(e)}")
+    
+    if keys is not None:
+        response = Response(
+            content=render_json([{key: c[key] for key in keys} for c in challenges]),
+            media_type="application/json"
+        )
+        mark_stale(response, stale_age)
+        return response
+    
+    mark_stale(response, stale_age)
+    return challenges
+
+def search_challenges_in_database(q: str, limit: int, offset: int, include_expired: bool) -> dict:
+    """Ranked full-text search using the GIN-indexed search_vector column"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute(f"""
+            SELECT 
+                challenge_id, 
+                title, 
+                description, 
+                image_url, 
+                reward_info, 
+                deadline, 
+                status,
+                latitude,
+                longitude,
+                location,
+                category,
+                COUNT(*) OVER () AS total
+            FROM challenges, plainto_tsquery('english', %s) query
+            WHERE search_vector @@ query
+            {"" if include_expired else "AND status = 'active' AND deadline > now()"}
+            ORDER BY ts_rank_cd(search_vector, query) DESC, deadline ASC
+            LIMIT %s OFFSET %s;
+        """, (q, limit, offset))
         
-        if not challenge:
-            raise HTTPException(status_code=404, detail="Challenge not found")
-        
+        rows = cursor.fetchall()
         return {
-            "id": challenge['challenge_id'],
-            "title": challenge['title'],
-            "description": challenge['description'],
-            "image_url": challenge['image_url'],
-            "reward_info": challenge['reward_info'],
-            "deadline": challenge['deadline'].isoformat(),
-            "status": challenge['status']
+            "total": rows[0]['total'] if rows else 0,
+            "results": [format_challenge(c) for c in rows]
         }
+    finally:
+        cursor.close()
+        conn.close()
+
+@app.get("/challenges/search", response_model=ChallengeSearchResponse, tags=["Challenges"])
+def search_challenges(
+    q: str = Query(..., min_length=1, max_length=200, description="Search text"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    include_expired: bool = False
+):
+    """
+    Search challenges by title, description and reward.
+    
+    Results are ranked (title matches first) and paginated. Active-only
+    searches are answered from an in-memory inverted index over the cached
+    active set; `include_expired=true` queries the GIN-indexed tsvector column.
+    """
+    try:
+        if include_expired:
+            found = search_challenges_in_database(q, limit, offset, include_expired)
+        else:
+            index = search_index_cache.get_or_load(
+                'active',
+                lambda: InvertedIndex(challenge_list_cache.get_or_load('active', load_active_challenges))
+            )
+            now = datetime.now(timezone.utc)
+            matches = index.search(q, is_live=lambda deadline: deadline > now)
+            found = {"total": len(matches), "results": matches[offset:offset + limit]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching challenges: {str(e)}")
+    
+    return {"limit": limit, "offset": offset, **found}
+
+@app.get("/challenges/nearby", response_model=List[NearbyChallengeResponse], tags=["Challenges"])
+def get_nearby_challenges(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0, le=GEO_MAX_RADIUS_KM),
+    k: Optional[int] = Query(None, ge=1, le=100),
+    category: Optional[str] = None
+):
+    """
+    Find active challenges near a location, nearest first.
+    
+    - `radius_km` only: every challenge within the radius
+    - `k` only: the k nearest challenges (within the maximum radius)
+    - both: the k nearest challenges within the radius
+    
+    Served from an in-memory grid index over the cached active set.
+    """
+    if radius_km is None and k is None:
+        raise HTTPException(status_code=400, detail="Provide radius_km, k or both")
+    
+    try:
+        index = geo_index_cache.get_or_load(
+            'active',
+            lambda: GeoIndex(challenge_list_cache.get_or_load('active', load_active_challenges))
+        )
+        now = datetime.now(timezone.utc)
+        is_live = lambda deadline: deadline > now
+        if k is None:
+            hits = index.within(lat, lng, radius_km, category, is_live)
+        else:
+            hits = index.nearest(lat, lng, k, radius_km or GEO_MAX_RADIUS_KM, category, is_live)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching nearby challenges: {str(e)}")
+    
+    return [{**c, "distance_km": round(distance, 3)} for distance, c in hits]
+
+@app.get("/challenges/{challenge_id}", response_model=ChallengeResponse, tags=["Challenges"])
+def get_challenge(challenge_id: int, response: Response):
+    """
+    Get details for a specific challenge.
+    
+    Returns full challenge information including deadline and reward details.
+    Falls back to the last-known-good snapshot (`X-Stale: true`) while the
+    database is unreachable.
+    """
+    try:
+        challenge, stale_age = read_with_snapshot(
+            challenge_cache, challenge_id, f"challenges:{challenge_id}", lambda: load_challenge(challenge_id)
+        )
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching challenge: {str(e)}")
+    
+    if not challenge:
+        raise HTTPException(status_code=404, detail="Challenge not found")
+    
+    mark_stale(response, stale_age)
+    return challenge
+
+# ============================================================
+# CHALLENGE CREATION (ADMIN)
+# ============================================================
+
+def insert_challenge(challenge: ChallengeCreate) -> dict:
+    """Insert one challenge; the invalidation trigger notifies other workers on commit"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            INSERT INTO challenges (
+                title, description, image_url, reward_info, deadline,
+                reward_amount, reward_pool, latitude, longitude, location, category
+            )
+            VALUES (
+                %(title)s, %(description)s, %(image_url)s, %(reward_info)s, %(deadline)s,
+                %(reward_amount)s, %(reward_pool)s, %(latitude)s, %(longitude)s, %(location)s, %(category)s
+            )
+            RETURNING
+                challenge_id, title, description, image_url, reward_info, deadline,
+                status, latitude, longitude, location, category;
+        """, challenge.model_dump())
+        
+        created = cursor.fetchone()
+        conn.commit()
+        invalidation_bus.publish('challenges')
+        return format_challenge(created)
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Error creating challenge: {str(e)}")
     finally:
         cursor.close()
         conn.close()
 
+@app.post("/challenges", response_model=ChallengeResponse, tags=["Challenges"], dependencies=[Depends(require_admin_token)])
+def create_challenge(
+    challenge: ChallengeCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    Create one active challenge.
+    
+    Send an `Idempotency-Key` header to make retries safe.
+    """
+    return idempotent(
+        "POST /challenges", idempotency_key, challenge, lambda: insert_challenge(challenge)
+    )
+
+def import_challenges(challenge_import: ChallengeImport) -> List[int]:
+    conn = get_db_connection()
+    try:
+        return load_challenges(conn, challenge_import)
+    finally:
+        conn.close()
+
+@app.post(
+    "/challenges/bulk",
+    response_model=ChallengeBulkResult,
+    tags=["Challenges"],
+    dependencies=[Depends(require_admin_token)],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {media_type: {"schema": {"type": "string"}} for media_type in IMPORT_FORMATS},
+        }
+    },
+)
+async def create_challenges_bulk(request: Request):
+    """
+    Create many challenges from a CSV (`Content-Type: text/csv`, header row
+    required) or NDJSON (`application/x-ndjson`) body.
+    
+    Rows are validated as the body streams in. Any invalid row fails the
+    whole request with 422 listing the offending lines; otherwise all rows
+    are loaded with COPY in one transaction and challenge caches are
+    invalidated once, on commit.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type not in IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Content-Type must be one of: {', '.join(IMPORT_FORMATS)}"
+        )
+    
+    challenge_import = ChallengeImport(IMPORT_FORMATS[media_type], ChallengeCreate)
+    try:
+        try:
+            async for chunk in request.stream():
+                if chunk:
+                    await asyncio.to_thread(challenge_import.feed, chunk)
+            await asyncio.to_thread(challenge_import.close)
+        except ChallengeImportTooLarge as e:
+            raise HTTPException(status_code=413, detail=e.detail())
+        except ChallengeImportError as e:
+            raise HTTPException(status_code=422, detail=e.detail())
+        
+        try:
+            challenge_ids = await asyncio.to_thread(import_challenges, challenge_import)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error importing challenges: {str(e)}")
+    finally:
+        challenge_import.spool.close()
+    
+    invalidation_bus.publish('challenges')
+    return {"created": len(challenge_ids), "challenge_ids": challenge_ids}
+
+# ============================================================
+# BOOTSTRAP ENDPOINT
+# ============================================================
+
+def load_user_with_submissions(telegram_id: int, limit: int) -> Optional[dict]:
+    """Fetch a user and their most recent submissions in a single round-trip"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            SELECT 
+                u.user_id,
+                u.telegram_id,
+                u.username,
+                u.wallet_address,
+                u.created_at,
+                COALESCE((
+                    SELECT json_agg(recent)
+                    FROM (
+                        SELECT 
+                            s.submission_id AS id,
+                            s.challenge_id,
+                            c.title AS challenge_title,
+                            s.image_url,
+                            s.verification_status,
+                            s.created_at
+                        FROM submissions s
+                        JOIN challenges c ON s.challenge_id = c.challenge_id
+                        WHERE s.user_id = u.user_id
+                        ORDER BY s.created_at DESC
+                        LIMIT %s
+                    ) recent
+                ), '[]'::json) AS submissions
+            FROM users u
+            WHERE u.telegram_id = %s;
+        """, (limit, telegram_id))
+        
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+@app.get("/bootstrap/{telegram_id}", response_model=BootstrapResponse, tags=["Users"])
+async def bootstrap(response: Response, telegram_id: int, submissions_limit: int = Query(20, ge=0, le=100)):
+    """
+    Everything the Mini App needs for its first screen in one call.
+    
+    Returns the user, all active challenges and the user's most recent
+    submissions. The user and submissions come from one SQL statement; the
+    challenge list comes from the shared challenge cache and is loaded
+    concurrently when the cache is cold. A last-known-good challenge list
+    is marked with `X-Stale: true` and `Age` headers, as on GET /challenges.
+    
+    Returns 404 for unknown users - call POST /users/login to register.
+    """
+    try:
+        row, (challenges, stale_age) = await asyncio.gather(
+            asyncio.to_thread(load_user_with_submissions, telegram_id, submissions_limit),
+            asyncio.to_thread(cached_active_challenges)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading bootstrap data: {str(e)}")
+    
+    if not row:
+        raise HTTPException(status_code=404, detail="User not found. Please login first.")
+    
+    mark_stale(response, stale_age)
+    return {
+        "user": {
+            "id": row['user_id'],
+            "telegram_id": row['telegram_id'],
+            "username": row['username'],
+            "wallet_address": row['wallet_address'],
+            "created_at": row['created_at'].isoformat()
+        },
+        "challenges": challenges,
+        "submissions": row['submissions']
+    }
+
 # ============================================================
 # SUBMISSION ENDPOINTS
 # ============================================================
 
 @app.post("/submissions", response_model=SubmissionResponse, tags=["Submissions"])
-def submit_photo(submission_data: SubmissionCreate):
+def submit_photo(
+    submission_data: SubmissionCreate,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
     Submit a photo for a challenge.
     
@@ -387,7 +1057,22 @@ def submit_photo(submission_data: SubmissionCreate):
     - User can only submit once per challenge
     - Duplicate submissions return 400 error
     - User must exist (from /users/login)
+    
+    The submission is created with verification_status 'pending' and queued
+    for server-side AI verification.
+    
+    Retries with the same `Idempotency-Key` header replay the first response
+    (marked `Idempotent-Replayed: true`) without touching the submissions
+    table; a retry that arrives while the first attempt is still running
+    waits for it.
     """
+    return idempotent(
+        "POST /submissions", idempotency_key, submission_data,
+        lambda: create_submission(submission_data, request)
+    )
+
+def create_submission(submission_data: SubmissionCreate, request: Request) -> dict:
+    """Insert a submission, queue its verification and return the SubmissionResponse payload"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
@@ -404,11 +1089,15 @@ def submit_photo(submission_data: SubmissionCreate):
         
         user_id = user['user_id']
         
-        # Check if already submitted
+        # Check if already submitted (including archived submissions)
         cursor.execute("""
             SELECT submission_id FROM submissions
-            WHERE user_id = %s AND challenge_id = %s;
-        """, (user_id, submission_data.challenge_id))
+            WHERE user_id = %s AND challenge_id = %s
+            UNION ALL
+            SELECT submission_id FROM submissions_archive
+            WHERE user_id = %s AND challenge_id = %s
+            LIMIT 1;
+        """, (user_id, submission_data.challenge_id, user_id, submission_data.challenge_id))
         
         existing = cursor.fetchone()
         
@@ -418,21 +1107,35 @@ def submit_photo(submission_data: SubmissionCreate):
                 detail="You have already submitted to this challenge"
             )
         
-        # Create submission
+        # Create submission (challenge description is needed for the AI prompt)
         cursor.execute("""
-            INSERT INTO submissions (user_id, challenge_id, image_url)
-            VALUES (%s, %s, %s)
-            RETURNING submission_id, user_id, challenge_id, image_url, created_at;
+            WITH inserted AS (
+                INSERT INTO submissions (user_id, challenge_id, image_url, verification_claimed_at)
+                VALUES (%s, %s, %s, now())
+                RETURNING submission_id, user_id, challenge_id, image_url, verification_status, created_at
+            )
+            SELECT i.*, c.description AS challenge_description
+            FROM inserted i
+            JOIN challenges c ON c.challenge_id = i.challenge_id;
         """, (user_id, submission_data.challenge_id, submission_data.image_url))
         
         result = cursor.fetchone()
         conn.commit()
         
+        # Queue server-side AI verification
+        request.app.state.verification_pool.submit_threadsafe(VerificationJob(
+            submission_id=result['submission_id'],
+            challenge_id=result['challenge_id'],
+            challenge_description=result['challenge_description'],
+            image_url=result['image_url']
+        ))
+        
         return {
             "id": result['submission_id'],
             "user_id": result['user_id'],
             "challenge_id": result['challenge_id'],
             "image_url": result['image_url'],
+            "verification_status": result['verification_status'],
             "created_at": result['created_at'].isoformat()
         }
     except HTTPException:
@@ -444,89 +1147,419 @@ def submit_photo(submission_data: SubmissionCreate):
         cursor.close()
         conn.close()
 
+USER_SUBMISSION_FIELDS = RowFields([
+    ('id', 's.submission_id'),
+    ('challenge_id', 'c.challenge_id'),
+    ('challenge_title', 'c.title'),
+    ('image_url', 's.image_url'),
+    ('verification_status', 's.verification_status'),
+    ('created_at', 's.created_at', datetime.isoformat),
+])
+USER_SUBMISSION_ROW = USER_SUBMISSION_FIELDS.mapper()
+
+# {columns}: USER_SUBMISSION_FIELDS.select(...);
+# {table}: submissions (hot) or submissions_archive (cold, see archive.py)
+USER_SUBMISSIONS_SQL = """
+    SELECT 
+        {columns}
+    FROM {table} s
+    JOIN challenges c ON s.challenge_id = c.challenge_id
+    JOIN users u ON s.user_id = u.user_id
+    WHERE u.telegram_id = %s
+    ORDER BY s.created_at DESC, s.submission_id DESC
+    LIMIT %s OFFSET %s;
+"""
+
 @app.get("/submissions/user/{telegram_id}", response_model=List[UserSubmissionResponse], tags=["Submissions"])
-def get_user_submissions(telegram_id: int):
+def get_user_submissions(
+    telegram_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size (default: all submissions)"),
+    offset: int = Query(0, ge=0),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)
+):
     """
     Get all submissions for a specific user.
     
     Returns list of submissions with challenge details.
     Sorted by submission date (most recent first).
+    
+    Submissions of long-expired challenges are moved to the archive
+    (archive.py); they follow the hot submissions and are only read when
+    the requested page runs past them.
+    
+    `fields` selects only the listed columns (e.g. `id,verification_status`).
+    """
+    keys = requested_fields(fields, USER_SUBMISSION_FIELDS.keys)
+    columns = USER_SUBMISSION_FIELDS.select(keys)
+    conn = get_db_connection()
+    cursor = tuple_cursor(conn)
+    
+    try:
+        cursor.execute(USER_SUBMISSIONS_SQL.format(columns=columns, table='submissions'), (telegram_id, limit, offset))
+        rows = cursor.fetchall()
+        
+        if limit is None or len(rows) < limit:
+            archive_offset = 0
+            if not rows and offset > 0:
+                cursor.execute("""
+                    SELECT COUNT(*)
+                    FROM submissions s
+                    JOIN users u ON s.user_id = u.user_id
+                    WHERE u.telegram_id = %s;
+                """, (telegram_id,))
+                archive_offset = offset - cursor.fetchone()[0]
+            remaining = None if limit is None else limit - len(rows)
+            cursor.execute(
+                USER_SUBMISSIONS_SQL.format(columns=columns, table='submissions_archive'),
+                (telegram_id, remaining, archive_offset)
+            )
+            rows += cursor.fetchall()
+        
+        return USER_SUBMISSION_FIELDS.mapper(keys).response(rows)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching submissions: {str(e)}")
+    finally:
+        cursor.close()
+        conn.close()
+
+# ============================================================
+# AI VERIFICATION
+# ============================================================
+
+VERIFICATION_STATUS = {
+    APPROVED: 'approved',
+    REJECTED: 'rejected',
+    IMAGE_ERROR: 'error',
+}
+
+def record_verification_result(job: VerificationJob, outcome: VerificationOutcome):
+    """
+    Update submission status and write the verification_logs audit row.
+    
+    API_ERROR (model or image host unavailable) is not final: the
+    submission stays pending with a fresh claim, so the requeuer retries
+    it after VERIFICATION_CLAIM_TIMEOUT_S instead of dropping it from
+    payouts.
     """
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
+        if outcome.result == API_ERROR:
+            cursor.execute("""
+                UPDATE submissions
+                SET verification_claimed_at = now()
+                WHERE submission_id = %s AND verification_status = 'pending';
+            """, (job.submission_id,))
+        else:
+            cursor.execute("""
+                UPDATE submissions
+                SET verification_status = %s
+                WHERE submission_id = %s;
+            """, (VERIFICATION_STATUS.get(outcome.result, 'error'), job.submission_id))
+        
         cursor.execute("""
-            SELECT 
-                s.submission_id,
-                c.challenge_id,
-                c.title as challenge_title,
-                s.image_url,
-                s.created_at
-            FROM submissions s
-            JOIN challenges c ON s.challenge_id = c.challenge_id
-            JOIN users u ON s.user_id = u.user_id
-            WHERE u.telegram_id = %s
-            ORDER BY s.created_at DESC;
-        """, (telegram_id,))
+            INSERT INTO verification_logs (
+                submission_id, verification_result, ai_model_used, ai_prompt,
+                ai_raw_response, error_message, api_call_duration_ms
+            )
+            VALUES (%s, %s, %s, %s, %s, %s, %s);
+        """, (
+            job.submission_id,
+            outcome.result,
+            outcome.model,
+            outcome.prompt,
+            outcome.raw_response,
+            outcome.error_message,
+            outcome.duration_ms
+        ))
         
-        submissions = cursor.fetchall()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+async def on_verification_result(job: VerificationJob, outcome: VerificationOutcome):
+    """Worker pool callback - persist the outcome off the event loop"""
+    await asyncio.to_thread(record_verification_result, job, outcome)
+
+def requeue_pending_verifications(pool: VerificationPool):
+    """
+    Claim unclaimed or stale pending submissions and queue them (best effort).
+    
+    Picks up rows whose job was dropped on a full queue or whose worker
+    died. Rows locked by another worker's claim are skipped, so each
+    submission is queued once; at most the free queue space is claimed.
+    """
+    capacity = pool.queue.maxsize - pool.queue.qsize()
+    if capacity <= 0:
+        return
+    try:
+        conn = get_db_connection()
+    except HTTPException:
+        logger.warning("Database unavailable, skipping verification requeue")
+        return
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            WITH claimed AS (
+                UPDATE submissions
+                SET verification_claimed_at = now()
+                WHERE submission_id IN (
+                    SELECT submission_id
+                    FROM submissions
+                    WHERE verification_status = 'pending'
+                      AND (verification_claimed_at IS NULL
+                           OR verification_claimed_at < now() - make_interval(secs => %s))
+                    ORDER BY created_at ASC
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING submission_id, challenge_id, image_url
+            )
+            SELECT cl.submission_id, cl.challenge_id, cl.image_url, c.description
+            FROM claimed cl
+            JOIN challenges c ON c.challenge_id = cl.challenge_id;
+        """, (VERIFICATION_CLAIM_TIMEOUT_S, capacity))
+        rows = cursor.fetchall()
+        conn.commit()
         
-        return [
-            {
-                "id": s['submission_id'],
-                "challenge_id": s['challenge_id'],
-                "challenge_title": s['challenge_title'],
-                "image_url": s['image_url'],
-                "created_at": s['created_at'].isoformat()
-            }
-            for s in submissions
-        ]
+        for row in rows:
+            pool.submit_threadsafe(VerificationJob(
+                submission_id=row['submission_id'],
+                challenge_id=row['challenge_id'],
+                challenge_description=row['description'],
+                image_url=row['image_url']
+            ))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching submissions: {str(e)}")
+        conn.rollback()
+        logger.warning("Verification requeue failed: %s", e)
+    finally:
+        cursor.close()
+        conn.close()
+
+async def run_verification_requeuer(pool: VerificationPool):
+    """Background task - claim pending submissions at startup and then periodically"""
+    while True:
+        await asyncio.to_thread(requeue_pending_verifications, pool)
+        await asyncio.sleep(VERIFICATION_REQUEUE_S)
+
+# ============================================================
+# REAL-TIME EVENTS (SSE)
+# ============================================================
+
+@app.get("/events", tags=["Events"])
+async def stream_events(request: Request, telegram_id: Optional[int] = None):
+    """
+    Server-Sent Events stream replacing client polling.
+    
+    Events:
+    - challenge_changed: a challenge was created, updated or deleted
+    - challenge_expired: a challenge passed its deadline
+    - challenges_changed / challenges_expired: several challenges at once
+      (bulk import, expiry sweep); carries a count, refetch the list
+    - submission_status: a submission of `telegram_id` was created or verified
+    
+    Events come from Postgres NOTIFY via one shared LISTEN connection per
+    worker, so open streams do not hold database connections.
+    """
+    broker = request.app.state.event_broker
+    subscription = broker.subscribe(telegram_id)
+    return StreamingResponse(
+        broker.stream(subscription),
+        media_type="text/event-stream",
+        headers={"X-Accel-Buffering": "no"}
+    )
+
+def expire_challenges() -> Optional[int]:
+    """
+    Mark active challenges past their deadline as expired (fires challenge_expired).
+    
+    Returns None without touching anything while another worker is sweeping.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("SELECT pg_try_advisory_xact_lock(%s) AS locked;", (_EXPIRY_LOCK_ID,))
+        if not cursor.fetchone()['locked']:
+            conn.rollback()
+            return None
+        cursor.execute("""
+            UPDATE challenges
+            SET status = 'expired', updated_at = now()
+            WHERE status = 'active' AND deadline < now()
+            RETURNING challenge_id;
+        """)
+        expired = cursor.rowcount
+        conn.commit()
+        return expired
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         cursor.close()
         conn.close()
 
+async def run_expiry_sweeper():
+    """Background task - periodically expire challenges (and purge old idempotency keys)"""
+    while True:
+        await asyncio.sleep(EXPIRY_SWEEP_S)
+        try:
+            if await asyncio.to_thread(expire_challenges) is not None:
+                await asyncio.to_thread(idempotency_store.purge_expired)
+        except Exception as e:
+            logger.warning("Challenge expiry sweep failed: %s", e)
+
+# ============================================================
+# EXPORT ENDPOINTS (ADMIN)
+# ============================================================
+
+@app.get("/exports/submissions", tags=["Exports"], dependencies=[Depends(require_admin_token)])
+def export_submissions_endpoint(
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    challenge_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """
+    Stream every submission (with user handle and wallet address) for payout.
+    
+    Filters: `challenge_id`, `since` (inclusive) and `until` (exclusive) on
+    submission time. Rows are read from a server-side cursor in fixed-size
+    chunks, so memory use does not depend on the size of the export.
+    """
+    if format == "parquet" and not PARQUET_AVAILABLE:
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow on the server")
+    
+    conn = get_db_connection()
+    
+    def stream():
+        try:
+            yield from export_submissions(conn, format, challenge_id, since, until)
+        finally:
+            conn.rollback()
+            conn.close()
+    
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"submissions{f'_challenge_{challenge_id}' if challenge_id else ''}.{extension}"
+    return StreamingResponse(
+        stream(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# ============================================================
+# PAYOUT ENDPOINTS (ADMIN)
+# ============================================================
+
+@app.post("/payouts/batches", tags=["Payouts"], dependencies=[Depends(require_admin_token)])
+def create_payout_batch(batch: PayoutBatchCreate):
+    """
+    Allocate rewards for expired challenges into a new payout batch.
+    
+    Idempotent: submissions that were already allocated are skipped, so
+    `batch` is null when there is nothing left to pay. Challenges that still
+    have submissions pending verification are listed in
+    `waiting_challenge_ids` and settled by a later run.
+    """
+    conn = get_db_connection()
+    
+    try:
+        return compute_payout_batch(conn, batch.challenge_ids, batch.chunk_size)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error computing payouts: {str(e)}")
+    finally:
+        conn.close()
+
+@app.get("/payouts/batches/{batch_id}", tags=["Payouts"], dependencies=[Depends(require_admin_token)])
+def get_payout_batch_endpoint(batch_id: int):
+    """Batch totals and per-chunk transfer status"""
+    conn = get_db_connection()
+    
+    try:
+        batch = get_payout_batch(conn, batch_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching payout batch: {str(e)}")
+    finally:
+        conn.close()
+    
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Payout batch not found")
+    
+    return batch
+
+@app.get("/payouts/batches/{batch_id}/chunks/{chunk_no}", tags=["Payouts"], dependencies=[Depends(require_admin_token)])
+def get_payout_chunk_endpoint(batch_id: int, chunk_no: int):
+    """Unsent transfers of one chunk, one per wallet, for the transfer tool"""
+    conn = get_db_connection()
+    
+    try:
+        return get_payout_chunk(conn, batch_id, chunk_no)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching payout chunk: {str(e)}")
+    finally:
+        conn.close()
+
+@app.post("/payouts/batches/{batch_id}/chunks/{chunk_no}", tags=["Payouts"], dependencies=[Depends(require_admin_token)])
+def mark_payout_chunk_endpoint(batch_id: int, chunk_no: int, result: PayoutChunkResult):
+    """Record a chunk's transfer result; already-sent items are left unchanged"""
+    conn = get_db_connection()
+    
+    try:
+        updated = mark_payout_chunk(conn, batch_id, chunk_no, result.status, result.tx_ref)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error updating payout chunk: {str(e)}")
+    finally:
+        conn.close()
+    
+    return {"batch_id": batch_id, "chunk_no": chunk_no, "updated": updated}
+
 # ============================================================
 # ANALYTICS ENDPOINTS (BONUS)
 # ============================================================
 
+LEADERBOARD_FIELDS = RowFields([
+    ('username', 'u.username'),
+    ('first_name', 'u.first_name'),
+    ('photo_url', 'u.photo_url'),
+    ('submission_count', 'COUNT(s.submission_id) + COALESCE(a.archived_submissions, 0)'),
+])
+LEADERBOARD_ROW = LEADERBOARD_FIELDS.mapper()
+
 @app.get("/leaderboard", tags=["Analytics"])
-def get_leaderboard(limit: int = 10):
+def get_leaderboard(
+    limit: int = Query(10, ge=1, le=100),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)
+):
     """
     Get user leaderboard by submission count.
     
-    Returns top users sorted by number of submissions.
+    Returns top users sorted by number of submissions (archived submissions
+    included via submission_archive_counts). `fields` selects only the
+    listed columns.
     """
+    keys = requested_fields(fields, LEADERBOARD_FIELDS.keys)
     conn = get_db_connection()
-    cursor = conn.cursor()
+    cursor = tuple_cursor(conn)
     
     try:
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT 
-                u.username,
-                u.first_name,
-                u.photo_url,
-                COUNT(s.submission_id) as submission_count
+                {LEADERBOARD_FIELDS.select(keys)}
             FROM users u
             LEFT JOIN submissions s ON u.user_id = s.user_id
-            GROUP BY u.user_id, u.username, u.first_name, u.photo_url
-            ORDER BY submission_count DESC, u.created_at ASC
+            LEFT JOIN submission_archive_counts a ON u.user_id = a.user_id
+            GROUP BY u.user_id, u.username, u.first_name, u.photo_url, a.archived_submissions
+            ORDER BY COUNT(s.submission_id) + COALESCE(a.archived_submissions, 0) DESC, u.created_at ASC
             LIMIT %s;
         """, (limit,))
         
-        leaderboard = cursor.fetchall()
-        
-        return [
-            {
-                "username": l['username'],
-                "first_name": l['first_name'],
-                "photo_url": l['photo_url'],
-                "submission_count": l['submission_count']
-            }
-            for l in leaderboard
-        ]
+        return LEADERBOARD_FIELDS.mapper(keys).response(cursor.fetchall())
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching leaderboard: {str(e)}")
     finally:
@@ -538,7 +1571,8 @@ def get_stats():
     """
     Get overall platform statistics.
     
-    Returns total counts for users, challenges, and submissions.
+    Returns total counts for users, challenges, and submissions (hot and
+    archived).
     """
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -548,7 +1582,9 @@ def get_stats():
             SELECT 
                 (SELECT COUNT(*) FROM users) as total_users,
                 (SELECT COUNT(*) FROM challenges WHERE status='active') as active_challenges,
-                (SELECT COUNT(*) FROM submissions) as total_submissions;
+                (SELECT COUNT(*) FROM submissions)
+                    + (SELECT COALESCE(SUM(archived_submissions), 0) FROM submission_archive_counts)::BIGINT
+                    as total_submissions;
         """)
         
         stats = cursor.fetchone()
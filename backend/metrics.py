@@ -0,0 +1,76 @@
+"""
+Metrics
+Brand Challenge Mini App - Per-process counters in Prometheus text format
+
+Counters are kept in memory per worker process and served by GET /metrics
+(Prometheus text exposition format 0.0.4). With several workers each scrape
+sees one worker; the ``worker_pid`` label tells them apart.
+
+    from metrics import registry
+    QUERY_BUDGET_EXCEEDED = registry.counter(
+        'proofquest_query_budget_exceeded_total',
+        'Requests whose statements hit the route statement_timeout',
+        ['route'],
+    )
+    QUERY_BUDGET_EXCEEDED.inc('/leaderboard')
+"""
+
+import os
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Counter:
+    """Monotonic counter with optional labels (label values passed positionally to inc)"""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        if len(label_values) != len(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}")
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self, const_labels: Dict[str, str]) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            pairs = list(const_labels.items()) + list(zip(self.labels, label_values))
+            labels = ",".join(f'{key}="{_escape(str(v))}"' for key, v in pairs)
+            lines.append(f"{self.name}{{{labels}}} {value:g}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        """Create (or return the already registered) counter called ``name``"""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, documentation, labels)
+            return self._metrics[name]
+
+    def render(self) -> str:
+        const_labels = {"worker_pid": str(os.getpid())}
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render(const_labels))
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,37 @@
+-- ============================================================
+-- 001 - Server-side AI verification
+-- ============================================================
+
+-- Existing submissions were verified client-side before upload,
+-- so backfill them as approved and default new rows to pending.
+ALTER TABLE submissions
+    ADD COLUMN IF NOT EXISTS verification_status TEXT NOT NULL DEFAULT 'approved';
+
+ALTER TABLE submissions
+    ALTER COLUMN verification_status SET DEFAULT 'pending';
+
+ALTER TABLE submissions DROP CONSTRAINT IF EXISTS submissions_verification_status_check;
+ALTER TABLE submissions
+    ADD CONSTRAINT submissions_verification_status_check
+    CHECK (verification_status IN ('pending', 'approved', 'rejected', 'error'));
+
+-- Startup requeue scans pending submissions only
+CREATE INDEX IF NOT EXISTS idx_submissions_pending
+    ON submissions(created_at)
+    WHERE verification_status = 'pending';
+
+-- Audit trail (already present on Tiger Cloud deployments)
+CREATE TABLE IF NOT EXISTS verification_logs (
+    log_id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    submission_id BIGINT REFERENCES submissions(submission_id) ON DELETE CASCADE,
+    verification_result TEXT NOT NULL,
+    ai_model_used TEXT,
+    ai_prompt TEXT,
+    ai_raw_response TEXT,
+    error_message TEXT,
+    api_call_duration_ms INTEGER,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_verification_logs_submission_id
+    ON verification_logs(submission_id);
@@ -0,0 +1,95 @@
+-- ============================================================
+-- 002 - LISTEN/NOTIFY events for Server-Sent Events (GET /events)
+-- ============================================================
+
+-- Challenge inserts, updates and deletes, one event per statement.
+-- Single-row statements publish the challenge ('challenge_expired' for an
+-- active -> expired status change, otherwise 'challenge_changed').
+-- Multi-row statements (bulk import, expiry sweep) publish one
+-- 'challenges_changed' ('challenges_expired' when every row expired) with a
+-- count, so they never arrive as a burst larger than the SSE subscriber
+-- queues; clients refetch the list.
+CREATE OR REPLACE FUNCTION notify_challenge_event() RETURNS trigger AS $$
+DECLARE
+    changed BIGINT;
+    expired BIGINT := 0;
+    row_data RECORD;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        SELECT COUNT(*) INTO changed FROM old_rows;
+    ELSE
+        SELECT COUNT(*) INTO changed FROM new_rows;
+    END IF;
+    IF changed = 0 THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'UPDATE' THEN
+        SELECT COUNT(*) INTO expired
+        FROM old_rows o
+        JOIN new_rows n ON n.challenge_id = o.challenge_id
+        WHERE o.status = 'active' AND n.status = 'expired';
+    END IF;
+
+    IF changed = 1 THEN
+        IF TG_OP = 'DELETE' THEN
+            SELECT challenge_id, status, deadline INTO row_data FROM old_rows;
+        ELSE
+            SELECT challenge_id, status, deadline INTO row_data FROM new_rows;
+        END IF;
+        PERFORM pg_notify('proofquest_events', json_build_object(
+            'type', CASE WHEN expired = 1 THEN 'challenge_expired' ELSE 'challenge_changed' END,
+            'op', TG_OP,
+            'challenge_id', row_data.challenge_id,
+            'status', row_data.status,
+            'deadline', row_data.deadline
+        )::text);
+    ELSE
+        PERFORM pg_notify('proofquest_events', json_build_object(
+            'type', CASE WHEN expired = changed THEN 'challenges_expired' ELSE 'challenges_changed' END,
+            'op', TG_OP,
+            'count', changed
+        )::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables allow only one event per trigger
+DROP TRIGGER IF EXISTS challenges_notify_insert ON challenges;
+CREATE TRIGGER challenges_notify_insert
+    AFTER INSERT ON challenges
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_challenge_event();
+
+DROP TRIGGER IF EXISTS challenges_notify_update ON challenges;
+CREATE TRIGGER challenges_notify_update
+    AFTER UPDATE ON challenges
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_challenge_event();
+
+DROP TRIGGER IF EXISTS challenges_notify_delete ON challenges;
+CREATE TRIGGER challenges_notify_delete
+    AFTER DELETE ON challenges
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_challenge_event();
+
+-- Submission creation and verification status changes, routed to the
+-- owner's telegram_id.
+CREATE OR REPLACE FUNCTION notify_submission_event() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('proofquest_events', json_build_object(
+        'type', 'submission_status',
+        'submission_id', NEW.submission_id,
+        'challenge_id', NEW.challenge_id,
+        'telegram_id', (SELECT telegram_id FROM users WHERE user_id = NEW.user_id),
+        'verification_status', NEW.verification_status
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS submissions_notify_event ON submissions;
+CREATE TRIGGER submissions_notify_event
+    AFTER INSERT OR UPDATE OF verification_status ON submissions
+    FOR EACH ROW EXECUTE FUNCTION notify_submission_event();
@@ -0,0 +1,29 @@
+-- ============================================================
+-- 003 - Multi-worker mode: cache invalidation (LISTEN proofquest_invalidate)
+--       and verification claims
+-- ============================================================
+
+-- Statement-level: one notification per writing statement, delivered on
+-- commit. Covers API writes and manual SQL alike.
+CREATE OR REPLACE FUNCTION notify_cache_invalidation() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('proofquest_invalidate', json_build_object(
+        'topic', TG_ARGV[0],
+        'key', NULL
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS challenges_invalidate_cache ON challenges;
+CREATE TRIGGER challenges_invalidate_cache
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON challenges
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_invalidation('challenges');
+
+-- Every worker re-queues pending submissions periodically. A worker claims
+-- a row by stamping verification_claimed_at (FOR UPDATE SKIP LOCKED), so
+-- each submission is queued by one worker; claims older than
+-- VERIFICATION_CLAIM_TIMEOUT_S are picked up again (dropped jobs, crashed
+-- workers). Rows pending before this migration have no claim yet.
+ALTER TABLE submissions
+    ADD COLUMN IF NOT EXISTS verification_claimed_at TIMESTAMPTZ;
@@ -0,0 +1,17 @@
+-- ============================================================
+-- 004 - Idempotency keys (optional table tier, IDEMPOTENCY_TABLE=true)
+-- ============================================================
+
+-- status_code IS NULL marks a request that is still in flight (claim row)
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    scope TEXT NOT NULL,
+    idempotency_key TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    status_code INTEGER,
+    response JSONB,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (scope, idempotency_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at
+    ON idempotency_keys(created_at);
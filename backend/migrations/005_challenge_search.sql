@@ -0,0 +1,16 @@
+-- ============================================================
+-- 005 - Full-text search over challenges (GET /challenges/search)
+-- ============================================================
+
+-- Weighted like the in-memory index in search.py:
+-- title (A) > description (B) > reward_info (C)
+ALTER TABLE challenges
+    ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(reward_info, '')), 'C')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_challenges_search_vector
+    ON challenges USING GIN (search_vector);
@@ -0,0 +1,19 @@
+-- ============================================================
+-- 006 - Challenge location and category (GET /challenges/nearby)
+-- ============================================================
+
+-- Coordinates are optional: challenges without them are simply not
+-- returned by the nearby endpoint. Nearby lookups are answered from the
+-- in-process grid index in geo.py, so no spatial database index is needed.
+ALTER TABLE challenges
+    ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION
+        CHECK (latitude BETWEEN -90 AND 90),
+    ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION
+        CHECK (longitude BETWEEN -180 AND 180),
+    ADD COLUMN IF NOT EXISTS location TEXT,
+    ADD COLUMN IF NOT EXISTS category TEXT;
+
+ALTER TABLE challenges DROP CONSTRAINT IF EXISTS challenges_coordinates_check;
+ALTER TABLE challenges
+    ADD CONSTRAINT challenges_coordinates_check
+    CHECK ((latitude IS NULL) = (longitude IS NULL));
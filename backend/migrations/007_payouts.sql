@@ -0,0 +1,46 @@
+-- ============================================================
+-- 007 - Reward payouts (payouts.py)
+-- ============================================================
+
+-- Machine-readable rewards in TON (reward_info stays the display text).
+-- reward_amount: paid per approved submission.
+-- reward_pool: split evenly across approved submissions (capped at
+-- reward_amount when both are set).
+ALTER TABLE challenges
+    ADD COLUMN IF NOT EXISTS reward_amount NUMERIC(20, 9)
+        CHECK (reward_amount >= 0),
+    ADD COLUMN IF NOT EXISTS reward_pool NUMERIC(20, 9)
+        CHECK (reward_pool >= 0);
+
+CREATE TABLE IF NOT EXISTS payout_batches (
+    batch_id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    challenge_ids BIGINT[],
+    chunk_size INTEGER NOT NULL,
+    item_count INTEGER NOT NULL DEFAULT 0,
+    chunk_count INTEGER NOT NULL DEFAULT 0,
+    total_amount NUMERIC(20, 9) NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- One row per paid submission. The primary key on submission_id is what
+-- makes batch computation idempotent: a submission is allocated at most once.
+CREATE TABLE IF NOT EXISTS payout_items (
+    submission_id BIGINT PRIMARY KEY,
+    batch_id BIGINT NOT NULL REFERENCES payout_batches(batch_id),
+    chunk_no INTEGER NOT NULL,
+    challenge_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    wallet_address TEXT NOT NULL,
+    amount NUMERIC(20, 9) NOT NULL CHECK (amount > 0),
+    status TEXT NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'sent', 'failed')),
+    tx_ref TEXT,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_payout_items_batch_chunk
+    ON payout_items(batch_id, chunk_no);
+
+CREATE INDEX IF NOT EXISTS idx_payout_items_unsent
+    ON payout_items(batch_id, chunk_no)
+    WHERE status <> 'sent';
@@ -0,0 +1,50 @@
+-- ============================================================
+-- 008 - Cold storage for submissions of long-expired challenges (archive.py)
+-- ============================================================
+
+-- Same columns as submissions. Range-partitioned by year of created_at;
+-- archive.py creates the yearly partitions it needs before moving rows.
+CREATE TABLE IF NOT EXISTS submissions_archive (
+    submission_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    challenge_id BIGINT NOT NULL REFERENCES challenges(challenge_id) ON DELETE CASCADE,
+    image_url TEXT NOT NULL,
+    verification_status TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (submission_id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Paging a user's history past the hot set
+CREATE INDEX IF NOT EXISTS idx_submissions_archive_user
+    ON submissions_archive(user_id, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_submissions_archive_challenge
+    ON submissions_archive(challenge_id);
+
+-- Per-user count of archived submissions, maintained in the same statement
+-- that moves them, so leaderboard and stats totals stay exact without
+-- scanning the archive.
+CREATE TABLE IF NOT EXISTS submission_archive_counts (
+    user_id BIGINT PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+    archived_submissions BIGINT NOT NULL DEFAULT 0
+);
+
+-- verification_logs rows of archived submissions move here in the same
+-- statement, so verification_logs keeps its foreign key to submissions and
+-- the audit trail of an archived submission is kept with it.
+CREATE TABLE IF NOT EXISTS verification_logs_archive (
+    log_id BIGINT PRIMARY KEY,
+    submission_id BIGINT NOT NULL,
+    verification_result TEXT NOT NULL,
+    ai_model_used TEXT,
+    ai_prompt TEXT,
+    ai_raw_response TEXT,
+    error_message TEXT,
+    api_call_duration_ms INTEGER,
+    created_at TIMESTAMPTZ NOT NULL,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_verification_logs_archive_submission_id
+    ON verification_logs_archive(submission_id);
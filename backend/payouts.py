@@ -0,0 +1,348 @@
+"""
+Reward Payouts
+Brand Challenge Mini App - Set-based payout batches for expired challenges
+
+Allocations are computed by ONE ``INSERT ... SELECT`` over submissions,
+users and challenges (window functions for pool splits and chunk numbers),
+so settling a campaign costs a single statement no matter how many
+submissions it has. Results land in ``payout_items`` grouped into chunks of
+PAYOUT_CHUNK_SIZE for the downstream TON transfer tool
+(migrations/007_payouts.sql).
+
+Runs are idempotent and resumable:
+
+- ``payout_items.submission_id`` is the primary key, so a submission is
+  allocated at most once; re-running ``compute`` only picks up what is left
+  (e.g. winners who linked a wallet since the last run).
+- A batch is written in one transaction - either all of it exists or none.
+- Chunks carry a status; the transfer tool marks each chunk ``sent`` and a
+  restart continues with the chunks that are not.
+
+A challenge is settled once it is expired, has a reward_amount or
+reward_pool, and has no submissions still pending verification.
+
+    python payouts.py compute --challenge-id 3 --challenge-id 4
+    python payouts.py chunks
+    python payouts.py export --batch-id 1 --chunk 0
+    python payouts.py mark --batch-id 1 --chunk 0 --tx-ref <hash>
+"""
+
+import argparse
+import json
+import os
+import sys
+from decimal import Decimal
+from typing import List, Optional
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+
+PAYOUT_CHUNK_SIZE = int(os.environ.get('PAYOUT_CHUNK_SIZE', '500'))
+
+CHUNK_STATUSES = ('pending', 'sent', 'failed')
+
+# Serialises concurrent compute runs (pg_advisory_xact_lock key)
+_PAYOUT_LOCK_ID = 0x70617930
+
+# ============================================================
+# QUERIES
+# ============================================================
+
+# Challenges in scope that can be settled now
+_ELIGIBLE_CHALLENGES = """
+    SELECT c.challenge_id, c.reward_amount, c.reward_pool
+    FROM challenges c
+    WHERE c.status = 'expired'
+      AND (c.reward_amount IS NOT NULL OR c.reward_pool IS NOT NULL)
+      AND (%(challenge_ids)s::BIGINT[] IS NULL OR c.challenge_id = ANY(%(challenge_ids)s::BIGINT[]))
+      AND NOT EXISTS (
+          SELECT 1 FROM submissions p
+          WHERE p.challenge_id = c.challenge_id AND p.verification_status = 'pending'
+      )
+"""
+
+# Pool shares are computed over ALL approved submissions (including winners
+# without a wallet yet), so a later run pays them the same share.
+_ALLOCATE = f"""
+    WITH eligible AS ({_ELIGIBLE_CHALLENGES}),
+    winners AS (
+        SELECT
+            s.submission_id,
+            s.challenge_id,
+            s.user_id,
+            u.wallet_address,
+            CASE
+                WHEN e.reward_pool IS NULL THEN e.reward_amount
+                ELSE LEAST(
+                    COALESCE(e.reward_amount, e.reward_pool),
+                    trunc(e.reward_pool / COUNT(*) OVER (PARTITION BY s.challenge_id), 9)
+                )
+            END AS amount
+        FROM eligible e
+        JOIN submissions s
+          ON s.challenge_id = e.challenge_id AND s.verification_status = 'approved'
+        JOIN users u ON u.user_id = s.user_id
+    ),
+    unpaid AS (
+        SELECT w.*
+        FROM winners w
+        WHERE w.wallet_address IS NOT NULL
+          AND w.amount > 0
+          AND NOT EXISTS (SELECT 1 FROM payout_items p WHERE p.submission_id = w.submission_id)
+    )
+    INSERT INTO payout_items (submission_id, batch_id, chunk_no, challenge_id, user_id, wallet_address, amount)
+    SELECT
+        submission_id,
+        %(batch_id)s,
+        -- Ordered by wallet so one wallet's rewards usually share a chunk
+        ((row_number() OVER (ORDER BY wallet_address, submission_id)) - 1) / %(chunk_size)s,
+        challenge_id,
+        user_id,
+        wallet_address,
+        amount
+    FROM unpaid
+    ON CONFLICT (submission_id) DO NOTHING;
+"""
+
+
+def _amount(value: Optional[Decimal]) -> str:
+    """TON amounts are returned as strings to avoid float rounding"""
+    return format(value or Decimal(0), 'f')
+
+
+def _batch_summary(row: dict) -> dict:
+    return {
+        "batch_id": row['batch_id'],
+        "challenge_ids": row['challenge_ids'],
+        "chunk_size": row['chunk_size'],
+        "item_count": row['item_count'],
+        "chunk_count": row['chunk_count'],
+        "total_amount": _amount(row['total_amount']),
+        "created_at": row['created_at'].isoformat(),
+    }
+
+# ============================================================
+# BATCH COMPUTATION
+# ============================================================
+
+def compute_payout_batch(
+    conn,
+    challenge_ids: Optional[List[int]] = None,
+    chunk_size: int = PAYOUT_CHUNK_SIZE,
+) -> dict:
+    """
+    Allocate rewards for every unpaid approved submission of the eligible
+    challenges (all expired challenges when challenge_ids is None).
+
+    Returns ``{"batch": summary or None, "waiting_challenge_ids": [...]}``;
+    ``batch`` is None when there was nothing left to allocate, and
+    ``waiting_challenge_ids`` lists expired challenges in scope that still
+    have submissions pending verification.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    params = {"challenge_ids": challenge_ids or None, "chunk_size": chunk_size}
+
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s);", (_PAYOUT_LOCK_ID,))
+
+        cursor.execute("""
+            SELECT DISTINCT c.challenge_id
+            FROM challenges c
+            JOIN submissions s
+              ON s.challenge_id = c.challenge_id AND s.verification_status = 'pending'
+            WHERE c.status = 'expired'
+              AND (c.reward_amount IS NOT NULL OR c.reward_pool IS NOT NULL)
+              AND (%(challenge_ids)s::BIGINT[] IS NULL OR c.challenge_id = ANY(%(challenge_ids)s::BIGINT[]))
+            ORDER BY c.challenge_id;
+        """, params)
+        waiting = [row['challenge_id'] for row in cursor.fetchall()]
+
+        cursor.execute("""
+            INSERT INTO payout_batches (challenge_ids, chunk_size)
+            VALUES (%(challenge_ids)s, %(chunk_size)s)
+            RETURNING batch_id;
+        """, params)
+        params["batch_id"] = cursor.fetchone()['batch_id']
+
+        cursor.execute(_ALLOCATE, params)
+        if cursor.rowcount == 0:
+            conn.rollback()
+            return {"batch": None, "waiting_challenge_ids": waiting}
+
+        cursor.execute("""
+            UPDATE payout_batches b
+            SET item_count = t.item_count,
+                chunk_count = t.chunk_count,
+                total_amount = t.total_amount
+            FROM (
+                SELECT COUNT(*) AS item_count,
+                       MAX(chunk_no) + 1 AS chunk_count,
+                       SUM(amount) AS total_amount
+                FROM payout_items
+                WHERE batch_id = %(batch_id)s
+            ) t
+            WHERE b.batch_id = %(batch_id)s
+            RETURNING b.*;
+        """, params)
+        batch = _batch_summary(cursor.fetchone())
+        conn.commit()
+        return {"batch": batch, "waiting_challenge_ids": waiting}
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# ============================================================
+# CHUNKS FOR THE TRANSFER TOOL
+# ============================================================
+
+def get_payout_batch(conn, batch_id: int) -> Optional[dict]:
+    """Batch summary plus per-chunk status counts (None when missing)"""
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute("SELECT * FROM payout_batches WHERE batch_id = %s;", (batch_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cursor.execute("""
+            SELECT
+                chunk_no,
+                COUNT(*) AS item_count,
+                SUM(amount) AS total_amount,
+                COUNT(*) FILTER (WHERE status = 'sent') AS sent,
+                COUNT(*) FILTER (WHERE status = 'failed') AS failed
+            FROM payout_items
+            WHERE batch_id = %s
+            GROUP BY chunk_no
+            ORDER BY chunk_no;
+        """, (batch_id,))
+        chunks = [
+            {**chunk, "total_amount": _amount(chunk['total_amount'])}
+            for chunk in cursor.fetchall()
+        ]
+        return {**_batch_summary(row), "chunks": chunks}
+    finally:
+        cursor.close()
+
+
+def unsent_chunks(conn, batch_id: Optional[int] = None) -> List[dict]:
+    """(batch_id, chunk_no) pairs that still have unsent items - the resume point"""
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute("""
+            SELECT batch_id, chunk_no, COUNT(*) AS unsent
+            FROM payout_items
+            WHERE status <> 'sent'
+              AND (%(batch_id)s::BIGINT IS NULL OR batch_id = %(batch_id)s)
+            GROUP BY batch_id, chunk_no
+            ORDER BY batch_id, chunk_no;
+        """, {"batch_id": batch_id})
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def get_payout_chunk(conn, batch_id: int, chunk_no: int) -> List[dict]:
+    """
+    One transfer per wallet: the chunk's unsent items summed by wallet
+    address, with the submission IDs each transfer settles.
+    """
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute("""
+            SELECT
+                wallet_address,
+                SUM(amount) AS amount,
+                array_agg(submission_id ORDER BY submission_id) AS submission_ids
+            FROM payout_items
+            WHERE batch_id = %s AND chunk_no = %s AND status <> 'sent'
+            GROUP BY wallet_address
+            ORDER BY wallet_address;
+        """, (batch_id, chunk_no))
+        return [{**row, "amount": _amount(row['amount'])} for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def mark_payout_chunk(conn, batch_id: int, chunk_no: int, status: str = 'sent',
+                      tx_ref: Optional[str] = None) -> int:
+    """
+    Record the transfer result for a chunk's unsent items. Items already
+    marked sent are left alone, so repeating the call is harmless.
+    Returns the number of items updated.
+    """
+    if status not in CHUNK_STATUSES:
+        raise ValueError(f"status must be one of {', '.join(CHUNK_STATUSES)}")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE payout_items
+            SET status = %s, tx_ref = COALESCE(%s, tx_ref), updated_at = now()
+            WHERE batch_id = %s AND chunk_no = %s AND status <> 'sent';
+        """, (status, tx_ref, batch_id, chunk_no))
+        updated = cursor.rowcount
+        conn.commit()
+        return updated
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# ============================================================
+# CLI
+# ============================================================
+
+def main(argv=None):
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Compute and settle reward payouts")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    compute = commands.add_parser('compute', help="Allocate rewards for expired challenges")
+    compute.add_argument('--challenge-id', type=int, action='append', dest='challenge_ids',
+                         help="Repeatable; default: every eligible expired challenge")
+    compute.add_argument('--chunk-size', type=int, default=PAYOUT_CHUNK_SIZE)
+
+    chunks = commands.add_parser('chunks', help="List chunks that still have unsent items")
+    chunks.add_argument('--batch-id', type=int)
+
+    export = commands.add_parser('export', help="Print one chunk's transfers as NDJSON")
+    export.add_argument('--batch-id', type=int, required=True)
+    export.add_argument('--chunk', type=int, required=True)
+
+    mark = commands.add_parser('mark', help="Record a chunk's transfer result")
+    mark.add_argument('--batch-id', type=int, required=True)
+    mark.add_argument('--chunk', type=int, required=True)
+    mark.add_argument('--status', choices=CHUNK_STATUSES, default='sent')
+    mark.add_argument('--tx-ref')
+
+    args = parser.parse_args(argv)
+
+    load_dotenv('.env')
+    conn = psycopg2.connect(os.environ['TIMESCALE_SERVICE_URL'])
+    try:
+        if args.command == 'compute':
+            result = compute_payout_batch(conn, args.challenge_ids, args.chunk_size)
+        elif args.command == 'chunks':
+            result = unsent_chunks(conn, args.batch_id)
+        elif args.command == 'export':
+            for transfer in get_payout_chunk(conn, args.batch_id, args.chunk):
+                sys.stdout.write(json.dumps(transfer) + "\n")
+            return
+        else:
+            result = {"updated": mark_payout_chunk(conn, args.batch_id, args.chunk, args.status, args.tx_ref)}
+        print(json.dumps(result, indent=2))
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Row Mapping
+Brand Challenge Mini App - Tuple rows straight to JSON for large list responses
+
+The pool hands out RealDictCursor connections, so by default every row is
+built three times: as a RealDictRow, as the handler's renamed dict, and again
+by FastAPI while validating/encoding the response. For list endpoints that
+can return many rows (leaderboard, submission history) a RowMapper instead
+reads plain tuples and turns them into the response body in one pass:
+
+    LEADERBOARD_ROW = RowMapper(['username', 'first_name', 'photo_url', 'submission_count'])
+
+    cursor = tuple_cursor(conn)
+    cursor.execute("SELECT username, first_name, photo_url, ... ")
+    return LEADERBOARD_ROW.response(cursor.fetchall())
+
+The mapper is compiled once per query into a list comprehension with the
+keys and column indexes inlined, and the result is rendered to JSON bytes
+directly, skipping FastAPI's response validation (the response_model still
+documents the endpoint). See bench_rows.py for the measured difference.
+
+Sparse fieldsets (``?fields=id,title``) go through RowFields, which knows
+the SQL expression behind every response field: only the requested
+expressions are selected, and a mapper for exactly those columns is
+compiled (once per distinct field set).
+"""
+
+import json
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import psycopg2.extensions
+from fastapi import Response
+
+FieldSpec = Union[str, Tuple[str, Callable[[Any], Any]]]
+
+# (key, SQL expression) or (key, SQL expression, converter)
+ColumnSpec = Union[Tuple[str, str], Tuple[str, str, Callable[[Any], Any]]]
+
+
+def tuple_cursor(conn):
+    """Plain tuple cursor, regardless of the connection's cursor_factory"""
+    return conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+
+
+def render_json(content: Any) -> bytes:
+    """Same encoding as starlette's JSONResponse.render"""
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class RowMapper:
+    """
+    ``fields`` gives the output key for each SELECT column, in column order.
+    A ``(key, converter)`` pair converts the value first, e.g.
+    ``('created_at', datetime.isoformat)``; values must be JSON-ready after
+    conversion.
+    """
+
+    def __init__(self, fields: Sequence[FieldSpec]):
+        namespace = {}
+        items = []
+        for i, field in enumerate(fields):
+            key, convert = (field, None) if isinstance(field, str) else field
+            if convert is None:
+                items.append(f"{key!r}: r[{i}]")
+            else:
+                namespace[f"_convert{i}"] = convert
+                items.append(f"{key!r}: _convert{i}(r[{i}])")
+        self.keys = [field if isinstance(field, str) else field[0] for field in fields]
+
+        source = f"def map_rows(rows):\n    return [{{{', '.join(items)}}} for r in rows]\n"
+        exec(compile(source, f"<RowMapper {', '.join(self.keys)}>", "exec"), namespace)
+        self.map: Callable[[Iterable[tuple]], List[dict]] = namespace['map_rows']
+
+    def response(self, rows: Iterable[tuple]) -> Response:
+        return Response(content=render_json(self.map(rows)), media_type="application/json")
+
+
+def parse_fields(fields: Optional[str], available: Sequence[str]) -> Tuple[str, ...]:
+    """
+    Validate a ``fields`` query parameter (comma-separated names) against
+    ``available``. Returns the requested names in ``available`` order, or
+    all of them when ``fields`` is None. Raises ValueError otherwise.
+    """
+    if fields is None:
+        return tuple(available)
+    requested = {name.strip() for name in fields.split(',') if name.strip()}
+    if not requested:
+        raise ValueError("fields must name at least one field")
+    unknown = sorted(requested.difference(available))
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)} (available: {', '.join(available)})")
+    return tuple(name for name in available if name in requested)
+
+
+class RowFields:
+    """
+    Response fields of a list query with the SQL expression behind each:
+
+        USER_SUBMISSION_FIELDS = RowFields([
+            ('id', 's.submission_id'),
+            ('created_at', 's.created_at', datetime.isoformat),
+        ])
+
+        keys = USER_SUBMISSION_FIELDS.parse(fields)
+        cursor.execute(f"SELECT {USER_SUBMISSION_FIELDS.select(keys)} FROM ...")
+        return USER_SUBMISSION_FIELDS.mapper(keys).response(cursor.fetchall())
+    """
+
+    def __init__(self, columns: Sequence[ColumnSpec]):
+        self.keys = tuple(column[0] for column in columns)
+        self._expressions = {column[0]: column[1] for column in columns}
+        self._specs: Dict[str, FieldSpec] = {
+            column[0]: column[0] if len(column) == 2 else (column[0], column[2]) for column in columns
+        }
+        self._mappers: Dict[Tuple[str, ...], RowMapper] = {}
+
+    def parse(self, fields: Optional[str]) -> Tuple[str, ...]:
+        return parse_fields(fields, self.keys)
+
+    def select(self, keys: Optional[Sequence[str]] = None) -> str:
+        """SELECT list for ``keys`` (default: every field)"""
+        return ", ".join(self._expressions[key] for key in keys or self.keys)
+
+    def mapper(self, keys: Optional[Sequence[str]] = None) -> RowMapper:
+        keys = tuple(keys or self.keys)
+        mapper = self._mappers.get(keys)
+        if mapper is None:
+            mapper = self._mappers[keys] = RowMapper([self._specs[key] for key in keys])
+        return mapper
@@ -0,0 +1,107 @@
+"""
+Challenge Search
+Brand Challenge Mini App - In-memory inverted index over the active challenge set
+
+The active set is small and already cached per worker, so the common search
+(active challenges only) is answered from an inverted index built from that
+cache without touching the database. Searches that include expired
+challenges use the GIN-indexed ``challenges.search_vector`` column instead
+(migrations/005_challenge_search.sql).
+
+Ranking mirrors the tsvector weights: title (A) > description (B) > reward_info (C).
+Every query term must match (like plainto_tsquery); the last term also
+matches as a prefix so type-ahead queries work.
+"""
+
+import math
+import re
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+FIELD_WEIGHTS = {
+    'title': 1.0,
+    'description': 0.4,
+    'reward_info': 0.2,
+}
+
+STOPWORDS = frozenset("""
+    a an and are as at be by for from in is it of on or the to with your you
+""".split())
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _stem(token: str) -> str:
+    """Light English suffix stripping so 'displays' matches 'display'"""
+    for suffix in ('ies', 'es', 's', 'ing', 'ed'):
+        if len(token) > len(suffix) + 2 and token.endswith(suffix):
+            return token[:-len(suffix)] + ('y' if suffix == 'ies' else '')
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(t) for t in _TOKEN_RE.findall((text or '').lower()) if t not in STOPWORDS]
+
+
+class InvertedIndex:
+    """
+    term -> {doc position: weighted term frequency}
+
+    Built once per cache generation from (deadline, challenge) pairs as
+    produced by the challenge list cache.
+    """
+
+    def __init__(self, challenges: List[Tuple[object, dict]]):
+        self.docs = challenges
+        self.postings: Dict[str, Dict[int, float]] = defaultdict(lambda: defaultdict(float))
+        for position, (_, challenge) in enumerate(challenges):
+            for field, weight in FIELD_WEIGHTS.items():
+                tokens = tokenize(challenge.get(field))
+                if not tokens:
+                    continue
+                # Length-normalised like ts_rank_cd normalisation 1 (log length)
+                norm = 1.0 / (1.0 + math.log(len(tokens)))
+                for token in tokens:
+                    self.postings[token][position] += weight * norm
+        self.terms = sorted(self.postings)
+
+    def _matches(self, term: str, prefix: bool) -> Dict[int, float]:
+        if not prefix:
+            return self.postings.get(term, {})
+        matched: Dict[int, float] = defaultdict(float)
+        # Binary search the sorted vocabulary for the prefix range
+        lo, hi = 0, len(self.terms)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.terms[mid] < term:
+                lo = mid + 1
+            else:
+                hi = mid
+        for candidate in self.terms[lo:]:
+            if not candidate.startswith(term):
+                break
+            for position, score in self.postings[candidate].items():
+                matched[position] = max(matched[position], score)
+        return matched
+
+    def search(self, query: str, is_live=lambda deadline: True) -> List[dict]:
+        """Return matching challenges ordered by rank, then deadline"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        scores: Dict[int, float] = {}
+        for i, term in enumerate(terms):
+            matched = self._matches(term, prefix=(i == len(terms) - 1))
+            if i == 0:
+                scores = dict(matched)
+            else:
+                scores = {p: s + matched[p] for p, s in scores.items() if p in matched}
+            if not scores:
+                return []
+
+        ranked = sorted(
+            (p for p in scores if is_live(self.docs[p][0])),
+            key=lambda p: (-scores[p], self.docs[p][0])
+        )
+        return [self.docs[p][1] for p in ranked]
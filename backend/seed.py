@@ -0,0 +1,367 @@
+"""
+Synthetic Dataset Generator
+Brand Challenge Mini App - Bulk-load realistic users, challenges and submissions for benchmarks
+
+Generates data with the skew real campaigns show and streams it into a
+LOCAL Postgres with COPY (constant memory at any size):
+
+- Participation is power-law: a few users submit to hundreds of
+  challenges, most users to one or two (Pareto, SEED_PARTICIPATION_ALPHA).
+- Challenge popularity is Zipf-distributed, so a few campaigns collect
+  most submissions.
+- created_at is bursty: most submissions arrive right after a challenge
+  launches, the rest spread over its lifetime with a daily cycle.
+- ~10% of challenges are still active, the rest expired. Verification
+  status is approved / rejected / error, never pending, so a server started
+  on the data does not queue AI verification for it.
+
+Seeded users have telegram_id >= SEED_TELEGRAM_BASE and challenges are
+titled "Seed challenge N"; ``--reset`` deletes exactly those rows first
+and ``--clean`` only deletes them.
+Triggers (event and cache NOTIFY) are disabled for the load when the role
+is allowed to (session_replication_role), and the tables are analyzed
+afterwards.
+
+    python seed.py --scale 10k --reset
+    python seed.py --users 50000 --challenges 2000 --submissions 1000000
+    python seed.py --clean
+
+Uses SEED_DATABASE_URL, else TIMESCALE_SERVICE_URL; refuses non-local
+hosts unless --allow-remote is given.
+"""
+
+import argparse
+import bisect
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List
+from urllib.parse import urlparse, parse_qs
+
+import psycopg2
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+
+SEED_TELEGRAM_BASE = 9_000_000_000
+SEED_TITLE_PREFIX = "Seed challenge"
+SEED_PARTICIPATION_ALPHA = float(os.environ.get('SEED_PARTICIPATION_ALPHA', '1.6'))
+SEED_POPULARITY_EXPONENT = float(os.environ.get('SEED_POPULARITY_EXPONENT', '1.1'))
+
+# --scale presets: total submissions, users and challenges scale with it
+SCALES = {
+    '10k': (10_000, 2_000, 200),
+    '1m': (1_000_000, 100_000, 5_000),
+    '10m': (10_000_000, 1_000_000, 20_000),
+}
+
+CATEGORIES = ['retail', 'food', 'outdoor', 'events', 'transport', 'nightlife']
+
+# (lat, lng) centres challenges with a location cluster around
+CITIES = [
+    ('Berlin', 52.52, 13.405),
+    ('London', 51.507, -0.128),
+    ('New York', 40.713, -74.006),
+    ('Dubai', 25.205, 55.271),
+    ('Singapore', 1.352, 103.82),
+    ('São Paulo', -23.551, -46.633),
+]
+
+# Relative submission volume per UTC hour (quiet nights, evening peak)
+HOUR_WEIGHTS = [2, 1, 1, 1, 1, 2, 3, 5, 6, 6, 6, 7, 8, 7, 6, 6, 7, 8, 10, 11, 10, 8, 5, 3]
+_HOUR_CUMULATIVE = list(itertools.accumulate(HOUR_WEIGHTS))
+
+STATUSES = ('approved', 'rejected', 'error')
+_STATUS_CUMULATIVE = list(itertools.accumulate((85, 12, 3)))
+
+# ============================================================
+# COPY STREAMING
+# ============================================================
+
+class RowStream:
+    """Read-only file object over generated COPY text lines (what copy_expert reads from)"""
+
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._buffer = ''
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._lines)
+            except StopIteration:
+                break
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    readline = read
+
+
+def _copy_line(*values) -> str:
+    return '\t'.join(
+        '\\N' if v is None else str(v).replace('\\', '\\\\').replace('\t', ' ').replace('\n', ' ')
+        for v in values
+    ) + '\n'
+
+# ============================================================
+# DISTRIBUTIONS
+# ============================================================
+
+def participation_counts(users: int, submissions: int, max_per_user: int, rng: random.Random) -> List[int]:
+    """
+    Submissions per user: Pareto-distributed, scaled to the target total and
+    capped at one submission per challenge. Users may end up with none, so
+    totals below the user count are reachable.
+    """
+    raw = [rng.paretovariate(SEED_PARTICIPATION_ALPHA) for _ in range(users)]
+    scale = submissions / sum(raw)
+    counts = [min(max_per_user, max(0, int(w * scale))) for w in raw]
+    # Top up (or trim) to the exact total with users that have room
+    missing = submissions - sum(counts)
+    order = list(range(users))
+    rng.shuffle(order)
+    for i in itertools.cycle(order):
+        if missing == 0:
+            break
+        if missing > 0 and counts[i] < max_per_user:
+            counts[i] += 1
+            missing -= 1
+        elif missing < 0 and counts[i] > 0:
+            counts[i] -= 1
+            missing += 1
+    return counts
+
+
+def zipf_cumulative(n: int, exponent: float) -> List[float]:
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(n)))
+
+
+def pick_challenges(k: int, cumulative: List[float], rng: random.Random) -> List[int]:
+    """k distinct challenge indexes, weighted by popularity"""
+    n = len(cumulative)
+    if k * 2 > n:
+        return rng.sample(range(n), k)
+    picked = set()
+    total = cumulative[-1]
+    while len(picked) < k:
+        picked.add(bisect.bisect_left(cumulative, rng.random() * total))
+    return list(picked)
+
+
+def bursty_time(start: datetime, end: datetime, rng: random.Random) -> datetime:
+    """Launch burst (70%) or anywhere in the window, snapped to a weighted hour of day"""
+    window = max((end - start).total_seconds(), 3600.0)
+    if rng.random() < 0.7:
+        offset = min(rng.expovariate(1 / (window * 0.05)), window)
+    else:
+        offset = rng.random() * window
+    moment = start + timedelta(seconds=offset)
+    hour = rng.choices(range(24), cum_weights=_HOUR_CUMULATIVE)[0]
+    moment = moment.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60))
+    return min(max(moment, start), end)
+
+# ============================================================
+# GENERATORS
+# ============================================================
+
+def user_lines(users: int, rng: random.Random) -> Iterator[str]:
+    for i in range(users):
+        wallet = f"EQ{rng.getrandbits(160):040x}" if rng.random() < 0.5 else None
+        yield _copy_line(SEED_TELEGRAM_BASE + i, f"seed_user_{i}", f"Seed{i}", None, None, wallet)
+
+
+def challenge_rows(challenges: int, now: datetime, rng: random.Random) -> List[tuple]:
+    """(start, deadline, copy line) per challenge"""
+    rows = []
+    for i in range(challenges):
+        duration = timedelta(days=rng.choice([3, 7, 14, 30]))
+        if rng.random() < 0.1:
+            deadline = now + timedelta(seconds=rng.random() * duration.total_seconds())
+        else:
+            deadline = now - timedelta(days=rng.random() * 730)
+        start = deadline - duration
+        status = 'active' if deadline > now else 'expired'
+        if rng.random() < 0.6:
+            city, lat, lng = rng.choice(CITIES)
+            lat, lng = round(lat + rng.gauss(0, 0.1), 6), round(lng + rng.gauss(0, 0.1), 6)
+        else:
+            city = lat = lng = None
+        reward = rng.choice([None, None, 1, 5, 10])
+        line = _copy_line(
+            f"{SEED_TITLE_PREFIX} {i}",
+            f"Photograph the {rng.choice(CATEGORIES)} display for campaign {i}",
+            f"https://cdn.example.com/challenges/{i}.jpg",
+            f"{reward or 2} TON",
+            deadline.isoformat(),
+            status,
+            reward,
+            lat,
+            lng,
+            city,
+            rng.choice(CATEGORIES),
+        )
+        rows.append((start, deadline, line))
+    return rows
+
+
+def submission_lines(user_ids: List[int], challenge_ids: List[int], windows: List[tuple],
+                     counts: List[int], now: datetime, rng: random.Random) -> Iterator[str]:
+    cumulative = zipf_cumulative(len(challenge_ids), SEED_POPULARITY_EXPONENT)
+    # Popularity rank -> challenge, shuffled so popular campaigns are spread over time
+    by_rank = list(range(len(challenge_ids)))
+    rng.shuffle(by_rank)
+    for user_id, k in zip(user_ids, counts):
+        for rank in pick_challenges(k, cumulative, rng):
+            c = by_rank[rank]
+            start, deadline = windows[c]
+            created_at = bursty_time(start, min(deadline, now), rng)
+            status = rng.choices(STATUSES, cum_weights=_STATUS_CUMULATIVE)[0]
+            yield _copy_line(
+                user_id, challenge_ids[c],
+                f"https://cdn.example.com/submissions/{user_id}/{challenge_ids[c]}.jpg",
+                status, created_at.isoformat()
+            )
+
+# ============================================================
+# LOAD
+# ============================================================
+
+def _is_local(dsn: str) -> bool:
+    if '://' not in dsn:
+        host = dict(part.split('=', 1) for part in dsn.split() if '=' in part).get('host', '')
+    else:
+        parsed = urlparse(dsn)
+        host = parsed.hostname or parse_qs(parsed.query).get('host', [''])[0]
+    return host in ('', 'localhost', '127.0.0.1', '::1') or host.startswith('/')
+
+
+def reset(cursor):
+    cursor.execute("DELETE FROM users WHERE telegram_id >= %s;", (SEED_TELEGRAM_BASE,))
+    cursor.execute("DELETE FROM challenges WHERE title LIKE %s;", (f"{SEED_TITLE_PREFIX} %",))
+
+
+def seed(conn, users: int, challenges: int, submissions: int, seed_value: int = 0, do_reset: bool = False) -> dict:
+    rng = random.Random(seed_value)
+    now = datetime.now(timezone.utc)
+    cursor = conn.cursor()
+    timings = {}
+    try:
+        # Before disabling triggers: the ON DELETE CASCADE foreign keys are triggers too
+        if do_reset:
+            started = time.perf_counter()
+            reset(cursor)
+            conn.commit()
+            timings['reset_s'] = time.perf_counter() - started
+
+        try:
+            cursor.execute("SET session_replication_role = replica;")
+        except psycopg2.Error:
+            conn.rollback()
+            print("warning: cannot disable triggers; loading with NOTIFY triggers on", file=sys.stderr)
+
+        started = time.perf_counter()
+        cursor.copy_expert(
+            "COPY users (telegram_id, username, first_name, last_name, photo_url, wallet_address) FROM STDIN;",
+            RowStream(user_lines(users, rng))
+        )
+        cursor.execute(
+            "SELECT user_id FROM users WHERE telegram_id >= %s AND telegram_id < %s ORDER BY telegram_id;",
+            (SEED_TELEGRAM_BASE, SEED_TELEGRAM_BASE + users)
+        )
+        user_ids = [row[0] for row in cursor.fetchall()]
+        timings['users_s'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        rows = challenge_rows(challenges, now, rng)
+        cursor.copy_expert(
+            "COPY challenges (title, description, image_url, reward_info, deadline, status, "
+            "reward_amount, latitude, longitude, location, category) FROM STDIN;",
+            RowStream(line for _, _, line in rows)
+        )
+        cursor.execute(
+            "SELECT challenge_id FROM challenges WHERE title LIKE %s ORDER BY challenge_id DESC LIMIT %s;",
+            (f"{SEED_TITLE_PREFIX} %", challenges)
+        )
+        challenge_ids = sorted(row[0] for row in cursor.fetchall())
+        timings['challenges_s'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        counts = participation_counts(users, submissions, challenges, rng)
+        windows = [(start, deadline) for start, deadline, _ in rows]
+        cursor.copy_expert(
+            "COPY submissions (user_id, challenge_id, image_url, verification_status, created_at) FROM STDIN;",
+            RowStream(submission_lines(user_ids, challenge_ids, windows, counts, now, rng))
+        )
+        timings['submissions_s'] = time.perf_counter() - started
+
+        conn.commit()
+        conn.autocommit = True
+        started = time.perf_counter()
+        cursor.execute("ANALYZE users, challenges, submissions;")
+        timings['analyze_s'] = time.perf_counter() - started
+        return {
+            "users": users,
+            "challenges": challenges,
+            "submissions": sum(counts),
+            "max_submissions_per_user": max(counts),
+            "median_submissions_per_user": sorted(counts)[len(counts) // 2],
+            **{key: round(value, 2) for key, value in timings.items()},
+        }
+    except BaseException:
+        if not conn.autocommit:
+            conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# ============================================================
+# CLI
+# ============================================================
+
+def main(argv=None):
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Load a synthetic dataset for benchmarks")
+    parser.add_argument('--scale', choices=SCALES, help="Preset sizes (overridden by explicit counts)")
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--challenges', type=int)
+    parser.add_argument('--submissions', type=int)
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (same seed, same data)")
+    parser.add_argument('--reset', action='store_true', help="Delete previously seeded rows first")
+    parser.add_argument('--clean', action='store_true', help="Only delete previously seeded rows")
+    parser.add_argument('--allow-remote', action='store_true', help="Allow a non-local database host")
+    args = parser.parse_args(argv)
+
+    submissions, users, challenges = SCALES[args.scale or '10k']
+    users = args.users or users
+    challenges = args.challenges or challenges
+    submissions = args.submissions or submissions
+    if submissions > users * challenges:
+        parser.error("more submissions than user/challenge pairs")
+
+    load_dotenv('.env')
+    dsn = os.environ.get('SEED_DATABASE_URL') or os.environ['TIMESCALE_SERVICE_URL']
+    if not _is_local(dsn) and not args.allow_remote:
+        parser.error("refusing to seed a non-local database (pass --allow-remote)")
+
+    conn = psycopg2.connect(dsn)
+    try:
+        if args.clean:
+            with conn, conn.cursor() as cursor:
+                reset(cursor)
+            return
+        result = seed(conn, users, challenges, submissions, args.seed, args.reset)
+    finally:
+        conn.close()
+    for key, value in result.items():
+        print(f"{key:<30}{value}")
+
+
+if __name__ == '__main__':
+    main()
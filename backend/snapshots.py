@@ -0,0 +1,208 @@
+"""
+Last-known-good Snapshots
+Brand Challenge Mini App - Stale-while-revalidate fallback for read endpoints
+
+Challenge data is nearly static, so a database outage should not take the
+Mini App down. Every successful load of a snapshotted read (the active
+challenge list, each challenge detail) is recorded in memory and persisted
+to SNAPSHOT_FILE, so it also survives restarts. Changes are written at most
+once per SNAPSHOT_FLUSH_S on a background timer, and only the
+SNAPSHOT_MAX_ENTRIES most recently recorded keys are kept.
+
+When a read fails because the database is unreachable, the last snapshot is
+served immediately instead (the endpoint marks the response stale) and the
+value is revalidated on a background thread. Writes never use snapshots and
+keep failing fast.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+import psycopg2
+from fastapi import HTTPException
+
+from db_pool import DatabaseUnavailable, PoolExhausted
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+
+SNAPSHOT_FILE = os.environ.get('SNAPSHOT_FILE', 'snapshots.json')
+SNAPSHOT_REVALIDATE_S = float(os.environ.get('SNAPSHOT_REVALIDATE_S', '5'))
+SNAPSHOT_FLUSH_S = float(os.environ.get('SNAPSHOT_FLUSH_S', '5'))
+SNAPSHOT_MAX_ENTRIES = int(os.environ.get('SNAPSHOT_MAX_ENTRIES', '1000'))
+
+
+def database_unavailable(error: BaseException) -> bool:
+    """True for errors that mean 'no database right now' rather than a bad request"""
+    if isinstance(error, HTTPException):
+        return error.status_code == 503
+    return isinstance(error, (DatabaseUnavailable, PoolExhausted, psycopg2.OperationalError, psycopg2.InterfaceError))
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Cannot snapshot {type(value).__name__}")
+
+
+def _decode(obj: dict):
+    if obj.keys() == {"__datetime__"}:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+class Snapshot:
+    __slots__ = ('value', 'saved_at')
+
+    def __init__(self, value: Any, saved_at: float):
+        self.value = value
+        self.saved_at = saved_at
+
+    @property
+    def age_s(self) -> int:
+        return max(0, int(time.time() - self.saved_at))
+
+
+class SnapshotStore:
+    """
+    key -> Snapshot, persisted as one JSON file (written atomically, at most
+    once per ``flush_s`` after a change). Beyond ``max_entries`` the least
+    recently recorded key is evicted.
+
+    Values must be JSON-serialisable apart from datetimes; tuples come back
+    as lists.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = SNAPSHOT_FILE,
+        revalidate_s: float = SNAPSHOT_REVALIDATE_S,
+        flush_s: float = SNAPSHOT_FLUSH_S,
+        max_entries: int = SNAPSHOT_MAX_ENTRIES,
+    ):
+        self.path = path
+        self.revalidate_s = revalidate_s
+        self.flush_s = flush_s
+        self.max_entries = max_entries
+        self._snapshots: "OrderedDict[str, Snapshot]" = OrderedDict()
+        self._encoded: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        self._revalidating: Dict[str, float] = {}
+        self.served_stale = 0
+        self._load_file()
+
+    def get(self, key: str) -> Optional[Snapshot]:
+        return self._snapshots.get(key)
+
+    def put(self, key: str, value: Any) -> Any:
+        """Record a freshly loaded value and return it (None is never recorded)"""
+        if value is None:
+            return value
+        encoded = json.dumps(value, default=_encode, sort_keys=True)
+        with self._lock:
+            self._snapshots[key] = Snapshot(value, time.time())
+            self._snapshots.move_to_end(key)
+            while len(self._snapshots) > self.max_entries:
+                evicted, _ = self._snapshots.popitem(last=False)
+                self._encoded.pop(evicted, None)
+            if self._encoded.get(key) == encoded:
+                return value
+            self._encoded[key] = encoded
+            self._schedule_flush()
+        return value
+
+    def recorder(self, key: str, loader: Callable[[], Any]) -> Callable[[], Any]:
+        """Wrap a loader so every successful load is recorded under ``key``"""
+        return lambda: self.put(key, loader())
+
+    def read(self, key: str, fetch: Callable[[], Any], loader: Callable[[], Any]):
+        """
+        ``(fetch(), None)`` when the database answers; otherwise the last
+        snapshot as ``(value, age_s)`` and ``loader`` is re-run in the
+        background. ``fetch`` is the normal (usually cached) read and should
+        record through ``recorder``. Re-raises errors that are not an outage,
+        or when there is no snapshot yet.
+        """
+        try:
+            return fetch(), None
+        except Exception as e:
+            if not database_unavailable(e):
+                raise
+            snapshot = self.get(key)
+            if snapshot is None:
+                raise
+        self.served_stale += 1
+        self.revalidate(key, loader)
+        return snapshot.value, snapshot.age_s
+
+    def revalidate(self, key: str, loader: Callable[[], Any]):
+        """Reload ``key`` on a background thread, at most once per SNAPSHOT_REVALIDATE_S"""
+        now = time.monotonic()
+        with self._lock:
+            if self._revalidating.get(key, 0) > now:
+                return
+            self._revalidating[key] = now + self.revalidate_s
+
+        def run():
+            try:
+                self.put(key, loader())
+            except Exception as e:
+                logger.debug("Snapshot revalidation of %s failed: %s", key, e)
+
+        threading.Thread(target=run, name=f"snapshot-{key}", daemon=True).start()
+
+    # ---------------- persistence ----------------
+
+    def _load_file(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                stored = json.load(f, object_hook=_decode)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable snapshot file %s: %s", self.path, e)
+            return
+        newest = sorted(stored.items(), key=lambda item: item[1]['saved_at'])[-self.max_entries:]
+        for key, entry in newest:
+            self._snapshots[key] = Snapshot(entry['value'], entry['saved_at'])
+            self._encoded[key] = json.dumps(entry['value'], default=_encode, sort_keys=True)
+
+    def _schedule_flush(self):
+        """Caller holds the lock. Starts the flush timer unless one is pending"""
+        if not self.path or self._flush_timer is not None:
+            return
+        self._flush_timer = threading.Timer(self.flush_s, self.flush)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def flush(self):
+        """Write pending changes now (also called on shutdown)"""
+        with self._write_lock:
+            with self._lock:
+                if self._flush_timer is None:
+                    return
+                self._flush_timer.cancel()
+                self._flush_timer = None
+                stored = {key: {"saved_at": s.saved_at, "value": s.value} for key, s in self._snapshots.items()}
+            self._save_file(stored)
+
+    def _save_file(self, stored: dict):
+        """Written to a temp file and renamed, so readers never see a partial file"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(stored, f, default=_encode)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Could not persist snapshots to %s: %s", self.path, e)
@@ -4,18 +4,54 @@ Test script for Brand Challenge API endpoints
 Run this after starting the server with: uvicorn main:app --reload
 """
 import requests
+import base64
+import csv
+import io
 import json
-from datetime import datetime
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import psycopg2
 
 # API base URL (change for production)
 BASE_URL = "http://localhost:8000"
 
+# Admin endpoint tests run only when the server's ADMIN_API_TOKEN is exported here too
+ADMIN_API_TOKEN = os.environ.get("ADMIN_API_TOKEN")
+ADMIN_HEADERS = {"Authorization": f"Bearer {ADMIN_API_TOKEN}"}
+
+# Tests that need to hold database locks connect directly (skipped when unset)
+DATABASE_URL = os.environ.get("TIMESCALE_SERVICE_URL")
+
 def print_section(title):
     """Print section header"""
     print("\n" + "="*60)
     print(f"  {title}")
     print("="*60)
 
+def create_challenge_response(**fields):
+    """POST /challenges with a valid body (expiring in an hour) overridden by fields"""
+    challenge = {
+        "title": f"Test challenge {datetime.now().timestamp()}",
+        "description": "Photo of the test product",
+        "image_url": "https://example.com/test_challenge.jpg",
+        "reward_info": "1 TON",
+        "deadline": (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat(),
+        **fields
+    }
+    return requests.post(f"{BASE_URL}/challenges", json=challenge, headers=ADMIN_HEADERS)
+
+def create_test_challenge(title, **fields):
+    """Create a challenge through the admin API (None without ADMIN_API_TOKEN)"""
+    if not ADMIN_API_TOKEN:
+        return None
+    response = create_challenge_response(title=f"{title} {datetime.now().timestamp()}", **fields)
+    assert response.status_code == 200, response.text
+    return response.json()
+
 def test_health():
     """Test health check endpoint"""
     print_section("1. Testing Health Check")
@@ -67,6 +103,20 @@ def test_wallet_link(telegram_id):
     except Exception as e:
         print(f"❌ Wallet link failed: {e}")
 
+def test_bootstrap(telegram_id):
+    """Test single-call Mini App bootstrap"""
+    print_section("3b. Testing Bootstrap")
+    try:
+        response = requests.get(f"{BASE_URL}/bootstrap/{telegram_id}")
+        print(f"Status: {response.status_code}")
+        data = response.json()
+        print(f"Challenges: {len(data['challenges'])}, submissions: {len(data['submissions'])}")
+        assert response.status_code == 200
+        assert data['user']['telegram_id'] == telegram_id
+        print("✅ Bootstrap passed")
+    except Exception as e:
+        print(f"❌ Bootstrap failed: {e}")
+
 def test_get_challenges():
     """Test getting challenges"""
     print_section("4. Testing Get Challenges")
@@ -96,6 +146,149 @@ def test_get_challenge_detail(challenge_id):
     except Exception as e:
         print(f"❌ Get challenge detail failed: {e}")
 
+def test_search_challenges(title):
+    """Test challenge search"""
+    print_section("5b. Testing Challenge Search")
+    try:
+        query = title.split()[0]
+        response = requests.get(f"{BASE_URL}/challenges/search", params={"q": query})
+        print(f"Status: {response.status_code}")
+        data = response.json()
+        print(f"Query '{query}' matched {data['total']} challenges")
+        assert response.status_code == 200
+        assert any(c['title'] == title for c in data['results'])
+        print("✅ Challenge search passed")
+    except Exception as e:
+        print(f"❌ Challenge search failed: {e}")
+
+def test_nearby_challenges(challenges):
+    """Test location-based challenge lookup"""
+    print_section("5c. Testing Nearby Challenges")
+    try:
+        located = [c for c in challenges if c.get('latitude') is not None]
+        lat, lng = (located[0]['latitude'], located[0]['longitude']) if located else (52.52, 13.405)
+        
+        response = requests.get(f"{BASE_URL}/challenges/nearby", params={"lat": lat, "lng": lng, "k": 5})
+        print(f"Status: {response.status_code}")
+        nearby = response.json()
+        print(f"Found {len(nearby)} challenges near ({lat}, {lng})")
+        assert response.status_code == 200
+        assert len(nearby) <= 5
+        assert [c['distance_km'] for c in nearby] == sorted(c['distance_km'] for c in nearby)
+        if located:
+            assert nearby and nearby[0]['distance_km'] == 0
+        
+        response = requests.get(f"{BASE_URL}/challenges/nearby", params={"lat": lat, "lng": lng, "radius_km": 10})
+        assert response.status_code == 200
+        assert all(c['distance_km'] <= 10 for c in response.json())
+        
+        response = requests.get(f"{BASE_URL}/challenges/nearby", params={"lat": lat, "lng": lng})
+        assert response.status_code == 400
+        print("✅ Nearby challenges passed")
+    except Exception as e:
+        print(f"❌ Nearby challenges failed: {e}")
+
+def test_create_challenge():
+    """Test creating one challenge through the admin API"""
+    print_section("5d. Testing Challenge Creation")
+    if not ADMIN_API_TOKEN:
+        print("ℹ️  Skipped: set ADMIN_API_TOKEN")
+        return
+    try:
+        challenge = create_test_challenge("Create test", latitude=48.8566, longitude=2.3522, category="test")
+        print(f"Created challenge {challenge['id']}")
+        assert challenge['status'] == 'active'
+        assert (challenge['latitude'], challenge['longitude'], challenge['category']) == (48.8566, 2.3522, "test")
+        
+        listed = requests.get(f"{BASE_URL}/challenges").json()
+        assert any(c['id'] == challenge['id'] for c in listed)
+        
+        unauthorized = requests.post(f"{BASE_URL}/challenges", json={"title": "x"})
+        assert unauthorized.status_code == 401
+        past = create_challenge_response(deadline=(datetime.now(timezone.utc) - timedelta(hours=1)).isoformat())
+        assert past.status_code == 422
+        print("✅ Challenge creation passed")
+    except Exception as e:
+        print(f"❌ Challenge creation failed: {e}")
+
+def bulk_import(body, content_type):
+    return requests.post(
+        f"{BASE_URL}/challenges/bulk", data=body,
+        headers={**ADMIN_HEADERS, "Content-Type": content_type}
+    )
+
+def active_titles(prefix):
+    return [c['title'] for c in requests.get(f"{BASE_URL}/challenges").json() if c['title'].startswith(prefix)]
+
+def test_bulk_import():
+    """Test CSV / NDJSON bulk challenge import"""
+    print_section("5e. Testing Bulk Challenge Import")
+    if not ADMIN_API_TOKEN:
+        print("ℹ️  Skipped: set ADMIN_API_TOKEN")
+        return
+    try:
+        prefix = f"Bulk test {datetime.now().timestamp()}"
+        deadline = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+        header = "title,description,image_url,reward_info,deadline\n"
+        
+        # Valid CSV, including a quoted field spanning two lines; IDs come back in input order
+        csv_body = header + "".join(
+            f'{prefix} csv {i},"Line one\nline two",https://example.com/{i}.jpg,1 TON,{deadline}\n'
+            for i in range(3)
+        )
+        response = bulk_import(csv_body, "text/csv")
+        print(f"CSV: {response.status_code} {response.text}")
+        assert response.status_code == 200
+        assert response.json()['created'] == 3
+        for i, challenge_id in enumerate(response.json()['challenge_ids']):
+            detail = requests.get(f"{BASE_URL}/challenges/{challenge_id}").json()
+            assert detail['title'] == f"{prefix} csv {i}"
+            assert detail['description'] == "Line one\nline two"
+        
+        ndjson_body = "".join(json.dumps({
+            "title": f"{prefix} ndjson {i}", "description": "NDJSON row",
+            "image_url": "https://example.com/n.jpg", "reward_info": "1 TON", "deadline": deadline
+        }) + "\n" for i in range(2))
+        response = bulk_import(ndjson_body, "application/x-ndjson")
+        print(f"NDJSON: {response.status_code} {response.text}")
+        assert response.status_code == 200
+        titles = [requests.get(f"{BASE_URL}/challenges/{i}").json()['title'] for i in response.json()['challenge_ids']]
+        assert titles == [f"{prefix} ndjson 0", f"{prefix} ndjson 1"]
+        
+        # One invalid row rejects the whole batch with line numbers
+        bad_prefix = f"{prefix} bad"
+        past = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+        bad_body = (
+            header
+            + f"{bad_prefix} 1,Ok,https://example.com/1.jpg,1 TON,{deadline}\n"
+            + f"{bad_prefix} 2,Past,https://example.com/2.jpg,1 TON,{past}\n"
+            + f",No title,https://example.com/3.jpg,1 TON,{deadline}\n"
+        )
+        response = bulk_import(bad_body, "text/csv")
+        print(f"Invalid rows: {response.status_code} {response.text}")
+        assert response.status_code == 422
+        assert [error['line'] for error in response.json()['detail']['errors']] == [3, 4]
+        assert active_titles(bad_prefix) == []
+        
+        response = bulk_import("title,description,image_url,reward_info,deadline,colour\n", "text/csv")
+        assert response.status_code == 422 and "Unknown column" in response.json()['detail']['message']
+        response = bulk_import("title,description,image_url,reward_info\n", "text/csv")
+        assert response.status_code == 422 and "Missing column" in response.json()['detail']['message']
+        
+        max_rows = int(os.environ.get("CHALLENGE_IMPORT_MAX_ROWS", "10000"))
+        big_prefix = f"{prefix} big"
+        response = bulk_import(header + "".join(
+            f"{big_prefix} {i},Row,https://example.com/b.jpg,1 TON,{deadline}\n" for i in range(max_rows + 1)
+        ), "text/csv")
+        print(f"{max_rows + 1} rows: {response.status_code}")
+        assert response.status_code == 413
+        assert active_titles(big_prefix) == []
+        
+        assert bulk_import(csv_body, "application/json").status_code == 415
+        print("✅ Bulk challenge import passed")
+    except Exception as e:
+        print(f"❌ Bulk challenge import failed: {e}")
+
 def test_submit_photo(telegram_id, challenge_id):
     """Test photo submission"""
     print_section("6. Testing Photo Submission")
@@ -118,6 +311,48 @@ def test_submit_photo(telegram_id, challenge_id):
     except Exception as e:
         print(f"❌ Photo submission failed: {e}")
 
+def test_idempotent_submission(telegram_id):
+    """Test that a retried submission with the same Idempotency-Key is replayed"""
+    print_section("6b. Testing Idempotent Submission Retry")
+    if not ADMIN_API_TOKEN:
+        print("ℹ️  Skipped: set ADMIN_API_TOKEN to create a fresh challenge")
+        return
+    
+    try:
+        challenge = create_test_challenge("Idempotency test")
+        submission_data = {
+            "telegram_id": telegram_id,
+            "challenge_id": challenge['id'],
+            "image_url": f"https://example.com/test_submission_{datetime.now().timestamp()}.jpg"
+        }
+        headers = {"Idempotency-Key": f"test-{datetime.now().timestamp()}"}
+        first = requests.post(f"{BASE_URL}/submissions", json=submission_data, headers=headers)
+        retry = requests.post(f"{BASE_URL}/submissions", json=submission_data, headers=headers)
+        print(f"Status: {first.status_code} then {retry.status_code}")
+        print(f"Replayed: {retry.headers.get('Idempotent-Replayed')}")
+        assert first.status_code == 200
+        assert retry.status_code == 200
+        assert retry.json() == first.json()
+        assert retry.headers.get("Idempotent-Replayed") == "true"
+        
+        submissions = requests.get(f"{BASE_URL}/submissions/user/{telegram_id}").json()
+        assert [s['challenge_id'] for s in submissions].count(challenge['id']) == 1
+        
+        # Errors are not stored: after logging in, the same key succeeds
+        new_user = {"telegram_id": 700000000000 + int(time.time() * 1000) % 10**9, "username": "idempotency_test"}
+        submission_data = {**submission_data, "telegram_id": new_user['telegram_id']}
+        headers = {"Idempotency-Key": f"test-404-{datetime.now().timestamp()}"}
+        first = requests.post(f"{BASE_URL}/submissions", json=submission_data, headers=headers)
+        assert first.status_code == 404
+        assert requests.post(f"{BASE_URL}/users/login", json=new_user).status_code == 200
+        retry = requests.post(f"{BASE_URL}/submissions", json=submission_data, headers=headers)
+        print(f"Unknown user: {first.status_code}, after login: {retry.status_code}")
+        assert retry.status_code == 200
+        assert retry.headers.get("Idempotent-Replayed") is None
+        print("✅ Idempotent submission passed")
+    except Exception as e:
+        print(f"❌ Idempotent submission failed: {e}")
+
 def test_get_user_submissions(telegram_id):
     """Test getting user submissions"""
     print_section("7. Testing Get User Submissions")
@@ -129,10 +364,311 @@ def test_get_user_submissions(telegram_id):
         if submissions:
             print(f"First submission: {json.dumps(submissions[0], indent=2)}")
         assert response.status_code == 200
+        
+        # Pages (spanning hot and archived submissions) add up to the full list
+        paged = []
+        for offset in range(0, len(submissions) + 1, 2):
+            page = requests.get(
+                f"{BASE_URL}/submissions/user/{telegram_id}", params={"limit": 2, "offset": offset}
+            ).json()
+            paged.extend(page)
+        assert [s['id'] for s in paged] == [s['id'] for s in submissions]
         print("✅ Get user submissions passed")
     except Exception as e:
         print(f"❌ Get user submissions failed: {e}")
 
+def test_submission_verification(telegram_id, timeout_s=15):
+    """Test that server-side AI verification settles submission status"""
+    print_section("7b. Testing Server-side Verification")
+    try:
+        deadline = time.time() + timeout_s
+        while True:
+            response = requests.get(f"{BASE_URL}/submissions/user/{telegram_id}")
+            assert response.status_code == 200
+            pending = [s for s in response.json() if s.get('verification_status') == 'pending']
+            if not pending or time.time() > deadline:
+                break
+            time.sleep(0.5)
+        print(f"Pending submissions: {len(pending)}")
+        assert not pending
+        print("✅ Server-side verification passed")
+    except Exception as e:
+        print(f"❌ Server-side verification failed: {e}")
+
+def next_event(lines, predicate, timeout_s=10):
+    """Read SSE frames until one matches predicate(event_type, data); heartbeats are skipped"""
+    deadline = time.time() + timeout_s
+    event_type, data = None, None
+    for line in lines:
+        if line.startswith("event:"):
+            event_type = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data = json.loads(line[len("data:"):])
+        elif line == "" and event_type is not None:
+            if predicate(event_type, data):
+                return event_type, data
+            event_type, data = None, None
+        if time.time() > deadline:
+            break
+    raise AssertionError("expected event not received")
+
+def test_events_stream(telegram_id):
+    """Test the Server-Sent Events stream"""
+    print_section("7c. Testing Real-time Events (SSE)")
+    if not ADMIN_API_TOKEN:
+        print("ℹ️  Skipped: set ADMIN_API_TOKEN to create a challenge")
+        return
+    try:
+        response = requests.get(
+            f"{BASE_URL}/events", params={"telegram_id": telegram_id}, stream=True, timeout=(5, 20)
+        )
+        try:
+            print(f"Status: {response.status_code}, Content-Type: {response.headers.get('content-type')}")
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            lines = response.iter_lines(chunk_size=1, decode_unicode=True)
+            assert next(lines).startswith("retry:")
+            
+            challenge = create_test_challenge("Events test")
+            event_type, data = next_event(lines, lambda t, d: d.get('challenge_id') == challenge['id'])
+            print(f"Received {event_type}: {data}")
+            assert event_type == "challenge_changed"
+            assert data['op'] == "INSERT"
+            
+            submission = requests.post(f"{BASE_URL}/submissions", json={
+                "telegram_id": telegram_id,
+                "challenge_id": challenge['id'],
+                "image_url": f"https://example.com/test_submission_{datetime.now().timestamp()}.jpg"
+            }).json()
+            event_type, data = next_event(
+                lines, lambda t, d: t == "submission_status" and d['submission_id'] == submission['id']
+            )
+            print(f"Received {event_type}: {data}")
+            assert data['telegram_id'] == telegram_id
+            
+            # A multi-row statement arrives as one event with a count
+            deadline = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+            bulk_import("title,description,image_url,reward_info,deadline\n" + "".join(
+                f"Events bulk {i},Row,https://example.com/e.jpg,1 TON,{deadline}\n" for i in range(3)
+            ), "text/csv")
+            event_type, data = next_event(lines, lambda t, d: t == "challenges_changed")
+            print(f"Received {event_type}: {data}")
+            assert data['count'] == 3
+        finally:
+            response.close()
+        print("✅ Real-time events passed")
+    except Exception as e:
+        print(f"❌ Real-time events failed: {e}")
+
+def submit_as_new_user(challenge_id, username, image_url=None):
+    """Log in a fresh user and submit to challenge_id; returns (user, submission)"""
+    user = requests.post(f"{BASE_URL}/users/login", json={
+        "telegram_id": 700000000000 + int(time.time() * 1000) % 10**9, "username": username
+    }).json()
+    submission = requests.post(f"{BASE_URL}/submissions", json={
+        "telegram_id": user['telegram_id'],
+        "challenge_id": challenge_id,
+        "image_url": image_url or f"https://example.com/{username}_{datetime.now().timestamp()}.jpg"
+    })
+    assert submission.status_code == 200, submission.text
+    return user, submission.json()
+
+def test_exports():
+    """Test the admin submission export in CSV, NDJSON and Parquet"""
+    print_section("11. Testing Submission Exports")
+    if not ADMIN_API_TOKEN:
+        print("ℹ️  Skipped: set ADMIN_API_TOKEN")
+        return
+    try:
+        challenge = create_test_challenge("Export test")
+        first_user, first = submit_as_new_user(challenge['id'], "export_first")
+        second_user, second = submit_as_new_user(challenge['id'], "export_second")
+        url = f"{BASE_URL}/exports/submissions"
+        
+        response = requests.get(url, params={"challenge_id": challenge['id']}, headers=ADMIN_HEADERS)
+        print(f"CSV: {response.status_code}, {response.headers.get('content-disposition')}")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert f"challenge_{challenge['id']}" in response.headers["content-disposition"]
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert sorted(int(r['submission_id']) for r in rows) == sorted([first['id'], second['id']])
+        assert {r['telegram_id'] for r in rows} == {str(first_user['telegram_id']), str(second_user['telegram_id'])}
+        assert all(r['challenge_title'] == challenge['title'] for r in rows)
+        
+        # since is inclusive and until exclusive
+        response = requests.get(url, headers=ADMIN_HEADERS, params={
+            "format": "ndjson", "challenge_id": challenge['id'],
+            "since": first['created_at'], "until": second['created_at']
+        })
+        print(f"NDJSON: {response.status_code}")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [r['submission_id'] for r in rows] == [first['id']]
+        assert rows[0]['username'] == "export_first"
+        
+        response = requests.get(url, params={"format": "parquet", "challenge_id": challenge['id']}, headers=ADMIN_HEADERS)
+        print(f"Parquet: {response.status_code}")
+        assert response.status_code == 200
+        assert response.content[:4] == b"PAR1" and response.content[-4:] == b"PAR1"
+        
+        assert requests.get(url, params={"format": "xml"}, headers=ADMIN_HEADERS).status_code == 422
+        assert requests.get(url).status_code == 401
+        print("✅ Submission exports passed")
+    except Exception as e:
+        print(f"❌ Submission exports failed: {e}")
+
+def data_url(content):
+    return "data:image/png;base64," + base64.b64encode(content).decode()
+
+def wait_until(check, timeout_s, interval_s=0.5):
+    """Poll check() until it returns a truthy value (returned) or timeout_s passes (None)"""
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        result = check()
+        if result:
+            return result
+        time.sleep(interval_s)
+    return None
+
+def test_payouts():
+    """Test payout batch computation, chunk transfers and idempotent reruns"""
+    print_section("12. Testing Payouts")
+    if not ADMIN_API_TOKEN:
+        print("ℹ️  Skipped: set ADMIN_API_TOKEN")
+        return
+    try:
+        challenge = create_test_challenge(
+            "Payout test", reward_amount="1.5",
+            deadline=(datetime.now(timezone.utc) + timedelta(seconds=3)).isoformat()
+        )
+        # Approved with a wallet, approved without a wallet, rejected (stub model)
+        winner, winner_sub = submit_as_new_user(challenge['id'], "payout_winner", data_url(b"test image"))
+        no_wallet, no_wallet_sub = submit_as_new_user(challenge['id'], "payout_no_wallet", data_url(b"test image"))
+        _, rejected_sub = submit_as_new_user(challenge['id'], "payout_rejected", data_url(b"REJECT"))
+        wallet = f"EQtest{winner['telegram_id']}"
+        assert requests.post(f"{BASE_URL}/users/wallet", json={
+            "telegram_id": winner['telegram_id'], "wallet_address": wallet
+        }).status_code == 200
+        
+        def statuses():
+            result = {}
+            for user in (winner, no_wallet):
+                for s in requests.get(f"{BASE_URL}/submissions/user/{user['telegram_id']}").json():
+                    result[s['id']] = s['verification_status']
+            return None if 'pending' in result.values() else result
+        verified = wait_until(statuses, 15)
+        if verified != {winner_sub['id']: 'approved', no_wallet_sub['id']: 'approved'}:
+            print(f"ℹ️  Skipped: submissions were not approved ({verified}); run the server with VERIFICATION_MODEL=stub")
+            return
+        
+        print("Waiting for the expiry sweep...")
+        expired = wait_until(
+            lambda: requests.get(f"{BASE_URL}/challenges/{challenge['id']}").json()['status'] == 'expired',
+            float(os.environ.get("EXPIRY_SWEEP_S", "30")) + 10
+        )
+        assert expired, "challenge was not expired by the sweeper"
+        
+        batch_url = f"{BASE_URL}/payouts/batches"
+        request = {"challenge_ids": [challenge['id']], "chunk_size": 1}
+        response = requests.post(batch_url, json=request, headers=ADMIN_HEADERS)
+        print(f"Compute: {response.status_code} {response.text}")
+        assert response.status_code == 200
+        batch = response.json()['batch']
+        assert response.json()['waiting_challenge_ids'] == []
+        assert (batch['item_count'], batch['chunk_count']) == (1, 1)
+        assert Decimal(batch['total_amount']) == Decimal("1.5")
+        
+        # Rerun: everything payable is already allocated
+        response = requests.post(batch_url, json=request, headers=ADMIN_HEADERS)
+        assert response.status_code == 200 and response.json()['batch'] is None
+        
+        chunk_url = f"{batch_url}/{batch['batch_id']}/chunks/0"
+        transfers = requests.get(chunk_url, headers=ADMIN_HEADERS).json()
+        print(f"Chunk 0: {transfers}")
+        assert [(t['wallet_address'], Decimal(t['amount']), t['submission_ids']) for t in transfers] == [
+            (wallet, Decimal("1.5"), [winner_sub['id']])
+        ]
+        
+        mark = {"status": "sent", "tx_ref": f"test-tx-{batch['batch_id']}"}
+        assert requests.post(chunk_url, json=mark, headers=ADMIN_HEADERS).json()['updated'] == 1
+        assert requests.post(chunk_url, json=mark, headers=ADMIN_HEADERS).json()['updated'] == 0
+        assert requests.get(chunk_url, headers=ADMIN_HEADERS).json() == []
+        chunks = requests.get(f"{batch_url}/{batch['batch_id']}", headers=ADMIN_HEADERS).json()['chunks']
+        assert [(c['chunk_no'], c['item_count'], c['sent'], c['failed']) for c in chunks] == [(0, 1, 1, 0)]
+        
+        # A winner who links a wallet later is paid by the next run
+        requests.post(f"{BASE_URL}/users/wallet", json={
+            "telegram_id": no_wallet['telegram_id'], "wallet_address": f"EQtest{no_wallet['telegram_id']}"
+        })
+        response = requests.post(batch_url, json=request, headers=ADMIN_HEADERS)
+        assert response.json()['batch']['item_count'] == 1
+        
+        assert requests.get(f"{batch_url}/999999999", headers=ADMIN_HEADERS).status_code == 404
+        assert requests.post(batch_url, json=request).status_code == 401
+        print("✅ Payouts passed")
+    except Exception as e:
+        print(f"❌ Payouts failed: {e}")
+
+def test_sparse_fields(telegram_id):
+    """Test ?fields= on the list endpoints"""
+    print_section("7d. Testing Sparse Fieldsets")
+    try:
+        cases = [
+            ("/challenges", "id,title,deadline"),
+            (f"/submissions/user/{telegram_id}", "id,verification_status"),
+            ("/leaderboard", "username,submission_count"),
+        ]
+        for path, fields in cases:
+            response = requests.get(f"{BASE_URL}{path}", params={"fields": fields})
+            assert response.status_code == 200, f"{path}: {response.status_code}"
+            rows = response.json()
+            assert rows, f"{path} returned no rows"
+            assert all(set(row) == set(fields.split(',')) for row in rows), f"{path}: {rows[0]}"
+            print(f"  {path}?fields={fields}: {rows[0]}")
+            
+            response = requests.get(f"{BASE_URL}{path}", params={"fields": "id,no_such_field"})
+            assert response.status_code == 400, f"{path} unknown field: {response.status_code}"
+        print("✅ Sparse fieldsets passed")
+    except Exception as e:
+        print(f"❌ Sparse fieldsets failed: {e}")
+
+def test_compression(telegram_id):
+    """Test Accept-Encoding negotiation and that streams are never compressed"""
+    print_section("7e. Testing Response Compression")
+    try:
+        url = f"{BASE_URL}/challenges"
+        for accept, expected in [("gzip", "gzip"), ("br, gzip;q=0.5", "br"), ("br;q=0, gzip", "gzip"), ("identity", None)]:
+            response = requests.get(url, headers={"Accept-Encoding": accept})
+            encoding = response.headers.get("Content-Encoding")
+            print(f"  Accept-Encoding {accept!r}: {encoding}")
+            assert response.status_code == 200
+            if expected == "br" and encoding == "gzip":
+                print("ℹ️  brotli is not installed on the server, gzip was used")
+            else:
+                assert encoding == expected, f"{accept!r}: {encoding}"
+            if encoding:
+                assert "accept-encoding" in response.headers.get("Vary", "").lower()
+            # requests decodes the body transparently
+            assert isinstance(response.json(), list)
+        
+        # Small bodies are sent as is
+        response = requests.get(f"{BASE_URL}/health", headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in response.headers
+        
+        streams = [(f"{BASE_URL}/events", {"telegram_id": telegram_id}, {})]
+        if ADMIN_API_TOKEN:
+            streams.append((f"{BASE_URL}/exports/submissions", {"format": "csv"}, ADMIN_HEADERS))
+        for stream_url, params, headers in streams:
+            with requests.get(stream_url, params=params, stream=True, timeout=(5, 20),
+                              headers={**headers, "Accept-Encoding": "gzip"}) as response:
+                assert response.status_code == 200, f"{stream_url}: {response.status_code}"
+                assert "Content-Encoding" not in response.headers, f"{stream_url} was compressed"
+                print(f"  {stream_url}: {response.headers.get('Content-Type')}, not compressed")
+        print("✅ Response compression passed")
+    except Exception as e:
+        print(f"❌ Response compression failed: {e}")
+
 def test_leaderboard():
     """Test leaderboard"""
     print_section("8. Testing Leaderboard")
@@ -160,6 +696,46 @@ def test_stats():
     except Exception as e:
         print(f"❌ Platform stats failed: {e}")
 
+def test_query_budgets():
+    """Test parameter limits, statement timeouts and per-route concurrency caps"""
+    print_section("10. Testing Query Budgets")
+    try:
+        response = requests.get(f"{BASE_URL}/leaderboard", params={"limit": 101})
+        print(f"limit=101: {response.status_code}")
+        assert response.status_code == 422
+        
+        if not DATABASE_URL:
+            print("ℹ️  Timeout and concurrency checks skipped: set TIMESCALE_SERVICE_URL")
+            print("✅ Query budgets passed")
+            return
+        
+        # Block /leaderboard on a table lock: requests inside the concurrency
+        # cap run into the statement timeout, the rest are rejected at once
+        conn = psycopg2.connect(DATABASE_URL)
+        try:
+            conn.cursor().execute("LOCK TABLE users IN ACCESS EXCLUSIVE MODE;")
+            with ThreadPoolExecutor(max_workers=6) as pool:
+                responses = list(pool.map(
+                    lambda _: requests.get(f"{BASE_URL}/leaderboard", params={"limit": 5}), range(6)
+                ))
+        finally:
+            conn.rollback()
+            conn.close()
+        statuses = sorted(r.status_code for r in responses)
+        print(f"Concurrent leaderboard requests while blocked: {statuses}")
+        assert 504 in statuses
+        assert 503 in statuses
+        assert set(statuses) == {503, 504}
+        assert all(r.headers.get("Retry-After") for r in responses if r.status_code == 503)
+        
+        metrics = requests.get(f"{BASE_URL}/metrics").text
+        assert 'proofquest_query_budget_exceeded_total{' in metrics
+        assert 'proofquest_route_concurrency_rejected_total{' in metrics
+        assert requests.get(f"{BASE_URL}/leaderboard", params={"limit": 5}).status_code == 200
+        print("✅ Query budgets passed")
+    except Exception as e:
+        print(f"❌ Query budgets failed: {e}")
+
 def main():
     """Run all tests"""
     print("\n")
@@ -178,17 +754,30 @@ def main():
     if user:
         telegram_id = user['telegram_id']
         test_wallet_link(telegram_id)
+        test_bootstrap(telegram_id)
         
         challenges = test_get_challenges()
+        test_create_challenge()
+        test_bulk_import()
         if challenges:
             challenge_id = challenges[0]['id']
             test_get_challenge_detail(challenge_id)
+            test_search_challenges(challenges[0]['title'])
+            test_nearby_challenges(challenges)
             test_submit_photo(telegram_id, challenge_id)
+            test_idempotent_submission(telegram_id)
         
         test_get_user_submissions(telegram_id)
+        test_submission_verification(telegram_id)
+        test_events_stream(telegram_id)
+        test_sparse_fields(telegram_id)
+        test_compression(telegram_id)
     
     test_leaderboard()
     test_stats()
+    test_query_budgets()
+    test_exports()
+    test_payouts()
     
     print("\n" + "="*60)
     print("  ✅ All tests completed!")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Multi-worker cache coherence test
+Starts several uvicorn workers against TIMESCALE_SERVICE_URL, writes a
+challenge directly in the database and checks that every worker serves the
+new value within INVALIDATION_BOUND_S (read-after-write across processes).
+
+Run with: python test_multiworker.py
+"""
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import psycopg2
+import requests
+from dotenv import load_dotenv
+
+load_dotenv('.env')
+
+WORKERS = int(os.environ.get('TEST_WORKERS', '3'))
+PORT = int(os.environ.get('TEST_PORT', '8001'))
+BASE_URL = f"http://localhost:{PORT}"
+INVALIDATION_BOUND_S = 1.0
+READS = 60
+
+def print_section(title):
+    """Print section header"""
+    print("\n" + "="*60)
+    print(f"  {title}")
+    print("="*60)
+
+def start_workers():
+    """Start uvicorn with several worker processes and wait for /health"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT), "--workers", str(WORKERS)],
+        env={**os.environ, "VERIFICATION_MODEL": os.environ.get("VERIFICATION_MODEL", "stub")},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{BASE_URL}/health", timeout=1).json().get("cache_coherent"):
+                return process
+        except Exception:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("Workers did not become healthy")
+
+def fresh_get(path):
+    """GET on a new connection so requests spread across workers"""
+    return requests.get(f"{BASE_URL}{path}", headers={"Connection": "close"}, timeout=5)
+
+def test_workers_running():
+    """Test that several worker processes answer requests"""
+    print_section("1. Testing Worker Processes")
+    pids = {fresh_get("/health").json()["worker_pid"] for _ in range(READS)}
+    print(f"Distinct worker PIDs seen: {len(pids)}")
+    assert len(pids) > 1
+    print("✅ Multiple workers passed")
+
+def test_read_after_write(conn, challenge_id):
+    """Test that a write is visible on every worker within the invalidation bound"""
+    print_section("2. Testing Read-after-write Across Workers")
+    
+    # Warm every worker's list and detail caches
+    for _ in range(READS):
+        fresh_get("/challenges")
+        fresh_get(f"/challenges/{challenge_id}")
+    
+    new_title = f"Coherence check {datetime.now().timestamp()}"
+    cursor = conn.cursor()
+    cursor.execute("UPDATE challenges SET title = %s WHERE challenge_id = %s;", (new_title, challenge_id))
+    conn.commit()
+    written_at = time.time()
+    
+    time.sleep(INVALIDATION_BOUND_S)
+    stale = 0
+    for _ in range(READS):
+        detail = fresh_get(f"/challenges/{challenge_id}").json()
+        listed = {c["id"]: c for c in fresh_get("/challenges").json()}
+        if detail["title"] != new_title or listed[challenge_id]["title"] != new_title:
+            stale += 1
+    print(f"Stale reads after {time.time() - written_at:.1f}s: {stale}/{READS}")
+    assert stale == 0
+    print("✅ Read-after-write passed")
+
+def main():
+    """Run multi-worker tests"""
+    conn = psycopg2.connect(os.environ['TIMESCALE_SERVICE_URL'])
+    process = start_workers()
+    try:
+        challenges = fresh_get("/challenges").json()
+        assert challenges, "Need at least one active challenge"
+        challenge_id = challenges[0]["id"]
+        original_title = challenges[0]["title"]
+        
+        test_workers_running()
+        try:
+            test_read_after_write(conn, challenge_id)
+        finally:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE challenges SET title = %s WHERE challenge_id = %s;", (original_title, challenge_id))
+            conn.commit()
+    finally:
+        process.terminate()
+        process.wait()
+        conn.close()
+    
+    print("\n" + "="*60)
+    print("  ✅ All multi-worker tests completed!")
+    print("="*60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,475 @@
+"""
+Request Tracing
+Brand Challenge Mini App - Sampled per-request span trees and slow-query log
+
+A sampled request gets a span tree:
+
+    GET /users/login
+    ├── handler                 (endpoint function)
+    │   ├── db.acquire          (pool wait, db.connect if a new connection is opened)
+    │   ├── db.execute          (normalized SQL text, row count)
+    │   └── db.commit
+    └── serialize               (response validation / encoding)
+
+Spans live in a contextvar, so threadpool handlers and asyncio.to_thread
+calls attach to the request that started them. Unsampled requests cost one
+contextvar lookup per span site.
+
+Finished traces go to a background exporter: a rotating JSON-lines file
+(TRACE_EXPORTER=file) or an OTLP/HTTP JSON collector (TRACE_EXPORTER=otlp).
+An incoming W3C ``traceparent`` header keeps the caller's trace ID; its
+sampled flag only forces sampling when the request comes from one of
+TRACE_TRUSTED_PROXIES, otherwise TRACE_SAMPLE_RATE applies as usual.
+
+Independently of sampling, every statement slower than SLOW_QUERY_MS is
+logged on the ``proofquest.slow_query`` logger together with its EXPLAIN
+plan (parameters are never logged).
+"""
+
+import contextlib
+import functools
+import inspect
+import ipaddress
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, List, Optional
+
+import psycopg2.extensions
+from fastapi.routing import APIRoute
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger('proofquest.slow_query')
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '0'))
+# Peers (IPs or CIDRs, comma-separated) whose sampled traceparent is honoured
+TRACE_TRUSTED_PROXIES = [
+    ipaddress.ip_network(entry.strip(), strict=False)
+    for entry in os.environ.get('TRACE_TRUSTED_PROXIES', '').split(',') if entry.strip()
+]
+TRACE_EXPORTER = os.environ.get('TRACE_EXPORTER', 'file')
+# {pid} keeps worker processes from rotating the same file
+TRACE_FILE = os.environ.get('TRACE_FILE', 'traces-{pid}.jsonl')
+TRACE_FILE_MAX_BYTES = int(os.environ.get('TRACE_FILE_MAX_BYTES', str(10 * 2**20)))
+TRACE_FILE_BACKUPS = int(os.environ.get('TRACE_FILE_BACKUPS', '5'))
+TRACE_OTLP_ENDPOINT = os.environ.get('TRACE_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+TRACE_QUEUE_SIZE = int(os.environ.get('TRACE_QUEUE_SIZE', '1000'))
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '500'))
+SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'true').lower() in ('1', 'true', 'yes')
+
+SERVICE_NAME = 'proofquest-backend'
+
+_TRACEPARENT_RE = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_WHITESPACE_RE = re.compile(r"\s+")
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_EXPLAINABLE = ('select', 'with', 'insert', 'update', 'delete')
+
+# ============================================================
+# SPANS
+# ============================================================
+
+class Span:
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'root', 'name', 'attributes', 'start_ns', 'end_ns', 'children', 'phase')
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, attributes: Optional[dict] = None,
+                 root: Optional["Span"] = None):
+        self.trace_id = trace_id
+        self.root = root or self
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.children: List["Span"] = []
+        self.phase: Optional["Span"] = None
+
+    def child(self, name: str, attributes: Optional[dict] = None) -> "Span":
+        span = Span(name, self.trace_id, self.span_id, attributes, self.root)
+        self.children.append(span)
+        return span
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+_current: ContextVar[Optional[Span]] = ContextVar('proofquest_span', default=None)
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """Child span of the current span; a no-op outside a sampled request"""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.attributes['error'] = type(e).__name__
+        raise
+    finally:
+        child.end()
+        _current.reset(token)
+
+
+def begin_phase(name: str):
+    """
+    Open a span on the request root that outlives the current context, e.g.
+    'serialize', started when the endpoint returns and ended by end_phase()
+    """
+    current = _current.get()
+    if current is not None:
+        current.root.phase = current.root.child(name)
+
+
+def end_phase():
+    current = _current.get()
+    if current is not None and current.root.phase is not None:
+        current.root.phase.end()
+        current.root.phase = None
+
+# ============================================================
+# REQUEST TRACES
+# ============================================================
+
+def trusted_peer(host: Optional[str]) -> bool:
+    """True when ``host`` is one of TRACE_TRUSTED_PROXIES"""
+    if not host or not TRACE_TRUSTED_PROXIES:
+        return False
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRACE_TRUSTED_PROXIES)
+
+
+def _sampling_decision(traceparent: Optional[str], trusted: bool):
+    """
+    (sampled, trace_id, parent span id). An incoming traceparent always
+    supplies the trace ID; its sampled flag is only obeyed when trusted.
+    """
+    match = _TRACEPARENT_RE.match(traceparent or '')
+    if match:
+        trace_id, parent_id, flags = match.groups()
+        if trusted and int(flags, 16) & 1:
+            return True, trace_id, parent_id
+    else:
+        trace_id, parent_id = None, None
+    if TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE:
+        return True, trace_id or secrets.token_hex(16), parent_id
+    return False, None, None
+
+
+@contextlib.contextmanager
+def trace_request(name: str, traceparent: Optional[str] = None, trusted: bool = False, **attributes):
+    """
+    Root span for one request; yields None when the request is not sampled.
+    ``trusted``: honour the sampled flag of ``traceparent`` (see trusted_peer).
+    """
+    sampled, trace_id, parent_id = _sampling_decision(traceparent, trusted)
+    if not sampled or exporter is None:
+        yield None
+        return
+    root = Span(name, trace_id, parent_id, attributes)
+    token = _current.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.attributes['error'] = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        if root.phase is not None:
+            root.phase.end()
+        root.end()
+        exporter.submit(root)
+
+# ============================================================
+# DATABASE INSTRUMENTATION
+# ============================================================
+
+def normalize_sql(query: Any) -> str:
+    """Collapse whitespace and replace inline literals with '?'"""
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    elif not isinstance(query, str):
+        query = repr(query)
+    return _LITERAL_RE.sub('?', _WHITESPACE_RE.sub(' ', query).strip())
+
+
+def _explain(conn, query, params) -> Optional[str]:
+    """
+    EXPLAIN (not ANALYZE, so nothing is executed twice) on the same
+    connection, inside a savepoint so a failure cannot abort the caller's
+    transaction. None when the statement cannot be explained.
+    """
+    if not SLOW_QUERY_EXPLAIN:
+        return None
+    if hasattr(query, 'as_string'):
+        query = query.as_string(conn)
+    text = query.decode() if isinstance(query, bytes) else str(query)
+    if not text.lstrip().lower().startswith(_EXPLAINABLE):
+        return None
+    status = conn.info.transaction_status
+    if status not in (psycopg2.extensions.TRANSACTION_STATUS_IDLE, psycopg2.extensions.TRANSACTION_STATUS_INTRANS):
+        return None
+    in_transaction = status == psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+    cursor = psycopg2.extensions.cursor(conn)
+    try:
+        if in_transaction:
+            cursor.execute("SAVEPOINT slow_query_explain;")
+        try:
+            cursor.execute("EXPLAIN " + text, params)
+            return "\n".join(row[0] for row in cursor.fetchall())
+        except Exception as e:
+            if in_transaction:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain;")
+            return f"EXPLAIN failed: {str(e).strip()}"
+        finally:
+            if in_transaction:
+                cursor.execute("RELEASE SAVEPOINT slow_query_explain;")
+    except Exception:
+        logger.exception("Could not run EXPLAIN for slow query")
+        return None
+    finally:
+        cursor.close()
+
+
+def _record_statement(cursor, query, params, started: float, span_: Optional[Span],
+                      error: Optional[BaseException] = None):
+    duration_ms = (time.perf_counter() - started) * 1000
+    if span_ is not None and error is None:
+        span_.attributes['rows'] = cursor.rowcount
+    if duration_ms < SLOW_QUERY_MS:
+        return
+    statement = normalize_sql(query)
+    # After a failure the transaction is aborted and _explain skips the plan
+    # (it would need a new transaction); autocommit connections still get it
+    plan = _explain(cursor.connection, query, params)
+    if span_ is not None:
+        span_.attributes['slow'] = True
+    failed = f", {type(error).__name__}" if error is not None else ""
+    slow_query_logger.warning(
+        "Slow query (%.1f ms%s): %s%s",
+        duration_ms, failed, statement, f"\n{plan}" if plan else "",
+        extra={
+            "duration_ms": duration_ms, "statement": statement, "plan": plan,
+            "error": type(error).__name__ if error is not None else None,
+        },
+    )
+
+
+@lru_cache(maxsize=None)
+def traced_cursor_class(base: type) -> type:
+    """
+    Subclass of a psycopg2 cursor class that times execute() into spans.
+    Statements that raise (e.g. QueryCanceled from a statement_timeout) are
+    timed and slow-logged too.
+    """
+
+    class TracedCursor(base):
+        def execute(self, query, vars=None):
+            started = time.perf_counter()
+            if _current.get() is None:
+                return self._execute_recorded(query, vars, started, None)
+            with span('db.execute', statement=normalize_sql(query)) as span_:
+                return self._execute_recorded(query, vars, started, span_)
+
+        def _execute_recorded(self, query, vars, started, span_):
+            error = None
+            try:
+                return super().execute(query, vars)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                _record_statement(self, query, vars, started, span_, error)
+
+    TracedCursor.__name__ = TracedCursor.__qualname__ = f"Traced{base.__name__}"
+    return TracedCursor
+
+# ============================================================
+# ROUTE INSTRUMENTATION
+# ============================================================
+
+def _traced_endpoint(call):
+    """Wrap an endpoint in a 'handler' span and open 'serialize' when it returns"""
+    if inspect.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def endpoint(*args, **kwargs):
+            try:
+                with span('handler', endpoint=call.__name__):
+                    return await call(*args, **kwargs)
+            finally:
+                begin_phase('serialize')
+    else:
+        @functools.wraps(call)
+        def endpoint(*args, **kwargs):
+            try:
+                with span('handler', endpoint=call.__name__):
+                    return call(*args, **kwargs)
+            finally:
+                begin_phase('serialize')
+    return endpoint
+
+
+class TracedRoute(APIRoute):
+    """APIRoute whose requests record handler and serialize spans (app.router.route_class)"""
+
+    def get_route_handler(self):
+        self.dependant.call = _traced_endpoint(self.dependant.call)
+        handler = super().get_route_handler()
+
+        async def traced_handler(request):
+            try:
+                return await handler(request)
+            finally:
+                end_phase()
+
+        return traced_handler
+
+# ============================================================
+# EXPORTERS
+# ============================================================
+
+class TraceExporter:
+    """Background thread that writes finished traces; drops them when the queue is full"""
+
+    def __init__(self, queue_size: int = TRACE_QUEUE_SIZE):
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def submit(self, root: Span):
+        try:
+            self._queue.put_nowait(root)
+        except queue.Full:
+            logger.debug("Trace queue full, dropping trace %s", root.trace_id)
+
+    def flush(self, timeout: float = 5.0):
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _run(self):
+        while True:
+            root = self._queue.get()
+            try:
+                self.export(root)
+            except Exception:
+                logger.exception("Trace export failed")
+            finally:
+                self._queue.task_done()
+
+    def export(self, root: Span):
+        raise NotImplementedError
+
+
+class FileTraceExporter(TraceExporter):
+    """One JSON line per trace (nested span tree), size-rotated"""
+
+    def __init__(self, path: str = TRACE_FILE, max_bytes: int = TRACE_FILE_MAX_BYTES,
+                 backups: int = TRACE_FILE_BACKUPS):
+        self._handler = logging.handlers.RotatingFileHandler(
+            path.format(pid=os.getpid()), maxBytes=max_bytes, backupCount=backups, delay=True
+        )
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        super().__init__()
+
+    def export(self, root: Span):
+        record = {"trace_id": root.trace_id, **root.to_dict()}
+        self._handler.emit(logging.makeLogRecord({"msg": json.dumps(record, default=str)}))
+
+
+class OtlpTraceExporter(TraceExporter):
+    """OTLP/HTTP JSON (POST /v1/traces) to an OpenTelemetry collector"""
+
+    def __init__(self, endpoint: str = TRACE_OTLP_ENDPOINT):
+        import httpx
+
+        self.endpoint = endpoint
+        self._client = httpx.Client(timeout=5.0)
+        super().__init__()
+
+    @staticmethod
+    def _value(value) -> dict:
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        return {"stringValue": str(value)}
+
+    def export(self, root: Span):
+        spans = [
+            {
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                "name": s.name,
+                "kind": 2 if s is root else 1,
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                "attributes": [{"key": k, "value": self._value(v)} for k, v in s.attributes.items()],
+            }
+            for s in root.walk()
+        ]
+        self._client.post(self.endpoint, json={
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+            }]
+        }).raise_for_status()
+
+
+def create_exporter() -> Optional[TraceExporter]:
+    if TRACE_EXPORTER == 'otlp':
+        return OtlpTraceExporter()
+    if TRACE_EXPORTER == 'file':
+        return FileTraceExporter()
+    return None
+
+
+exporter: Optional[TraceExporter] = None
+
+
+def configure(trace_exporter: Optional[TraceExporter] = None):
+    """Install an exporter (default: from TRACE_EXPORTER); call once at startup"""
+    global exporter
+    exporter = trace_exporter if trace_exporter is not None else create_exporter()
@@ -0,0 +1,391 @@
+"""
+Server-side AI Verification
+Brand Challenge Mini App - Job queue, bounded worker pool and result cache
+
+Submissions are queued as verification jobs and processed by a fixed number
+of asyncio workers. Each worker loads the submitted image, checks the result
+cache keyed by (image hash, challenge_id, prompt version) and only calls the
+model client on a miss. Results are handed to an ``on_result`` callback which
+main.py uses to update the submission status and write verification_logs.
+"""
+
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+
+# Required: a Gemini model name, or 'stub' (approves everything; refused when ENVIRONMENT=production)
+VERIFICATION_MODEL = os.environ.get('VERIFICATION_MODEL')
+VERIFICATION_WORKERS = int(os.environ.get('VERIFICATION_WORKERS', '4'))
+VERIFICATION_QUEUE_SIZE = int(os.environ.get('VERIFICATION_QUEUE_SIZE', '1000'))
+VERIFICATION_TIMEOUT_S = float(os.environ.get('VERIFICATION_TIMEOUT_S', '30'))
+VERIFICATION_MAX_RETRIES = int(os.environ.get('VERIFICATION_MAX_RETRIES', '2'))
+VERIFICATION_RETRY_DELAY_S = float(os.environ.get('VERIFICATION_RETRY_DELAY_S', '1'))
+VERIFICATION_CACHE_SIZE = int(os.environ.get('VERIFICATION_CACHE_SIZE', '10000'))
+
+# Hosts http(s) image URLs may be fetched from (uploads); anything else is
+# only accepted as a data: URL. Required with a real model. Images above the
+# size limit are not loaded.
+VERIFICATION_IMAGE_HOSTS = frozenset(
+    host.strip().lower() for host in os.environ.get('VERIFICATION_IMAGE_HOSTS', '').split(',') if host.strip()
+)
+VERIFICATION_MAX_IMAGE_BYTES = int(os.environ.get('VERIFICATION_MAX_IMAGE_BYTES', str(10 * 2**20)))
+
+# Bump PROMPT_VERSION whenever PROMPT_TEMPLATE changes so cached results
+# produced by the old prompt are not reused.
+PROMPT_VERSION = 'v1'
+PROMPT_TEMPLATE = (
+    'Analyze the provided image to see if it is related to this request: "{description}". '
+    'Focus on the main subject. Is it a plausible submission? '
+    'Respond with only "Yes" or "No", followed by a brief, one-sentence explanation.'
+)
+
+APPROVED = 'APPROVED'
+REJECTED = 'REJECTED'
+# The image itself cannot be used (host not allowed, too large, not found): final
+IMAGE_ERROR = 'IMAGE_ERROR'
+# Model or image host unavailable after all retries: the submission stays
+# pending and is requeued once its claim expires
+API_ERROR = 'API_ERROR'
+
+# ============================================================
+# JOBS & RESULTS
+# ============================================================
+
+@dataclass
+class VerificationJob:
+    submission_id: int
+    challenge_id: int
+    challenge_description: str
+    image_url: str
+
+
+@dataclass
+class VerificationOutcome:
+    result: str
+    raw_response: Optional[str] = None
+    error_message: Optional[str] = None
+    model: str = ''
+    prompt: str = ''
+    duration_ms: int = 0
+    cached: bool = False
+
+
+# ============================================================
+# MODEL CLIENTS
+# ============================================================
+
+class ModelClient:
+    """Interface for the model that judges a submission image"""
+
+    name = 'base'
+
+    async def verify(self, image: bytes, mime_type: str, prompt: str) -> Tuple[str, str]:
+        """Return (result, raw_response) where result is APPROVED or REJECTED"""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class StubModelClient(ModelClient):
+    """
+    Local deterministic client for tests and development (VERIFICATION_MODEL=stub).
+    Approves every non-empty image unless the image bytes contain ``reject_marker``.
+    """
+
+    name = 'stub'
+
+    def __init__(self, reject_marker: bytes = b'REJECT', delay_s: float = 0.0):
+        self.reject_marker = reject_marker
+        self.delay_s = delay_s
+        self.calls = 0
+
+    async def verify(self, image: bytes, mime_type: str, prompt: str) -> Tuple[str, str]:
+        self.calls += 1
+        if self.delay_s:
+            await asyncio.sleep(self.delay_s)
+        if not image or self.reject_marker in image:
+            return REJECTED, 'No. Stub client rejected the image.'
+        return APPROVED, 'Yes. Stub client approved the image.'
+
+
+class GeminiModelClient(ModelClient):
+    """Google Gemini client using the public generateContent REST endpoint"""
+
+    name = 'gemini'
+
+    def __init__(self, api_key: str, model: str = 'gemini-2.5-flash'):
+        self.api_key = api_key
+        self.model = model
+        self.name = model
+        self._http = httpx.AsyncClient(base_url='https://generativelanguage.googleapis.com')
+
+    async def verify(self, image: bytes, mime_type: str, prompt: str) -> Tuple[str, str]:
+        response = await self._http.post(
+            f'/v1beta/models/{self.model}:generateContent',
+            params={'key': self.api_key},
+            json={
+                'contents': [{
+                    'parts': [
+                        {'inline_data': {'mime_type': mime_type, 'data': base64.b64encode(image).decode()}},
+                        {'text': prompt},
+                    ]
+                }]
+            },
+        )
+        response.raise_for_status()
+        text = response.json()['candidates'][0]['content']['parts'][0]['text'].strip()
+        return (APPROVED if text.lower().startswith('yes') else REJECTED), text
+
+    async def close(self):
+        await self._http.aclose()
+
+
+def create_model_client() -> ModelClient:
+    """
+    Build the model client selected by VERIFICATION_MODEL (called at
+    startup, so a missing or unsafe configuration stops the server)
+    """
+    if not VERIFICATION_MODEL:
+        raise RuntimeError("VERIFICATION_MODEL is not set (a Gemini model name, or 'stub' for development)")
+    if VERIFICATION_MODEL == 'stub':
+        if os.environ.get('ENVIRONMENT') == 'production':
+            raise RuntimeError("VERIFICATION_MODEL=stub approves every submission and is refused in production")
+        logger.warning("Using the stub verification model: every non-empty image is approved")
+        return StubModelClient()
+    if not VERIFICATION_IMAGE_HOSTS:
+        raise RuntimeError(
+            f"VERIFICATION_IMAGE_HOSTS is required for VERIFICATION_MODEL={VERIFICATION_MODEL}: "
+            "without it every http(s) image URL is refused"
+        )
+    if VERIFICATION_MODEL.startswith('gemini'):
+        api_key = os.environ.get('GEMINI_API_KEY')
+        if not api_key:
+            raise RuntimeError(f"GEMINI_API_KEY is required for VERIFICATION_MODEL={VERIFICATION_MODEL}")
+        return GeminiModelClient(api_key, model=VERIFICATION_MODEL)
+    raise ValueError(f"Unknown VERIFICATION_MODEL: {VERIFICATION_MODEL}")
+
+
+# ============================================================
+# RESULT CACHE
+# ============================================================
+
+class VerificationCache:
+    """Bounded LRU cache of outcomes keyed by (image hash, challenge_id, prompt version)"""
+
+    def __init__(self, max_size: int = VERIFICATION_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[tuple, VerificationOutcome]" = OrderedDict()
+
+    @staticmethod
+    def key(image: bytes, challenge_id: int, prompt_version: str = PROMPT_VERSION) -> tuple:
+        return hashlib.sha256(image).hexdigest(), challenge_id, prompt_version
+
+    def get(self, key: tuple) -> Optional[VerificationOutcome]:
+        outcome = self._entries.get(key)
+        if outcome is not None:
+            self._entries.move_to_end(key)
+        return outcome
+
+    def put(self, key: tuple, outcome: VerificationOutcome):
+        self._entries[key] = outcome
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# ============================================================
+# IMAGE LOADING
+# ============================================================
+
+class ImageRejected(ValueError):
+    """The image URL is not allowed, the image is too large or its host says it does not exist"""
+
+
+async def load_image(
+    image_url: str,
+    http: httpx.AsyncClient,
+    allowed_hosts: frozenset = VERIFICATION_IMAGE_HOSTS,
+    max_bytes: int = VERIFICATION_MAX_IMAGE_BYTES,
+) -> Tuple[bytes, str]:
+    """
+    Return (bytes, mime_type) for a data: URL, or an http(s) URL on one of
+    ``allowed_hosts``. The download is streamed and aborted past ``max_bytes``
+    (redirects are not followed). Raises ImageRejected for images that can
+    never be loaded; network errors and 5xx responses propagate as they are.
+    """
+    if image_url.startswith('data:'):
+        header, _, data = image_url.partition(',')
+        mime_type = header[5:].split(';')[0] or 'application/octet-stream'
+        try:
+            image = base64.b64decode(data) if ';base64' in header else data.encode()
+        except ValueError:
+            raise ImageRejected("Invalid base64 in data: URL")
+        if len(image) > max_bytes:
+            raise ImageRejected(f"Image larger than {max_bytes} bytes")
+        return image, mime_type
+
+    try:
+        url = httpx.URL(image_url)
+    except Exception:
+        raise ImageRejected("Invalid image URL")
+    if url.scheme not in ('http', 'https') or url.host.lower() not in allowed_hosts:
+        raise ImageRejected(f"Image host not allowed: {url.host or image_url[:50]}")
+
+    async with http.stream('GET', url) as response:
+        if response.status_code >= 500:
+            response.raise_for_status()
+        if response.status_code != 200:
+            raise ImageRejected(f"Image fetch returned HTTP {response.status_code}")
+        length = response.headers.get('content-length')
+        if length is not None and length.isdigit() and int(length) > max_bytes:
+            raise ImageRejected(f"Image larger than {max_bytes} bytes")
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > max_bytes:
+                raise ImageRejected(f"Image larger than {max_bytes} bytes")
+            chunks.append(chunk)
+    return b''.join(chunks), response.headers.get('content-type', 'image/jpeg').split(';')[0]
+
+
+# ============================================================
+# WORKER POOL
+# ============================================================
+
+class VerificationPool:
+    """
+    Bounded async worker pool.
+
+    At most ``workers`` model calls are in flight at once; ``submit`` refuses
+    new jobs once ``queue_size`` jobs are waiting.
+    """
+
+    def __init__(
+        self,
+        client: ModelClient,
+        on_result: Callable[[VerificationJob, VerificationOutcome], Awaitable[None]],
+        cache: Optional[VerificationCache] = None,
+        workers: int = VERIFICATION_WORKERS,
+        queue_size: int = VERIFICATION_QUEUE_SIZE,
+        timeout_s: float = VERIFICATION_TIMEOUT_S,
+        max_retries: int = VERIFICATION_MAX_RETRIES,
+        retry_delay_s: float = VERIFICATION_RETRY_DELAY_S,
+    ):
+        self.client = client
+        self.on_result = on_result
+        self.cache = cache if cache is not None else VerificationCache()
+        self.workers = workers
+        self.timeout_s = timeout_s
+        self.max_retries = max_retries
+        self.retry_delay_s = retry_delay_s
+        self.queue: "asyncio.Queue[VerificationJob]" = asyncio.Queue(maxsize=queue_size)
+        self._tasks = []
+        self._http: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._http = httpx.AsyncClient(timeout=self.timeout_s)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._http is not None:
+            await self._http.aclose()
+        await self.client.close()
+
+    def submit(self, job: VerificationJob) -> bool:
+        """Queue a job without blocking. Returns False when the queue is full."""
+        try:
+            self.queue.put_nowait(job)
+            return True
+        except asyncio.QueueFull:
+            logger.warning("Verification queue full, dropping submission %s", job.submission_id)
+            return False
+
+    def submit_threadsafe(self, job: VerificationJob):
+        """Queue a job from a sync endpoint running in the threadpool"""
+        self._loop.call_soon_threadsafe(self.submit, job)
+
+    async def _worker(self, index: int):
+        while True:
+            job = await self.queue.get()
+            try:
+                outcome = await self.process(job)
+                await self.on_result(job, outcome)
+            except Exception:
+                logger.exception("Verification worker %s failed on submission %s", index, job.submission_id)
+            finally:
+                self.queue.task_done()
+
+    async def process(self, job: VerificationJob) -> VerificationOutcome:
+        """Run one job through the cache and the model client with timeout and retries"""
+        prompt = PROMPT_TEMPLATE.format(description=job.challenge_description)
+        start = time.monotonic()
+
+        try:
+            image, mime_type = await asyncio.wait_for(load_image(job.image_url, self._http), self.timeout_s)
+        except Exception as e:
+            return VerificationOutcome(
+                result=IMAGE_ERROR if isinstance(e, ImageRejected) else API_ERROR,
+                error_message=f"Image load failed: {str(e) or type(e).__name__}",
+                model=self.client.name, prompt=prompt,
+                duration_ms=int((time.monotonic() - start) * 1000),
+            )
+
+        key = VerificationCache.key(image, job.challenge_id)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return VerificationOutcome(
+                result=cached.result, raw_response=cached.raw_response,
+                model=cached.model, prompt=cached.prompt, duration_ms=0, cached=True,
+            )
+
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                result, raw = await asyncio.wait_for(
+                    self.client.verify(image, mime_type, prompt), self.timeout_s
+                )
+                outcome = VerificationOutcome(
+                    result=result, raw_response=raw, model=self.client.name, prompt=prompt,
+                    duration_ms=int((time.monotonic() - start) * 1000),
+                )
+                self.cache.put(key, outcome)
+                return outcome
+            except Exception as e:
+                last_error = e
+                logger.warning(
+                    "Verification attempt %s/%s failed for submission %s: %r",
+                    attempt + 1, self.max_retries + 1, job.submission_id, e,
+                )
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self.retry_delay_s * (2 ** attempt))
+
+        return VerificationOutcome(
+            result=API_ERROR, error_message=str(last_error) or type(last_error).__name__,
+            model=self.client.name, prompt=prompt,
+            duration_ms=int((time.monotonic() - start) * 1000),
+        )
@@ -1,4 +1,4 @@
-import { Challenge, Submission, User, SubmissionWithChallengeDetails } from '../types';
+import { Challenge, NearbyChallenge, Submission, User, SubmissionWithChallengeDetails } from '../types';
 
 // Use the production backend URL provided in the documentation.
 const BASE_URL = 'https://your-app.onrender.com';
@@ -68,12 +68,38 @@ export const linkWallet = async (telegram_id: number, wallet_address: string): P
 };
 
 
+// GET /bootstrap/{telegram_id}
+// User, active challenges and recent submissions in one round-trip (404 for unknown users)
+export const getBootstrap = async (telegramId: number): Promise<{
+    user: User;
+    challenges: Challenge[];
+    submissions: SubmissionWithChallengeDetails[];
+}> => {
+    const response = await fetch(`${BASE_URL}/bootstrap/${telegramId}`);
+    return handleResponse(response);
+};
+
 // GET /challenges
 export const getActiveChallenges = async (): Promise<Challenge[]> => {
   const response = await fetch(`${BASE_URL}/challenges`);
   return handleResponse(response);
 };
 
+// GET /challenges/nearby
+// Active challenges near a point, nearest first (radius and/or k-nearest)
+export const getNearbyChallenges = async (
+    lat: number,
+    lng: number,
+    options: { radiusKm?: number; k?: number; category?: string } = { k: 20 }
+): Promise<NearbyChallenge[]> => {
+    const params = new URLSearchParams({ lat: String(lat), lng: String(lng) });
+    if (options.radiusKm !== undefined) params.set('radius_km', String(options.radiusKm));
+    if (options.k !== undefined) params.set('k', String(options.k));
+    if (options.category) params.set('category', options.category);
+    const response = await fetch(`${BASE_URL}/challenges/nearby?${params}`);
+    return handleResponse(response);
+};
+
 // POST /submissions
 export const createSubmission = async (telegramId: number, challengeId: number, imageData: string, imageMimeType: string): Promise<Submission> => {
     const response = await fetch(`${BASE_URL}/submissions`, {
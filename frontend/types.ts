@@ -31,6 +31,14 @@ export interface Challenge {
   reward_info: string;
   deadline: string;
   status: "active" | "expired";
+  latitude?: number | null;
+  longitude?: number | null;
+  location?: string | null;
+  category?: string | null;
+}
+
+export interface NearbyChallenge extends Challenge {
+  distance_km: number;
 }
 
 export interface Submission {